@@ -0,0 +1,83 @@
+"""Deterministic synthetic media used by the benchmark suite."""
+
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict
+
+DEFAULT_FIXTURE_DIR = os.environ.get(
+    "VIDEO_MCP_BENCH_FIXTURES", str(Path.home() / ".cache" / "video_mcp" / "bench_fixtures")
+)
+
+# name -> (width, height)
+VIDEO_SIZES = {
+    "480p": (854, 480),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+IMAGE_SIZES = {
+    "still_12mp": (4000, 3000),
+    "still_24mp": (6000, 4000),
+}
+FOLDER_IMAGES = 24
+
+
+def ffmpeg_binary() -> str:
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+def _run(args):
+    # bitexact keeps encoder/muxer output identical between runs of the same ffmpeg build
+    cmd = [ffmpeg_binary(), "-y", "-loglevel", "error"] + args
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+
+
+def generate_fixtures(fixture_dir: str = DEFAULT_FIXTURE_DIR, duration: float = 3.0, fps: int = 30) -> Dict[str, str]:
+    """Create (or reuse) test-pattern videos, a tone, large stills and an audio folder; returns name -> path"""
+    root = Path(fixture_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    bitexact = ["-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact"]
+    fixtures = {}
+
+    for name, (width, height) in VIDEO_SIZES.items():
+        path = root / f"testsrc_{name}_{duration:g}s_{fps}fps.mp4"
+        if not path.exists():
+            _run([
+                "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+                "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+                "-c:v", "libx264", "-preset", "veryfast", "-g", str(fps * 2), "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "128k", "-shortest",
+            ] + bitexact + [str(path)])
+        fixtures[f"video_{name}"] = str(path)
+
+    tone = root / f"tone_{duration:g}s.wav"
+    if not tone.exists():
+        _run(["-f", "lavfi", "-i", f"sine=frequency=330:sample_rate=44100:duration={duration * 2}"]
+             + bitexact + [str(tone)])
+    fixtures["tone"] = str(tone)
+
+    # merge_videos picks its soundtrack from a folder
+    audio_dir = root / "audio"
+    audio_dir.mkdir(exist_ok=True)
+    folder_tone = audio_dir / tone.name
+    if not folder_tone.exists():
+        folder_tone.write_bytes(tone.read_bytes())
+    fixtures["audio_folder"] = str(audio_dir)
+
+    for name, (width, height) in IMAGE_SIZES.items():
+        path = root / f"{name}.jpg"
+        if not path.exists():
+            _run(["-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=1", "-frames:v", "1",
+                  "-q:v", "2"] + bitexact + [str(path)])
+        fixtures[f"image_{name}"] = str(path)
+
+    # A folder of camera sized stills for the batch image tool
+    folder = root / "images"
+    if not (folder / f"still_{FOLDER_IMAGES:03d}.jpg").exists():
+        folder.mkdir(exist_ok=True)
+        _run(["-f", "lavfi", "-i", "testsrc2=size=3000x2000:rate=1", "-frames:v", str(FOLDER_IMAGES),
+              "-q:v", "2"] + bitexact + [str(folder / "still_%03d.jpg")])
+    fixtures["image_folder"] = str(folder)
+
+    return fixtures
@@ -0,0 +1,288 @@
+"""
+Load generator for the streamable-http MCP server.
+
+Starts the server on localhost (or targets --url), opens one MCP session per virtual
+client and drives a weighted mix of tool calls against generated fixtures. Reports
+latency percentiles per operation, throughput, error rates and the server's RSS
+(including its ffmpeg children) sampled over time.
+
+    python -m benchmarks.load_test --concurrency 8 --duration 60
+    python -m benchmarks.load_test --mix probe=60,image_info=20,image_resize=15,render=5
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import asyncio
+import tempfile
+import subprocess
+import statistics
+from typing import Dict, Any, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "probe=50,image_info=20,image_resize=20,render=10"
+
+
+def operations(fixtures: Dict[str, str], out_dir: str) -> Dict[str, Tuple[str, Any]]:
+    """Operation name -> (tool name, argument factory)"""
+    return {
+        "probe": ("get_video_info", lambda i: {"video_path": fixtures["video_480p"]}),
+        "probe_1080p": ("get_video_info", lambda i: {"video_path": fixtures["video_1080p"]}),
+        "image_info": ("get_image_info", lambda i: {"image_path": fixtures["image_still_12mp"]}),
+        "image_resize": ("resize_image", lambda i: {
+            "image_path": fixtures["image_still_12mp"], "size": [640, 360],
+            "output_path": os.path.join(out_dir, f"thumb_{i}.jpg")}),
+        "render": ("image_to_video", lambda i: {
+            "image_path": fixtures["image_still_12mp"], "output_path": os.path.join(out_dir, f"render_{i}.mp4"),
+            "duration": 1.0, "fps": 12, "preview": True}),
+        "render_resize": ("resize_video", lambda i: {
+            "video_path": fixtures["video_480p"], "size": [640, 360], "return_path": True,
+            "output_path": os.path.join(out_dir, f"resize_{i}.mp4"), "preview": True}),
+    }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid: int) -> List[int]:
+    """All descendant pids of a process (Linux /proc)"""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents.setdefault(int(f.read().rsplit(")", 1)[1].split()[1]), []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000, 2)
+
+    return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 2),
+            "mean": round(statistics.mean(ordered) * 1000, 2)}
+
+
+def _tool_failed(result) -> Optional[str]:
+    if result.isError:
+        return " ".join(getattr(c, "text", "") for c in result.content)[:200] or "tool error"
+    payload = result.structuredContent or {}
+    payload = payload.get("result", payload)
+    if not payload and result.content:
+        try:
+            payload = json.loads(result.content[0].text)
+        except (ValueError, AttributeError):
+            payload = {}
+    if isinstance(payload, dict) and payload.get("success") is False:
+        return str(payload.get("error", "success=false"))[:200]
+    return None
+
+
+async def _client(url: str, ops, weights: Dict[str, float], deadline: float, max_requests: Optional[int],
+                  counter: List[int], samples: List[Dict[str, Any]], seed: int):
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    rng = random.Random(seed)
+    names = list(weights)
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            while time.monotonic() < deadline:
+                if max_requests is not None:
+                    if counter[0] >= max_requests:
+                        break
+                    counter[0] += 1
+                op = rng.choices(names, weights=[weights[n] for n in names])[0]
+                tool, make_args = ops[op]
+                started = time.monotonic()
+                try:
+                    result = await session.call_tool(tool, make_args(len(samples)))
+                    error = _tool_failed(result)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                samples.append({"op": op, "start": started, "latency": time.monotonic() - started, "error": error})
+
+
+async def _sample_rss(pid: Optional[int], stop: asyncio.Event, interval: float, origin: float, series: List):
+    while not stop.is_set():
+        if pid:
+            pids = [pid] + _children(pid)
+            sizes = [_rss_bytes(p) for p in pids]
+            series.append({
+                "t": round(time.monotonic() - origin, 2),
+                "server_rss_mb": round((sizes[0] or 0) / 2**20, 1),
+                "total_rss_mb": round(sum(s for s in sizes if s) / 2**20, 1),
+                "processes": len(pids),
+            })
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(url: str, ops, weights, concurrency: int, duration: float, max_requests: Optional[int],
+                   server_pid: Optional[int], rss_interval: float) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    rss: List[Dict[str, Any]] = []
+    stop = asyncio.Event()
+    origin = time.monotonic()
+    sampler = asyncio.create_task(_sample_rss(server_pid, stop, rss_interval, origin, rss))
+    counter = [0]
+    deadline = origin + duration
+    results = await asyncio.gather(*[
+        _client(url, ops, weights, deadline, max_requests, counter, samples, seed=i) for i in range(concurrency)
+    ], return_exceptions=True)
+    elapsed = time.monotonic() - origin
+    stop.set()
+    await sampler
+
+    client_errors = [f"{type(r).__name__}: {r}" for r in results if isinstance(r, BaseException)]
+    report = {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 3) if elapsed else None,
+        "errors": sum(1 for s in samples if s["error"]),
+        "error_rate": round(sum(1 for s in samples if s["error"]) / len(samples), 4) if samples else None,
+        "latency_ms": _percentiles([s["latency"] for s in samples]),
+        "operations": {},
+        "client_errors": client_errors,
+        "rss": rss,
+        "peak_total_rss_mb": max((r["total_rss_mb"] for r in rss), default=None),
+    }
+    for op in sorted({s["op"] for s in samples}):
+        op_samples = [s for s in samples if s["op"] == op]
+        errors = [s["error"] for s in op_samples if s["error"]]
+        report["operations"][op] = {
+            "requests": len(op_samples),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(op_samples), 4),
+            "latency_ms": _percentiles([s["latency"] for s in op_samples]),
+            "sample_error": errors[0] if errors else None,
+        }
+    return report
+
+
+def start_server(port: int, log_path: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["VIDEO_MCP_HOST"] = "127.0.0.1"
+    env["VIDEO_MCP_PORT"] = str(port)
+    env["PYTHONPATH"] = os.pathsep.join([os.path.join(REPO_ROOT, "src"), REPO_ROOT, env.get("PYTHONPATH", "")])
+    log = open(log_path, "w")
+    process = subprocess.Popen([sys.executable, "-m", "video_edit_mcp.main"], env=env, cwd=REPO_ROOT,
+                               stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}, see {log_path}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start listening on port {port}, see {log_path}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Target an already running server (e.g. http://127.0.0.1:9000/mcp)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent MCP sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests in total")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operations, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--rss-interval", type=float, default=1.0, help="Seconds between RSS samples")
+    parser.add_argument("--fixtures", default=None, help="Fixture directory")
+    parser.add_argument("--output", default="load_results.json", help="Where to write the JSON report")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.fixtures import generate_fixtures, DEFAULT_FIXTURE_DIR
+
+    fixtures = generate_fixtures(args.fixtures or DEFAULT_FIXTURE_DIR, duration=2.0)
+    out_dir = tempfile.mkdtemp(prefix="video_mcp_load_")
+    ops = operations(fixtures, out_dir)
+    weights = parse_mix(args.mix)
+    unknown = [name for name in weights if name not in ops]
+    if unknown:
+        parser.error(f"Unknown operations {unknown}, choose from {sorted(ops)}")
+
+    server = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        log_path = os.path.join(out_dir, "server.log")
+        print(f"Starting server on port {port} (log: {log_path})")
+        server = start_server(port, log_path)
+        url = f"http://127.0.0.1:{port}/mcp"
+
+    try:
+        report = asyncio.run(run_load(url, ops, weights, args.concurrency, args.duration, args.requests,
+                                      server.pid if server else None, args.rss_interval))
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report.update({"url": url, "mix": weights})
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    latency = report["latency_ms"]
+    print(f"{report['requests']} requests in {report['elapsed_seconds']}s "
+          f"({report['throughput_rps']} req/s), error rate {report['error_rate']}")
+    print(f"latency ms: p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']}")
+    for op, stats in report["operations"].items():
+        lat = stats["latency_ms"]
+        print(f"  {op:15s} {stats['requests']:6d} req  {stats['errors']:4d} err  "
+              f"p50 {lat['p50']:>9}  p99 {lat['p99']:>9}")
+    if report["peak_total_rss_mb"] is not None:
+        print(f"peak server RSS (with ffmpeg children): {report['peak_total_rss_mb']} MB")
+    for error in report["client_errors"]:
+        print(f"client error: {error}")
+    print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+"""
+Benchmark suite for the video editing tools.
+
+Generates deterministic fixtures, runs every case in a fresh process (so peak RSS is
+per case) and writes machine-readable results. With --compare, cases slower than the
+stored baseline by more than --threshold are flagged and the exit code is 1.
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --compare bench.json --threshold 0.15
+    python -m benchmarks.run_benchmarks --cases resize_image merge --repeat 5
+
+With --calibrate, per-host throughput numbers for the estimate_render dry run are fitted
+on the results and written to VIDEO_MCP_CALIBRATION (or the given path).
+"""
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+import platform
+import statistics
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each case calls one tool; string arguments are formatted with the fixture paths and
+# the per-run output directory ({out}).
+CASES: List[Dict[str, Any]] = [
+    {"name": "get_video_info_480p", "tool": "get_video_info", "args": {"video_path": "{video_480p}"}},
+    {"name": "get_video_info_1080p", "tool": "get_video_info", "args": {"video_path": "{video_1080p}"}},
+    {"name": "get_video_info_4k", "tool": "get_video_info", "args": {"video_path": "{video_4k}"}},
+    {"name": "get_image_info_24mp", "tool": "get_image_info", "args": {"image_path": "{image_still_24mp}"}},
+    {"name": "resize_image_24mp_thumbnail", "tool": "resize_image",
+     "args": {"image_path": "{image_still_24mp}", "size": [640, 360], "output_path": "{out}/thumb.jpg"}},
+    {"name": "resize_image_12mp_1080p", "tool": "resize_image",
+     "args": {"image_path": "{image_still_12mp}", "size": [1920, 1080], "output_path": "{out}/resized.jpg"}},
+    {"name": "batch_process_images_24x6mp_thumbnails", "tool": "batch_process_images",
+     "args": {"input_path": "{image_folder}", "output_dir": "{out}", "size": [640, 360], "output_format": "webp"}},
+    {"name": "image_to_video_12mp_zoom", "tool": "image_to_video",
+     "args": {"image_path": "{image_still_12mp}", "output_path": "{out}/still.mp4", "duration": 2.0, "fps": 24,
+              "zoom_factor": 1.2}},
+    {"name": "image_to_video_12mp_zoom_preview", "tool": "image_to_video",
+     "args": {"image_path": "{image_still_12mp}", "output_path": "{out}/still.mp4", "duration": 2.0, "fps": 24,
+              "zoom_factor": 1.2, "preview": True}},
+    {"name": "image_to_video_12mp_sepia", "tool": "image_to_video",
+     "args": {"image_path": "{image_still_12mp}", "output_path": "{out}/still.mp4", "duration": 2.0, "fps": 24,
+              "effect": "sepia"}},
+    {"name": "resize_video_480p_to_720p", "tool": "resize_video",
+     "args": {"video_path": "{video_480p}", "size": [1280, 720], "output_path": "{out}/resized.mp4", "return_path": True}},
+    {"name": "resize_video_1080p_to_720p", "tool": "resize_video",
+     "args": {"video_path": "{video_1080p}", "size": [1280, 720], "output_path": "{out}/resized.mp4", "return_path": True}},
+    {"name": "resize_video_4k_to_720p", "tool": "resize_video",
+     "args": {"video_path": "{video_4k}", "size": [1280, 720], "output_path": "{out}/resized.mp4", "return_path": True}},
+    {"name": "resize_video_4k_to_720p_preview", "tool": "resize_video",
+     "args": {"video_path": "{video_4k}", "size": [1280, 720], "output_path": "{out}/resized.mp4", "return_path": True,
+              "preview": True}},
+    {"name": "merge_videos_480p", "tool": "merge_videos",
+     "args": {"video_paths": ["{video_480p}", "{video_480p}"], "audios_folder": "{audio_folder}",
+              "output_path": "{out}/merged.mp4", "seed": 1}},
+    {"name": "merge_videos_1080p", "tool": "merge_videos",
+     "args": {"video_paths": ["{video_1080p}", "{video_1080p}"], "audios_folder": "{audio_folder}",
+              "output_path": "{out}/merged.mp4", "seed": 1}},
+    {"name": "merge_videos_1080p_preview", "tool": "merge_videos",
+     "args": {"video_paths": ["{video_1080p}", "{video_1080p}"], "audios_folder": "{audio_folder}",
+              "output_path": "{out}/merged.mp4", "seed": 1, "preview": True}},
+    {"name": "apply_effects_1080p_chain", "tool": "apply_effects",
+     "args": {"video_path": "{video_1080p}", "output_path": "{out}/effects.mp4",
+              "effects_chain": ["sepia", {"name": "contrast", "factor": 1.2}, "sharpen", "vignette"]}},
+    {"name": "apply_effects_1080p_chain_range", "tool": "apply_effects",
+     "args": {"video_path": "{video_1080p}", "output_path": "{out}/effects.mp4", "start": 2.2,
+              "effects_chain": ["sepia", {"name": "contrast", "factor": 1.2}, "sharpen", "vignette"]}},
+]
+
+
+class ToolCollector:
+    """Stands in for the MCP server so tool functions can be called directly"""
+
+    def __init__(self):
+        self.tools = {}
+
+    def tool(self, *args, **kwargs):
+        def decorator(fn):
+            self.tools[kwargs.get("name") or fn.__name__] = fn
+            return fn
+        return decorator
+
+    def custom_route(self, *args, **kwargs):
+        return lambda fn: fn
+
+
+def load_tools() -> Dict[str, Any]:
+    sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+    sys.path.insert(0, REPO_ROOT)
+    from video_edit_mcp.video_operations import register_video_tools
+    from video_edit_mcp.image_operations import register_image_tools
+    from video_edit_mcp.audio_operations import register_audio_tools
+    from video_edit_mcp.util_tools import register_util_tools
+
+    collector = ToolCollector()
+    for register in (register_video_tools, register_image_tools, register_audio_tools, register_util_tools):
+        register(collector)
+    return collector.tools
+
+
+def _format(value, context):
+    if isinstance(value, str):
+        return value.format(**context)
+    if isinstance(value, list):
+        return [_format(v, context) for v in value]
+    return value
+
+
+def _output_stats(out_dir: str) -> Dict[str, Any]:
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    stats = {"bytes_written": 0, "frames": None, "pixels_per_frame": None}
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        stats["bytes_written"] += os.path.getsize(path)
+        if name.endswith(".mp4"):
+            infos = ffmpeg_parse_infos(path)
+            stats["frames"] = infos.get("video_nframes")
+            width, height = infos.get("video_size") or (0, 0)
+            stats["pixels_per_frame"] = width * height
+    return stats
+
+
+def _run_case_child(case: Dict[str, Any], fixtures: Dict[str, str], out_dir: str, queue):
+    import resource
+    import logging
+
+    # Keep progress bars and logs out of the benchmark output
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    logging.disable(logging.CRITICAL)
+
+    tools = load_tools()
+    args = {k: _format(v, dict(fixtures, out=out_dir)) for k, v in case["args"].items()}
+    start = time.perf_counter()
+    try:
+        result = tools[case["tool"]](**args)
+        error = None if result.get("success") else result.get("error", "tool returned success=false")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+
+    record = {"wall_seconds": wall, "error": error}
+    record.update(_output_stats(out_dir))
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    record["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+    record["peak_child_rss_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2**20
+    queue.put(record)
+
+
+def run_case(case: Dict[str, Any], fixtures: Dict[str, str], work_dir: str, repeat: int) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for i in range(repeat):
+        out_dir = os.path.join(work_dir, case["name"], str(i))
+        os.makedirs(out_dir, exist_ok=True)
+        for name in os.listdir(out_dir):
+            os.remove(os.path.join(out_dir, name))
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_case_child, args=(case, fixtures, out_dir, queue))
+        process.start()
+        process.join()
+        runs.append(queue.get() if not queue.empty() else {"error": f"worker exited with {process.exitcode}"})
+
+    ok = [run for run in runs if not run.get("error")]
+    summary = {"tool": case["tool"], "runs": len(runs), "success": len(ok) == len(runs)}
+    if not ok:
+        summary["error"] = runs[-1].get("error")
+        return summary
+    wall = statistics.median(run["wall_seconds"] for run in ok)
+    frames = ok[0].get("frames")
+    summary.update({
+        "wall_seconds": round(wall, 4),
+        "wall_seconds_min": round(min(run["wall_seconds"] for run in ok), 4),
+        "wall_seconds_max": round(max(run["wall_seconds"] for run in ok), 4),
+        "frames": frames,
+        "fps": round(frames / wall, 2) if frames and wall else None,
+        "megapixels_per_second": (round(frames * ok[0]["pixels_per_frame"] / wall / 1e6, 2)
+                                  if frames and ok[0].get("pixels_per_frame") and wall else None),
+        "peak_rss_mb": round(max(run["peak_rss_mb"] for run in ok), 1),
+        "peak_child_rss_mb": round(max(run["peak_child_rss_mb"] for run in ok), 1),
+        "bytes_written": ok[0]["bytes_written"],
+    })
+    if len(ok) != len(runs):
+        summary["error"] = next(run["error"] for run in runs if run.get("error"))
+    return summary
+
+
+def host_info() -> Dict[str, Any]:
+    from benchmarks.fixtures import ffmpeg_binary
+
+    info = {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+    try:
+        version = subprocess.run([ffmpeg_binary(), "-version"], capture_output=True, text=True).stdout
+        info["ffmpeg"] = version.splitlines()[0] if version else None
+    except OSError:
+        info["ffmpeg"] = None
+    try:
+        info["git_commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                            capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        info["git_commit"] = None
+    return info
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Compare median wall times against a baseline; returns one row per common case"""
+    rows = []
+    for name, case in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base or not case.get("wall_seconds") or not base.get("wall_seconds"):
+            continue
+        ratio = case["wall_seconds"] / base["wall_seconds"]
+        rows.append({
+            "case": name,
+            "baseline_seconds": base["wall_seconds"],
+            "seconds": case["wall_seconds"],
+            "change": round(ratio - 1, 4),
+            "regression": ratio > 1 + threshold,
+            "improvement": ratio < 1 - threshold,
+        })
+    return rows
+
+
+def _least_squares(points: List[tuple]) -> Optional[tuple]:
+    """Intercept and slope of the line through (x, y) points"""
+    if len({x for x, _ in points}) < 2:
+        return None
+    mean_x = statistics.mean(x for x, _ in points)
+    mean_y = statistics.mean(y for _, y in points)
+    slope = (sum((x - mean_x) * (y - mean_y) for x, y in points) /
+             sum((x - mean_x) ** 2 for x, _ in points))
+    return mean_y - slope * mean_x, slope
+
+
+def calibrate(results: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Throughput numbers for the render estimator, fitted on the video cases.
+
+    The resize_video cases write the same output from sources of different sizes, so the
+    time per frame against the source megapixels gives the decode rate (slope) and the
+    cost of compositing and encoding the output (intercept).
+    """
+    sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+    from benchmarks.fixtures import VIDEO_SIZES
+    from video_edit_mcp.estimator import DEFAULT_CALIBRATION
+    from video_edit_mcp.render import preview_resolution
+
+    cases = {case["name"]: case for case in CASES}
+    done = {name: r for name, r in results["cases"].items()
+            if r.get("wall_seconds") and not r.get("error") and name in cases}
+    sizes = {"{video_%s}" % name: size for name, size in VIDEO_SIZES.items()}
+    values: Dict[str, float] = {}
+
+    info = [r for r in done.values() if r["tool"] == "get_video_info"]
+    overhead = statistics.median(r["wall_seconds"] for r in info) if info else DEFAULT_CALIBRATION["overhead_seconds"]
+    if info:
+        values["overhead_seconds"] = round(overhead, 4)
+        values["base_rss_mb"] = min(r["peak_rss_mb"] for r in info)
+
+    composite_rate = DEFAULT_CALIBRATION["composite_mp_per_second"]
+    decode_rate = DEFAULT_CALIBRATION["decode_mp_per_second"]
+    points = []
+    preview_cases = []
+    for name, r in done.items():
+        case = cases[name]
+        if case["tool"] != "resize_video" or not r.get("frames"):
+            continue
+        source = sizes.get(case["args"]["video_path"])
+        if source is None:
+            continue
+        if case["args"].get("preview"):
+            preview_cases.append((case, r, source))
+        else:
+            per_frame = max(0.0, r["wall_seconds"] - overhead) / r["frames"]
+            points.append((source[0] * source[1] / 1e6, per_frame))
+    fit = _least_squares(points)
+    if fit and fit[0] > 0 and fit[1] > 0:
+        intercept, slope = fit
+        decode_rate = values["decode_mp_per_second"] = round(1 / slope, 2)
+        width, height = cases[next(n for n in done if cases[n]["tool"] == "resize_video")]["args"]["size"]
+        output_mp = width * height / 1e6
+        # The intercept pays for one composite pass and the encode of the output
+        encode_seconds = intercept - output_mp / composite_rate
+        values["encode_mp_per_second"] = round(output_mp / (encode_seconds if encode_seconds > 0 else intercept), 2)
+
+    preview_rates = []
+    for case, r, source in preview_cases:
+        width, height = preview_resolution(*case["args"]["size"])
+        output_mp = width * height / 1e6
+        # Without a proxy the whole source is decoded, at its own frame rate (30 fps fixtures)
+        decode = source[0] * source[1] / 1e6 * 30 * results["config"]["duration"] / decode_rate
+        encode_seconds = r["wall_seconds"] - overhead - decode - output_mp * r["frames"] / composite_rate
+        if encode_seconds > 0:
+            preview_rates.append(output_mp * r["frames"] / encode_seconds)
+    if preview_rates:
+        values["preview_encode_mp_per_second"] = round(statistics.median(preview_rates), 2)
+
+    bits = {False: [], True: []}
+    for name, r in done.items():
+        case = cases[name]
+        if (case["tool"] in ("resize_video", "merge_videos", "apply_effects") and "start" not in case["args"]
+                and r.get("frames") and r.get("megapixels_per_second")):
+            pixels = r["megapixels_per_second"] * 1e6 * r["wall_seconds"]
+            bits[bool(case["args"].get("preview"))].append(r["bytes_written"] * 8 / pixels)
+    if bits[False]:
+        values["bits_per_pixel"] = round(statistics.median(bits[False]), 4)
+    if bits[True]:
+        values["preview_bits_per_pixel"] = round(statistics.median(bits[True]), 4)
+    return values
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="*", help="Run only cases whose name contains or glob-matches these")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median wall time is reported")
+    parser.add_argument("--duration", type=float, default=3.0, help="Length of the fixture videos in seconds")
+    parser.add_argument("--fixtures", default=None, help="Fixture directory (default: VIDEO_MCP_BENCH_FIXTURES)")
+    parser.add_argument("--work-dir", default=None, help="Directory for rendered outputs")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown flagged as a regression")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    parser.add_argument("--calibrate", nargs="?", const="", default=None,
+                        help="Fit the render estimator's throughput numbers and write them here "
+                             "(default: VIDEO_MCP_CALIBRATION)")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.fixtures import generate_fixtures, DEFAULT_FIXTURE_DIR
+
+    cases = CASES
+    if args.cases:
+        cases = [c for c in CASES if any(p in c["name"] or fnmatch.fnmatch(c["name"], p) for p in args.cases)]
+    if args.list:
+        for case in cases:
+            print(f"{case['name']:40s} {case['tool']}")
+        return 0
+
+    fixture_dir = args.fixtures or DEFAULT_FIXTURE_DIR
+    print(f"Preparing fixtures in {fixture_dir}")
+    fixtures = generate_fixtures(fixture_dir, duration=args.duration)
+    work_dir = args.work_dir or os.path.join(fixture_dir, "..", "bench_outputs")
+
+    results = {
+        "schema": 1,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "host": host_info(),
+        "config": {"repeat": args.repeat, "duration": args.duration},
+        "cases": {},
+    }
+    for case in cases:
+        summary = run_case(case, fixtures, os.path.abspath(work_dir), args.repeat)
+        results["cases"][case["name"]] = summary
+        if summary.get("wall_seconds") is not None:
+            fps = f"{summary['fps']:8.1f} fps" if summary.get("fps") else " " * 12
+            print(f"{case['name']:40s} {summary['wall_seconds']:8.3f}s {fps} {summary['peak_rss_mb']:8.1f} MB"
+                  + (f"  ({summary['error']})" if summary.get("error") else ""))
+        else:
+            print(f"{case['name']:40s} FAILED: {summary.get('error')}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.calibrate is not None:
+        values = calibrate(results)
+        from video_edit_mcp.estimator import CALIBRATION_PATH
+        path = args.calibrate or CALIBRATION_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"created": results["created"], "host": results["host"], "values": values}, f, indent=2)
+        print(f"Calibration written to {path}: {values}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        regressions = [row for row in rows if row["regression"]]
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ("improved" if row["improvement"] else "")
+            print(f"{row['case']:40s} {row['baseline_seconds']:8.3f}s -> {row['seconds']:8.3f}s "
+                  f"{row['change'] * 100:+7.1f}% {flag}")
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold * 100:.0f}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Cold start report for the server: import cost per package and per startup phase.
+
+Each measurement runs in a fresh interpreter so nothing is cached in sys.modules.
+
+    python -m benchmarks.startup_report
+    python -m benchmarks.startup_report --repeat 5 --output startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Any, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import video_edit_mcp.main
+from video_edit_mcp import startup
+report = startup.report()
+report["import_seconds"] = round(time.perf_counter() - start, 4)
+print(json.dumps(report))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([os.path.join(REPO_ROOT, "src"), env.get("PYTHONPATH", "")])
+    env["PYTHONWARNINGS"] = "ignore"
+    return env
+
+
+def import_costs(module: str = "video_edit_mcp.main") -> List[Dict[str, Any]]:
+    """Self import time summed per top-level package for a cold import of `module` (uses -X importtime)"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               env=_env(), capture_output=True, text=True, check=True)
+    costs: Dict[str, Dict[str, Any]] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        try:
+            self_us = int(self_us)
+        except ValueError:
+            continue
+        parts = name.strip().split(".")
+        top = ".".join(parts[:2]) if parts[0] == "video_edit_mcp" else parts[0]
+        entry = costs.setdefault(top, {"package": top, "self_ms": 0.0, "modules": 0})
+        entry["self_ms"] += self_us / 1000
+        entry["modules"] += 1
+    rows = sorted(costs.values(), key=lambda row: row["self_ms"], reverse=True)
+    for row in rows:
+        row["self_ms"] = round(row["self_ms"], 1)
+    return rows
+
+
+def startup_phases() -> Dict[str, Any]:
+    """The server's own startup report (phases, deferred heavy modules) from a fresh process"""
+    completed = subprocess.run([sys.executable, "-c", REPORT_SNIPPET], env=_env(),
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="video_edit_mcp.main", help="Module to import cold")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold starts to take the median of")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages to list")
+    parser.add_argument("--output", default=None, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    runs = [startup_phases() for _ in range(args.repeat)]
+    costs = import_costs(args.module)
+    median_import = statistics.median(run["import_seconds"] for run in runs)
+    report = {
+        "import_seconds_median": median_import,
+        "import_seconds": [run["import_seconds"] for run in runs],
+        "phases": runs[-1]["phases"],
+        "heavy_modules_loaded": runs[-1]["heavy_modules_loaded"],
+        "packages": costs,
+    }
+
+    print(f"Cold import of {args.module}: {median_import * 1000:.0f} ms (median of {args.repeat})")
+    print("Phases:")
+    for item in report["phases"]:
+        print(f"  {item['phase']:<28} {item['seconds'] * 1000:8.1f} ms  +{item['modules_imported']} modules")
+    print("Import cost by package (self time):")
+    for row in costs[:args.top]:
+        print(f"  {row['package']:<28} {row['self_ms']:8.1f} ms  ({row['modules']} modules)")
+    loaded = [name for name, is_loaded in report["heavy_modules_loaded"].items() if is_loaded]
+    print(f"Heavy modules loaded at startup: {', '.join(loaded) or 'none'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
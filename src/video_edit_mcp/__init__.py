@@ -3,6 +3,12 @@
 __version__ = "0.1.1"
 
 
-from .main import mcp
+def __getattr__(name):
+    # Building the server is deferred so worker processes can import helper modules cheaply
+    if name == "mcp":
+        from .main import mcp
+        return mcp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ["mcp"] 
\ No newline at end of file
+
+__all__ = ["mcp"]
@@ -1,10 +1,11 @@
-from moviepy.editor import *
-from moviepy.audio.fx.all import audio_loop
-from moviepy.editor import CompositeAudioClip
 from typing import Dict, Any, List
 import os
 import logging
 from .utils import get_output_path, AudioStore
+from .startup import lazy_import
+
+# MoviePy is imported on the first tool call that uses it
+mpy = lazy_import("moviepy.editor")
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +16,7 @@ def register_audio_tools(mcp):
     def audio_info(audio_path:str) -> Dict[str,Any]:
         try:
             
-            audio = AudioFileClip(audio_path)
+            audio = AudioStore.load(audio_path)
             return{
                 "success": True,
                 "audio_info": {
@@ -119,7 +120,7 @@ def register_audio_tools(mcp):
             output_path = get_output_path(output_name)
             audio_1 = AudioStore.load(audio_path_1)
             audio_2 = AudioStore.load(audio_path_2)
-            concatenated_audio = concatenate_audioclips([audio_1, audio_2])
+            concatenated_audio = mpy.concatenate_audioclips([audio_1, audio_2])
             
             if return_path:
                 concatenated_audio.write_audiofile(output_path)
@@ -157,7 +158,7 @@ def register_audio_tools(mcp):
             
             output_path = get_output_path(output_name)
             audio = AudioStore.load(audio_path)
-            looped_audio = audio_loop(audio, duration=duration)
+            looped_audio = mpy.afx.audio_loop(audio, duration=duration)
             
             if return_path:
                 looped_audio.write_audiofile(output_path)
@@ -281,7 +282,7 @@ def register_audio_tools(mcp):
         try:
             output_path = get_output_path(output_name)
             audio_clips = [AudioStore.load(clips) for clips in audio_paths]
-            mixed_audio = CompositeAudioClip(audio_clips)
+            mixed_audio = mpy.CompositeAudioClip(audio_clips)
             mixed_audio.fps = 44100
             if return_path:
                     try:
@@ -0,0 +1,430 @@
+"""
+Warm pool of ffmpeg decoders shared by every clip opened from a path, and an LRU cache of
+decoded frames.
+
+`VideoFileClip(path)` probes the file and starts an ffmpeg process for the video and
+another for the audio. Here the first open of a file builds a template clip and moves
+its readers into the pool. Later opens are shallow copies of the template whose readers
+are handles that lease a live decoder from the pool on the first frame, and give it
+back when the clip is closed or garbage collected. Returned video decoders are rewound
+to the first frame in the background so the next render starts without a process spawn.
+Idle decoders beyond VIDEO_MCP_DECODER_POOL_SIZE live processes are closed, least
+recently used first. Audio files opened on their own share the audio decoders of the
+same file. Every decoder process holds one of the global process slots (resources.py).
+
+Decoded video frames are cached by (file version, resolution, frame index) up to
+VIDEO_MCP_FRAME_CACHE_MB, so repeated thumbnails, previews and overlapping renders of
+the same range do not decode the same frames twice.
+"""
+
+import os
+import copy
+import time
+import weakref
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from .startup import lazy_import
+from .media_probe import file_key
+from .resources import ProcessSlots, ResourceManager
+
+mpy = lazy_import("moviepy.editor")
+seeking = lazy_import(f"{__package__}.seeking")
+
+logger = logging.getLogger(__name__)
+
+# Live decoder processes kept around (idle ones are closed beyond this; leased ones never are)
+DECODER_POOL_SIZE = int(os.environ.get("VIDEO_MCP_DECODER_POOL_SIZE", "8"))
+FRAME_CACHE_MB = float(os.environ.get("VIDEO_MCP_FRAME_CACHE_MB", "256"))
+# Files whose probed template clip is kept
+TEMPLATE_LIMIT = 256
+# When out of process slots, decoders of clips that have not read a frame for this long are taken back
+LEASE_IDLE_SECONDS = 2.0
+
+# Reader state that belongs to one process and must not be copied into a new decoder
+_PROCESS_STATE = ("proc", "lastread", "pos", "buffer", "buffer_startframe")
+
+PoolKey = Tuple[Any, ...]
+
+
+class FrameCache:
+    """Byte-bounded LRU of decoded video frames"""
+    _lock = threading.Lock()
+    _frames: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+    _bytes = 0
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, key):
+        with cls._lock:
+            frame = cls._frames.get(key)
+            if frame is None:
+                cls.misses += 1
+                return None
+            cls._frames.move_to_end(key)
+            cls.hits += 1
+            return frame
+
+    @classmethod
+    def put(cls, key, frame):
+        limit = FRAME_CACHE_MB * 2**20
+        if frame.nbytes > limit:
+            return
+        with cls._lock:
+            if key in cls._frames:
+                return
+            cls._frames[key] = frame
+            cls._bytes += frame.nbytes
+            while cls._bytes > limit:
+                _, evicted = cls._frames.popitem(last=False)
+                cls._bytes -= evicted.nbytes
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {"frames": len(cls._frames), "bytes": cls._bytes, "limit_bytes": int(FRAME_CACHE_MB * 2**20),
+                    "hits": cls.hits, "misses": cls.misses}
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._frames.clear()
+            cls._bytes = 0
+
+
+class PooledReader:
+    """Stands in for a clip's reader; leases a decoder from the pool only while frames are read"""
+
+    def __init__(self, pool_key: PoolKey, reader_class, static: Dict[str, Any]):
+        self._pool_key = pool_key
+        self._reader_class = reader_class
+        self._static = static
+        self._reader = None
+        self._used = False
+        self._last_used = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def leased(self) -> bool:
+        return self._reader is not None
+
+    def _lease(self):
+        if self._reader is None:
+            self._reader = DecoderPool.acquire(self._pool_key, self._reader_class, self._static)
+            DecoderPool._leases.add(self)
+        return self._reader
+
+    def get_frame(self, t):
+        if self._pool_key[0] != "video":
+            with self._lock:
+                self._used = True
+                self._last_used = time.monotonic()
+                return self._lease().get_frame(t)
+        frame_key = self._pool_key[1:] + (int(self._static["fps"] * t + 0.00001),)
+        frame = FrameCache.get(frame_key)
+        if frame is None:
+            with self._lock:
+                self._used = True
+                self._last_used = time.monotonic()
+                frame = self._lease().get_frame(t)
+            FrameCache.put(frame_key, frame)
+        return frame
+
+    def close(self):
+        with self._lock:
+            reader, self._reader = self._reader, None
+            used, self._used = self._used, False
+        if reader is not None:
+            DecoderPool._leases.discard(self)
+            DecoderPool.release(self._pool_key, reader, used)
+
+    def preempt(self, idle_seconds: float) -> bool:
+        """Stop the leased decoder if no frame was read for `idle_seconds`; the next read leases another"""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if self._reader is None or time.monotonic() - self._last_used < idle_seconds:
+                return False
+            reader, self._reader = self._reader, None
+            self._used = False
+        finally:
+            self._lock.release()
+        DecoderPool._leases.discard(self)
+        DecoderPool.discard(reader)
+        return True
+
+    # AudioFileClip.close() calls this name
+    close_proc = close
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        # Probed attributes (fps, size, nframes, infos, ...) do not need a live decoder
+        if name in self._static:
+            return self._static[name]
+        if hasattr(self._reader_class, name):
+            return getattr(self._lease(), name)
+        raise AttributeError(name)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _start(reader):
+    """Start a decoder process positioned at the beginning of the file"""
+    reader.initialize()
+    if hasattr(reader, "read_frame"):
+        reader.pos = 1
+        reader.lastread = reader.read_frame()
+    else:
+        reader.buffer = None
+        reader.buffer_startframe = 1
+        reader.buffer_around(1)
+    return reader
+
+
+def _stop(reader):
+    try:
+        if hasattr(reader, "close_proc"):
+            reader.close_proc()
+        else:
+            reader.close()
+    except Exception as e:
+        logger.debug(f"Error closing decoder: {e}")
+    finally:
+        ProcessSlots.release("decoder")
+
+
+class DecoderPool:
+    """Idle decoders per (kind, file version, resolution), shared by all clips of that file"""
+    _lock = threading.RLock()
+    _templates: "OrderedDict[PoolKey, Dict[str, Any]]" = OrderedDict()
+    # id(reader) -> (pool key, reader), least recently released first
+    _idle: "OrderedDict[int, Tuple[PoolKey, Any]]" = OrderedDict()
+    _live = 0
+    _leased = 0
+    # Handles currently holding a decoder
+    _leases: "weakref.WeakSet[PooledReader]" = weakref.WeakSet()
+    _warmer: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def open_clip(cls, path: str, target_resolution: Optional[Tuple[Optional[int], Optional[int]]] = None):
+        """A VideoFileClip of `path` whose video and audio decoders come from the pool"""
+        resolution = tuple(target_resolution) if target_resolution else None
+        key = file_key(path)
+        template = cls._template(("video",) + key + (resolution,), lambda: cls._make_video_template(path, resolution))
+
+        clip = copy.copy(template["clip"])
+        video = PooledReader(("video",) + key + (resolution,), template["video_class"], template["video_static"])
+        clip.reader = ResourceManager.track(video)
+        clip.make_frame = lambda t: video.get_frame(t)
+        if template["clip"].audio is not None:
+            clip.audio = cls._audio_copy(template["clip"].audio, key, template)
+        return clip
+
+    @classmethod
+    def open_audio(cls, path: str):
+        """An AudioFileClip of `path` whose decoder comes from the pool"""
+        key = file_key(path)
+        template = cls._template(("audio",) + key, lambda: cls._make_audio_template(path))
+        return cls._audio_copy(template["clip"], key, template)
+
+    @classmethod
+    def _audio_copy(cls, template_clip, key: Tuple[str, int, int], template: Dict[str, Any]):
+        # Audio decoders do not depend on the video resolution, so all opens of a file share them
+        audio = PooledReader(("audio",) + key, template["audio_class"], template["audio_static"])
+        clip = copy.copy(template_clip)
+        clip.reader = ResourceManager.track(audio)
+        clip.make_frame = lambda t: audio.get_frame(t)
+        return clip
+
+    @classmethod
+    def _template(cls, template_key: PoolKey, make) -> Dict[str, Any]:
+        with cls._lock:
+            template = cls._templates.get(template_key)
+            if template is not None:
+                cls._templates.move_to_end(template_key)
+                return template
+        # Opening the file starts its video and audio decoders right away
+        ProcessSlots.acquire("decoder", 2)
+        try:
+            template, readers = make()
+        except Exception:
+            ProcessSlots.release("decoder", 2)
+            raise
+        ProcessSlots.release("decoder", 2 - len(readers))
+
+        with cls._lock:
+            cls._templates[template_key] = template
+            while len(cls._templates) > TEMPLATE_LIMIT:
+                cls._templates.popitem(last=False)
+            # They become the first idle decoders of the file
+            for pool_key, reader in readers:
+                cls._live += 1
+                cls._idle[id(reader)] = (pool_key, reader)
+        cls._evict()
+        return template
+
+    @classmethod
+    def _make_video_template(cls, path: str, resolution):
+        clip = seeking.index_reader(mpy.VideoFileClip(path, target_resolution=resolution), path)
+        key = file_key(path)
+        template = {
+            "clip": clip,
+            "video_class": type(clip.reader),
+            "video_static": {k: v for k, v in vars(clip.reader).items() if k not in _PROCESS_STATE},
+        }
+        readers = [(("video",) + key + (resolution,), clip.reader)]
+        if clip.audio is not None:
+            template["audio_class"] = type(clip.audio.reader)
+            template["audio_static"] = {k: v for k, v in vars(clip.audio.reader).items() if k not in _PROCESS_STATE}
+            readers.append((("audio",) + key, clip.audio.reader))
+            clip.audio.reader = None
+        clip.reader = None
+        return template, readers
+
+    @classmethod
+    def _make_audio_template(cls, path: str):
+        clip = mpy.AudioFileClip(path)
+        template = {
+            "clip": clip,
+            "audio_class": type(clip.reader),
+            "audio_static": {k: v for k, v in vars(clip.reader).items() if k not in _PROCESS_STATE},
+        }
+        readers = [(("audio",) + file_key(path), clip.reader)]
+        clip.reader = None
+        return template, readers
+
+    @classmethod
+    def acquire(cls, pool_key: PoolKey, reader_class, static: Dict[str, Any]):
+        with cls._lock:
+            cls._leased += 1
+            for reader_id in reversed(cls._idle):
+                key, reader = cls._idle[reader_id]
+                if key == pool_key:
+                    del cls._idle[reader_id]
+                    return reader
+        try:
+            ProcessSlots.acquire("decoder")
+        except Exception:
+            with cls._lock:
+                cls._leased -= 1
+            raise
+        with cls._lock:
+            cls._live += 1
+        try:
+            # Same probed attributes as the template's reader, new process
+            reader = reader_class.__new__(reader_class)
+            reader.__dict__.update(static)
+            reader.proc = None
+            return _start(reader)
+        except Exception:
+            with cls._lock:
+                cls._live -= 1
+                cls._leased -= 1
+            ProcessSlots.release("decoder")
+            raise
+
+    @classmethod
+    def release(cls, pool_key: PoolKey, reader, used: bool = True):
+        with cls._lock:
+            cls._leased -= 1
+        if used:
+            # Rewind in the background so the next lease starts like a freshly opened clip
+            # (MoviePy's audio reader returns slightly different samples after a seek back)
+            cls._warm_pool().submit(cls._rewind, pool_key, reader)
+        else:
+            cls._park(pool_key, reader)
+
+    @classmethod
+    def _rewind(cls, pool_key: PoolKey, reader):
+        try:
+            _start(reader)
+        except Exception as e:
+            logger.debug(f"Could not rewind decoder for {pool_key[1]}: {e}")
+            _stop(reader)
+            with cls._lock:
+                cls._live -= 1
+            return
+        cls._park(pool_key, reader)
+
+    @classmethod
+    def _park(cls, pool_key: PoolKey, reader):
+        with cls._lock:
+            cls._idle[id(reader)] = (pool_key, reader)
+        cls._evict()
+
+    @classmethod
+    def _evict(cls):
+        evicted = []
+        with cls._lock:
+            while cls._live > DECODER_POOL_SIZE and cls._idle:
+                _, (_, reader) = cls._idle.popitem(last=False)
+                cls._live -= 1
+                evicted.append(reader)
+        for reader in evicted:
+            _stop(reader)
+
+    @classmethod
+    def discard(cls, reader):
+        """Stop a leased decoder instead of returning it"""
+        with cls._lock:
+            cls._leased -= 1
+            cls._live -= 1
+        _stop(reader)
+
+    @classmethod
+    def reclaim_idle(cls) -> bool:
+        """Free a process slot: close the least recently used idle decoder, else take back a stale lease"""
+        with cls._lock:
+            if cls._idle:
+                _, (_, reader) = cls._idle.popitem(last=False)
+                cls._live -= 1
+            else:
+                reader = None
+        if reader is not None:
+            _stop(reader)
+            return True
+        # e.g. the earlier clips of a long merge, whose decoders sit unused until the clip is closed
+        for handle in sorted(list(cls._leases), key=lambda h: h._last_used):
+            if handle.preempt(LEASE_IDLE_SECONDS):
+                return True
+        return False
+
+    @classmethod
+    def _warm_pool(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._warmer is None:
+                cls._warmer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decoder-warm")
+            return cls._warmer
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {"live": cls._live, "idle": len(cls._idle), "leased": cls._leased,
+                    "limit": DECODER_POOL_SIZE, "files": len(cls._templates)}
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            warmer, cls._warmer = cls._warmer, None
+        if warmer is not None:
+            # Let in-flight rewinds park their decoders first so they are closed below
+            warmer.shutdown(wait=True)
+        with cls._lock:
+            idle = [reader for _, reader in cls._idle.values()]
+            cls._idle.clear()
+            cls._live -= len(idle)
+            cls._templates.clear()
+        for reader in idle:
+            _stop(reader)
+
+
+ProcessSlots.add_reclaimer(DecoderPool.reclaim_idle)
@@ -1,8 +1,10 @@
-import yt_dlp
 import os
 import logging
 from typing import Dict, Any, Optional, List
 from .utils import VideoStore, AudioStore
+from .startup import lazy_import
+
+yt_dlp = lazy_import("yt_dlp")
 
 logger = logging.getLogger(__name__)
 
@@ -1,3 +0,0 @@
-# FX
-
-import src.video_edit_mcp.editorpy.image.fx.all as ifx
\ No newline at end of file
@@ -0,0 +1,6 @@
+import numpy as np
+
+
+def blackwhite(mean):
+    # 三个通道取平均（与 moviepy 的 blackwhite 相同）
+    return np.full((3, 3), 1.0 / 3), np.zeros(3)
@@ -1,6 +1,6 @@
 import cv2
 
 
-def blur(clip, kernel_size=(15, 15)):
-    blurred_frame = cv2.GaussianBlur(clip, kernel_size, sigmaX=2, sigmaY=2)
-    return blurred_frame
\ No newline at end of file
+def blur(frame, kernel_size=15):
+    kernel_size = int(kernel_size) | 1
+    return cv2.GaussianBlur(frame, (kernel_size, kernel_size), sigmaX=2, sigmaY=2)
@@ -0,0 +1,6 @@
+import numpy as np
+
+
+def brightness(mean, factor=1.0):
+    # 每个通道乘以 factor（与 moviepy 的 colorx 相同）
+    return np.eye(3) * factor, np.zeros(3)
@@ -1,7 +1,6 @@
 import numpy as np
 
 
-def contrast(clip, factor):
-    return clip.fl_image(lambda pic: 
-        (np.mean(pic, axis=(0, 1)) + factor * (pic.astype(np.float32) - np.mean(pic, axis=(0, 1))))
-        .clip(0, 255).astype(np.uint8))
\ No newline at end of file
+def contrast(mean, factor=1.0):
+    # 以画面各通道均值为中心拉伸: mean + factor * (pic - mean)
+    return np.eye(3) * factor, (1.0 - factor) * np.asarray(mean, dtype=np.float64)
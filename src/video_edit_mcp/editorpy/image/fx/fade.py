@@ -0,0 +1,13 @@
+import cv2
+
+
+def fade(frame, t, clip_duration=None, fade_in=0.0, fade_out=0.0):
+    # 开头从黑色淡入、结尾淡出到黑色
+    level = 1.0
+    if fade_in > 0 and t < fade_in:
+        level = min(level, t / fade_in)
+    if fade_out > 0 and clip_duration is not None and t > clip_duration - fade_out:
+        level = min(level, max(0.0, (clip_duration - t) / fade_out))
+    if level >= 1.0:
+        return frame
+    return cv2.convertScaleAbs(frame, alpha=level)
@@ -0,0 +1,7 @@
+import numpy as np
+
+
+def gamma(gamma=1.0):
+    # 查找表: 255 * (v / 255) ** (1 / gamma)
+    values = np.arange(256) / 255.0
+    return np.clip(255.0 * values ** (1.0 / gamma) + 0.5, 0, 255).astype(np.uint8)
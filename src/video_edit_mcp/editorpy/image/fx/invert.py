@@ -0,0 +1,5 @@
+import numpy as np
+
+
+def invert(mean):
+    return -np.eye(3), np.full(3, 255.0)
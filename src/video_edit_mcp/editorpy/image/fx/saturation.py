@@ -1,8 +1,9 @@
 import numpy as np
 
+LUMA = np.array([0.2989, 0.5870, 0.1140])
 
-def saturation(clip, factor):
-    return clip.fl_image(lambda pic: 
-        (np.dot(pic[..., :3], [0.2989, 0.5870, 0.1140])[:, :, np.newaxis] + 
-         factor * (pic.astype(np.float32) - np.dot(pic[..., :3], [0.2989, 0.5870, 0.1140])[:, :, np.newaxis]))
-        .clip(0, 255).astype(np.uint8))
\ No newline at end of file
+
+def saturation(mean, factor=1.0):
+    # gray + factor * (pic - gray)，gray 为亮度
+    gray = np.outer(np.ones(3), LUMA)
+    return factor * np.eye(3) + (1.0 - factor) * gray, np.zeros(3)
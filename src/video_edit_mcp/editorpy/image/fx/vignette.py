@@ -0,0 +1,19 @@
+import numpy as np
+
+# 每种画面尺寸的遮罩只计算一次
+_masks = {}
+
+
+def vignette(frame, strength=0.5):
+    # 从中心向四角逐渐变暗
+    h, w = frame.shape[:2]
+    key = (h, w, strength)
+    mask = _masks.get(key)
+    if mask is None:
+        y = np.linspace(-1.0, 1.0, h, dtype=np.float32)[:, None]
+        x = np.linspace(-1.0, 1.0, w, dtype=np.float32)[None, :]
+        mask = np.clip(1.0 - strength * (x * x + y * y) / 2.0, 0.0, 1.0)[..., None]
+        if len(_masks) >= 8:
+            _masks.clear()
+        _masks[key] = mask
+    return (frame * mask).astype(np.uint8)
@@ -0,0 +1,441 @@
+"""
+Declarative registry of the editorpy frame effects.
+
+Every effect declares its kind, parameters and cost hints up front; the implementation
+module under `editorpy/image/fx` is only imported the first time the effect is used.
+The kind fixes the calling convention of the implementation and what the chain
+planner may do with it:
+
+- linear: `fn(mean, **params) -> (3x3 matrix, offset)`, a per-pixel colour affine. Adjacent
+  linear effects are fused into one matrix applied in a single pass, as long as every
+  effect but the last maps [0, 255] into itself (otherwise the clamp in between matters).
+  `mean` is the per-channel mean of the effect's input frame (only computed when `needs_mean`).
+- lut: `fn(**params) -> uint8 table` of shape (256,) or (256, 3). Adjacent LUTs are composed.
+- kernel: `fn(frame, **params) -> frame`, a spatial neighbourhood filter. Large frames are
+  split into row tiles (with `radius` rows of overlap) and filtered in parallel when
+  the effect is `tileable` and its estimated cost makes it worthwhile.
+- time: `fn(frame, t, clip_duration, **params) -> frame`, depends on the frame time.
+"""
+
+import os
+import logging
+import importlib
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from .startup import lazy_import
+
+logger = logging.getLogger(__name__)
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+LINEAR = "linear"
+LUT = "lut"
+KERNEL = "kernel"
+TIME = "time"
+KINDS = (LINEAR, LUT, KERNEL, TIME)
+
+# Threads used to filter tiles of one frame (cv2 releases the GIL while filtering)
+FX_WORKERS = int(os.environ.get("VIDEO_MCP_FX_WORKERS", str(os.cpu_count() or 1)))
+# Only split a kernel effect into tiles when one frame is estimated to take longer than this
+FX_PARALLEL_MIN_MS = float(os.environ.get("VIDEO_MCP_FX_PARALLEL_MIN_MS", "8"))
+
+_FX_PACKAGE = f"{__package__}.editorpy.image.fx"
+
+
+@dataclass(frozen=True)
+class Param:
+    name: str
+    type: type = float
+    default: Any = None
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    description: str = ""
+
+    def coerce(self, effect: str, value: Any) -> Any:
+        try:
+            value = self.type(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{effect}: {self.name} must be a {self.type.__name__}, got {value!r}")
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"{effect}: {self.name} must be >= {self.minimum}, got {value}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"{effect}: {self.name} must be <= {self.maximum}, got {value}")
+        return value
+
+
+@dataclass(frozen=True)
+class EffectSpec:
+    name: str
+    kind: str
+    description: str
+    params: Tuple[Param, ...] = ()
+    # Rough single-thread cost in milliseconds per megapixel
+    cost_ms_per_mp: float = 1.0
+    # Neighbourhood radius in pixels (kernel effects), i.e. the overlap tiles need
+    radius: int = 0
+    # Whether filtering row tiles independently gives the same result as the whole frame
+    tileable: bool = True
+    # Linear effects whose matrix depends on the mean colour of the input frame
+    needs_mean: bool = False
+    aliases: Tuple[str, ...] = ()
+
+    def load(self):
+        """Import the implementation on first use"""
+        return getattr(importlib.import_module(f"{_FX_PACKAGE}.{self.name}"), self.name)
+
+    def bind(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Validate user parameters and fill in defaults"""
+        params = dict(params or {})
+        known = {p.name: p for p in self.params}
+        unknown = sorted(set(params) - set(known))
+        if unknown:
+            raise ValueError(f"{self.name}: unknown parameter(s) {unknown}, expected {sorted(known) or 'none'}")
+        bound = {}
+        for name, param in known.items():
+            bound[name] = param.coerce(self.name, params[name]) if name in params else param.default
+        return bound
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "description": self.description,
+            "params": [
+                {"name": p.name, "type": p.type.__name__, "default": p.default,
+                 "min": p.minimum, "max": p.maximum, "description": p.description}
+                for p in self.params
+            ],
+            "cost_ms_per_mp": self.cost_ms_per_mp,
+            "radius": self.radius,
+            "tileable": self.tileable,
+            "aliases": list(self.aliases),
+        }
+
+
+EFFECTS: Dict[str, EffectSpec] = {}
+_ALIASES: Dict[str, str] = {}
+_loaded: Dict[str, Any] = {}
+_load_lock = threading.Lock()
+
+
+def register(spec: EffectSpec) -> EffectSpec:
+    if spec.kind not in KINDS:
+        raise ValueError(f"Unknown effect kind {spec.kind!r}, expected one of {KINDS}")
+    EFFECTS[spec.name] = spec
+    for alias in spec.aliases:
+        _ALIASES[alias] = spec.name
+    return spec
+
+
+def _factor(description: str, maximum: float = 10.0) -> Param:
+    return Param("factor", float, 1.0, 0.0, maximum, description)
+
+
+for _spec in (
+    EffectSpec("brightness", LINEAR, "Scale all channels", (_factor("1.0 keeps the image, 0 is black"),),
+               cost_ms_per_mp=1.5),
+    EffectSpec("contrast", LINEAR, "Stretch colours around the frame's mean colour",
+               (_factor("1.0 keeps the image, 0 is flat"),), cost_ms_per_mp=1.5, needs_mean=True),
+    EffectSpec("saturation", LINEAR, "Blend between greyscale and the image",
+               (_factor("1.0 keeps the image, 0 is greyscale"),), cost_ms_per_mp=1.5),
+    EffectSpec("sepia", LINEAR, "Warm brown tone", cost_ms_per_mp=1.5),
+    EffectSpec("blackwhite", LINEAR, "Average the channels to grey", cost_ms_per_mp=1.5,
+               aliases=("grayscale", "greyscale")),
+    EffectSpec("invert", LINEAR, "Negative image", cost_ms_per_mp=1.5, aliases=("invert_colors",)),
+    EffectSpec("gamma", LUT, "Gamma curve applied per channel",
+               (Param("gamma", float, 1.0, 0.05, 10.0, "> 1 brightens midtones, < 1 darkens them"),),
+               cost_ms_per_mp=4.5),
+    EffectSpec("blur", KERNEL, "Gaussian blur",
+               (Param("kernel_size", int, 15, 1, 101, "Kernel width in pixels (made odd)"),),
+               cost_ms_per_mp=8.5, radius=50),
+    EffectSpec("sharpen", KERNEL, "3x3 sharpening kernel", cost_ms_per_mp=4.0, radius=1),
+    EffectSpec("emboss", KERNEL, "3x3 emboss blended with the image", cost_ms_per_mp=5.0, radius=1),
+    EffectSpec("edge_detect", KERNEL, "Canny edges, dark on white", cost_ms_per_mp=6.0, radius=2,
+               tileable=False),
+    EffectSpec("sketch", KERNEL, "Pencil sketch (colour dodge of a blurred negative)", cost_ms_per_mp=8.0,
+               radius=10),
+    EffectSpec("vignette", KERNEL, "Darken towards the corners",
+               (Param("strength", float, 0.5, 0.0, 1.0, "0 is no darkening, 1 black corners"),),
+               cost_ms_per_mp=8.0, tileable=False),
+    EffectSpec("fade", TIME, "Fade in from and out to black",
+               (Param("fade_in", float, 0.0, 0.0, None, "Seconds of fade in at the start"),
+                Param("fade_out", float, 0.0, 0.0, None, "Seconds of fade out at the end")),
+               cost_ms_per_mp=1.5),
+):
+    register(_spec)
+
+
+def get_effect(name: str) -> EffectSpec:
+    key = name.strip().lower()
+    spec = EFFECTS.get(_ALIASES.get(key, key))
+    if spec is None:
+        raise ValueError(f"Unknown effect {name!r}, available: {', '.join(sorted(EFFECTS))}")
+    return spec
+
+
+def list_effects() -> List[Dict[str, Any]]:
+    return [spec.describe() for spec in EFFECTS.values()]
+
+
+def _implementation(spec: EffectSpec):
+    fn = _loaded.get(spec.name)
+    if fn is None:
+        with _load_lock:
+            fn = _loaded.get(spec.name)
+            if fn is None:
+                fn = _loaded[spec.name] = spec.load()
+    return fn
+
+
+EffectStep = Union[str, Dict[str, Any]]
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(name: str) -> ThreadPoolExecutor:
+    """Shared worker pools: 'tile' splits one frame, 'frame' runs whole frames concurrently"""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ThreadPoolExecutor(max_workers=FX_WORKERS, thread_name_prefix=f"fx-{name}")
+        return pool
+
+
+@dataclass
+class Stage:
+    kind: str
+    effects: List[Tuple[EffectSpec, Dict[str, Any]]]
+    estimated_ms: float = 0.0
+    tiles: int = 1
+    # Precomputed fused affine (3x4) or composed LUT when it does not depend on the frame
+    constant: Any = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "effects": [spec.name for spec, _ in self.effects],
+            "fused": len(self.effects) > 1,
+            "tiles": self.tiles,
+            "estimated_ms": round(self.estimated_ms, 2),
+        }
+
+
+@dataclass
+class EffectChain:
+    """An ordered list of effects compiled into fused stages for a given frame size"""
+    steps: List[Tuple[EffectSpec, Dict[str, Any]]]
+    frame_size: Optional[Tuple[int, int]] = None
+    clip_duration: Optional[float] = None
+    stages: List[Stage] = field(default_factory=list)
+
+    @property
+    def is_time_varying(self) -> bool:
+        return any(spec.kind == TIME for spec, _ in self.steps)
+
+    def plan(self) -> List[Dict[str, Any]]:
+        return [stage.describe() for stage in self.stages]
+
+    def apply(self, frame, t: float = 0.0):
+        for stage in self.stages:
+            frame = _run_stage(stage, frame, t, self.clip_duration)
+        return frame
+
+    def estimated_ms(self) -> float:
+        return sum(stage.estimated_ms for stage in self.stages)
+
+
+def parse_steps(steps: List[EffectStep]) -> List[Tuple[EffectSpec, Dict[str, Any]]]:
+    """Accepts names or {"name": ..., **params} / {"name": ..., "params": {...}} dicts"""
+    parsed = []
+    for step in steps:
+        if isinstance(step, str):
+            name, params = step, {}
+        elif isinstance(step, dict) and step.get("name"):
+            params = dict(step.get("params") or {k: v for k, v in step.items() if k != "name"})
+            name = step["name"]
+        else:
+            raise ValueError(f"Effect steps must be a name or a dict with a 'name', got {step!r}")
+        spec = get_effect(name)
+        parsed.append((spec, spec.bind(params)))
+    return parsed
+
+
+def compile_chain(steps: List[EffectStep], frame_size: Optional[Tuple[int, int]] = None,
+                  clip_duration: Optional[float] = None, workers: Optional[int] = None) -> EffectChain:
+    """Validate a chain and group it into stages: fuse adjacent linear/LUT effects, tile heavy kernels"""
+    chain = EffectChain(parse_steps(steps), frame_size, clip_duration)
+    megapixels = (frame_size[0] * frame_size[1] / 1e6) if frame_size else 1.0
+    workers = FX_WORKERS if workers is None else workers
+
+    for spec, params in chain.steps:
+        previous = chain.stages[-1] if chain.stages else None
+        if previous and spec.kind in (LINEAR, LUT) and previous.kind == spec.kind:
+            if spec.kind == LUT or _preserves_range(*previous.effects[-1]):
+                previous.effects.append((spec, params))
+                continue
+        chain.stages.append(Stage(spec.kind, [(spec, params)]))
+
+    for stage in chain.stages:
+        if stage.kind in (LINEAR, LUT):
+            # A fused stage is a single pass over the frame whatever the number of effects
+            stage.estimated_ms = max(spec.cost_ms_per_mp for spec, _ in stage.effects) * megapixels
+        else:
+            stage.estimated_ms = sum(spec.cost_ms_per_mp for spec, _ in stage.effects) * megapixels
+        if stage.kind == LINEAR and not any(spec.needs_mean for spec, _ in stage.effects):
+            stage.constant = _fuse_affine(stage.effects, None)
+        elif stage.kind == LUT:
+            stage.constant = _compose_luts(stage.effects)
+        elif stage.kind == KERNEL:
+            spec, _ = stage.effects[0]
+            if spec.tileable and workers > 1 and stage.estimated_ms >= FX_PARALLEL_MIN_MS and frame_size:
+                rows = frame_size[1]
+                # Keep every tile well above the overlap it has to recompute
+                stage.tiles = max(1, min(workers, rows // max(64, 4 * spec.radius)))
+                stage.estimated_ms /= stage.tiles
+    return chain
+
+
+def _preserves_range(spec: EffectSpec, params: Dict[str, Any]) -> bool:
+    """Whether a linear effect keeps every input in [0, 255] inside [0, 255], so no clamp is lost by fusing"""
+    means = [np.full(3, 0.0), np.full(3, 255.0)] if spec.needs_mean else [None]
+    for mean in means:
+        m, b = _implementation(spec)(mean, **params)
+        m = np.asarray(m, dtype=np.float64)
+        low = b + 255.0 * np.minimum(m, 0).sum(axis=1)
+        high = b + 255.0 * np.maximum(m, 0).sum(axis=1)
+        if low.min() < -1e-6 or high.max() > 255.0 + 1e-6:
+            return False
+    return True
+
+
+def _fuse_affine(effects, mean):
+    """Compose linear effects into one 3x4 matrix; `mean` is propagated through the chain"""
+    matrix = np.eye(3)
+    offset = np.zeros(3)
+    for spec, params in effects:
+        m, b = _implementation(spec)(mean, **params)
+        matrix = m @ matrix
+        offset = m @ offset + b
+        if mean is not None:
+            mean = m @ mean + b
+    return np.hstack([matrix, offset[:, None]])
+
+
+def _compose_luts(effects):
+    table = np.tile(np.arange(256, dtype=np.uint8)[:, None], (1, 3))
+    for spec, params in effects:
+        lut = _implementation(spec)(**params)
+        if lut.ndim == 1:
+            lut = np.tile(lut[:, None], (1, 3))
+        table = np.stack([lut[table[:, c], c] for c in range(3)], axis=1)
+    return table
+
+
+def _run_stage(stage: Stage, frame, t: float, clip_duration: Optional[float]):
+    if stage.kind == LINEAR:
+        affine = stage.constant
+        if affine is None:
+            mean = np.array(cv2.mean(frame)[:3])
+            affine = _fuse_affine(stage.effects, mean)
+        # cv2.transform rounds and saturates to uint8 in the same pass
+        return cv2.transform(np.ascontiguousarray(frame[..., :3]), affine)
+    if stage.kind == LUT:
+        return cv2.LUT(np.ascontiguousarray(frame[..., :3]), stage.constant.reshape(256, 1, 3))
+    spec, params = stage.effects[0]
+    fn = _implementation(spec)
+    if stage.kind == TIME:
+        return fn(frame, t, clip_duration, **params)
+    if stage.tiles > 1:
+        return _run_tiled(fn, frame, params, spec.radius, stage.tiles)
+    return fn(frame, **params)
+
+
+def _run_tiled(fn, frame, params, radius: int, tiles: int):
+    height = frame.shape[0]
+    bounds = [(height * i // tiles, height * (i + 1) // tiles) for i in range(tiles)]
+    out = np.empty_like(frame)
+
+    def work(bound):
+        start, end = bound
+        top, bottom = max(0, start - radius), min(height, end + radius)
+        filtered = fn(frame[top:bottom], **params)
+        out[start:end] = filtered[start - top:start - top + (end - start)]
+
+    list(_pool("tile").map(work, bounds))
+    return out
+
+
+class FrameExecutor:
+    """
+    Frame function (for clip.fl) running an effect chain over consecutive frames in parallel.
+
+    Frames are decoded in order in the calling (writer) thread, which MoviePy readers require,
+    and the chain runs on the frame pool for up to `lookahead` frames ahead of the one being
+    encoded. Frames outside [start, end] are passed through untouched.
+    """
+
+    def __init__(self, chain: EffectChain, fps: Optional[float], start: float = 0.0, end: Optional[float] = None,
+                 duration: Optional[float] = None, workers: int = 1, lookahead: Optional[int] = None,
+                 time_offset: float = 0.0):
+        self.chain = chain
+        self.fps = fps
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.workers = workers
+        self.lookahead = lookahead if lookahead is not None else 2 * workers
+        self.time_offset = time_offset
+        self._pending: Dict[int, Any] = {}
+        self._next = 0
+
+    def _in_range(self, t: float) -> bool:
+        return t >= self.start - 1e-9 and (self.end is None or t <= self.end + 1e-9)
+
+    def __call__(self, get_frame, t: float):
+        if not self._in_range(t):
+            return get_frame(t)
+        if self.workers <= 1 or not self.fps:
+            return self.chain.apply(get_frame(t), t + self.time_offset)
+        index = int(round(t * self.fps))
+        if abs(index / self.fps - t) > 1e-6:
+            # Off-grid request (thumbnail, preview seek): compute it directly
+            return self.chain.apply(get_frame(t), t + self.time_offset)
+        if index not in self._pending and index < self._next:
+            # Rendering restarted or seeked backwards
+            self._pending.clear()
+            self._next = index
+        for stale in [i for i in self._pending if i < index]:
+            del self._pending[stale]
+        self._next = max(self._next, index)
+        last = index + self.lookahead
+        while self._next <= last:
+            frame_t = self._next / self.fps
+            if not self._in_range(frame_t) or (self.duration is not None and frame_t >= self.duration):
+                break
+            self._pending[self._next] = _pool("frame").submit(
+                self.chain.apply, get_frame(frame_t), frame_t + self.time_offset)
+            self._next += 1
+        future = self._pending.pop(index, None)
+        if future is None:
+            return self.chain.apply(get_frame(t), t + self.time_offset)
+        return future.result()
+
+
+def apply_to_clip(clip, steps: List[EffectStep], start: float = 0.0, end: Optional[float] = None,
+                  workers: Optional[int] = None, time_offset: float = 0.0,
+                  clip_duration: Optional[float] = None) -> Tuple[Any, EffectChain]:
+    """Apply an effect chain to the frames of `clip` between start and end (seconds, clip time)"""
+    workers = FX_WORKERS if workers is None else workers
+    fps = getattr(clip, "fps", None)
+    # Whole frames in parallel beat tiling one frame at a time; never do both
+    frame_parallel = workers > 1 and bool(fps)
+    chain = compile_chain(steps, tuple(clip.size), clip_duration or clip.duration,
+                          workers=1 if frame_parallel else workers)
+    executor = FrameExecutor(chain, fps, start, end, clip.duration, workers if frame_parallel else 1,
+                             time_offset=time_offset)
+    return clip.fl(executor), chain
@@ -0,0 +1,143 @@
+"""
+Encoder settings shared by every tool that writes a video.
+
+A tool's `encoding` argument is the name of a profile or an object naming a profile
+plus explicit settings, which win over the profile's:
+
+    "archive"
+    {"profile": "balanced", "preset": "slow", "crf": 20, "threads": 4, "gop": 48, "pix_fmt": "yuv420p"}
+
+Renders without one use VIDEO_MCP_ENCODING_PROFILE (drafts use fast-preview). Unless
+`threads` is given, the render scheduler allots the encoder's threads when the render is
+admitted: an even share of the CPU budget among the renders running and queued. A
+requested `threads` above the budget (VIDEO_MCP_RENDER_CPUS) is reduced to it, and the
+render's result notes the reduction.
+"""
+
+import os
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CRF = os.environ.get("VIDEO_MCP_PREVIEW_CRF", "30")
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # Drafts: fastest encode, small decoder cost when scrubbing
+    "fast-preview": {"preset": "ultrafast", "crf": float(PREVIEW_CRF), "tune": "fastdecode"},
+    # x264's own defaults
+    "balanced": {"preset": "medium", "crf": 23},
+    # Visually lossless masters, 4 s keyframe interval at 30 fps for efficient long GOPs
+    "archive": {"preset": "slow", "crf": 17, "gop": 120},
+}
+DEFAULT_PROFILE = os.environ.get("VIDEO_MCP_ENCODING_PROFILE", "balanced")
+
+PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow", "placebo")
+# Encode speed of each x264 preset relative to medium (1080p, single stream)
+PRESET_SPEED = {
+    "ultrafast": 4.0, "superfast": 3.2, "veryfast": 2.4, "faster": 1.6, "fast": 1.3,
+    "medium": 1.0, "slow": 0.6, "slower": 0.3, "veryslow": 0.15, "placebo": 0.05,
+}
+TUNES = ("film", "animation", "grain", "stillimage", "fastdecode", "zerolatency", "psnr", "ssim")
+FIELDS = ("preset", "crf", "bitrate", "threads", "gop", "pix_fmt", "tune")
+
+# Codecs that take x264-style -preset/-crf/-tune, and the VP8/VP9 encoders (CRF needs -b:v 0)
+_X264_FAMILY = ("libx264", "libx265")
+_VPX = ("libvpx", "libvpx-vp9")
+# MoviePy's codec for these extensions when none is given
+_DEFAULT_CODECS = {".mp4": "libx264", ".m4v": "libx264", ".mov": "libx264", ".mkv": "libx264",
+                   ".webm": "libvpx", ".ogv": "libtheora"}
+
+
+@dataclass
+class EncodingSettings:
+    profile: str
+    preset: str = "medium"
+    crf: Optional[float] = None
+    bitrate: Optional[str] = None
+    # None: allotted by the render scheduler at admission
+    threads: Optional[int] = None
+    gop: Optional[int] = None
+    pix_fmt: Optional[str] = None
+    tune: Optional[str] = None
+
+    @property
+    def speed(self) -> float:
+        """Encode speed relative to the medium preset"""
+        return PRESET_SPEED.get(self.preset, 1.0)
+
+    def describe(self) -> Dict[str, Any]:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+    def apply(self, output_path: str, write_kwargs: Dict[str, Any]):
+        """Add these settings to the write_videofile arguments of a render to output_path"""
+        codec = write_kwargs.get("codec") or _DEFAULT_CODECS.get(os.path.splitext(output_path)[1].lower())
+        params = list(write_kwargs.get("ffmpeg_params") or [])
+        write_kwargs["preset"] = self.preset
+        if self.bitrate:
+            write_kwargs["bitrate"] = self.bitrate
+        elif self.crf is not None and codec in _X264_FAMILY + _VPX:
+            params += ["-crf", f"{self.crf:g}"]
+            if codec in _VPX:
+                params += ["-b:v", "0"]
+        if self.tune and codec in _X264_FAMILY:
+            params += ["-tune", self.tune]
+        if self.gop:
+            params += ["-g", str(self.gop)]
+        if self.pix_fmt:
+            params += ["-pix_fmt", self.pix_fmt]
+            if codec == "libx264" and self.pix_fmt != "yuv420p":
+                # MoviePy appends '-pix_fmt yuv420p' for 'libx264' after our parameters;
+                # 'h264' selects the same encoder without it
+                write_kwargs["codec"] = "h264"
+        if self.threads:
+            write_kwargs["threads"] = self.threads
+        write_kwargs["ffmpeg_params"] = params
+
+
+def resolve(encoding: Union[str, Dict[str, Any], None] = None, preview: bool = False) -> EncodingSettings:
+    """
+    Turn a tool's `encoding` argument into settings.
+
+    Raises:
+        ValueError: for an unknown profile, field or out of range value
+    """
+    if encoding is None or encoding == "":
+        encoding = {}
+    elif isinstance(encoding, str):
+        encoding = {"profile": encoding}
+    elif not isinstance(encoding, dict):
+        raise ValueError("encoding must be a profile name or an object of encoder settings")
+
+    name = encoding.get("profile") or ("fast-preview" if preview else DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile '{name}', expected one of {', '.join(PROFILES)}")
+    unknown = set(encoding) - set(FIELDS) - {"profile"}
+    if unknown:
+        raise ValueError(f"Unknown encoding settings: {', '.join(sorted(unknown))}; expected {', '.join(FIELDS)}")
+
+    values = dict(PROFILES[name])
+    overrides = {key: value for key, value in encoding.items() if key in FIELDS and value is not None}
+    if "bitrate" in overrides and "crf" in overrides:
+        raise ValueError("Set either crf (constant quality) or bitrate, not both")
+    if "bitrate" in overrides:
+        values.pop("crf", None)
+    values.update(overrides)
+
+    settings = EncodingSettings(profile=name, **values)
+    if settings.preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{settings.preset}', expected one of {', '.join(PRESETS)}")
+    if settings.crf is not None and not 0 <= settings.crf <= 63:
+        raise ValueError(f"crf must be between 0 and 63 (0-51 for x264), got {settings.crf}")
+    if settings.threads is not None and int(settings.threads) < 1:
+        raise ValueError(f"threads must be at least 1, got {settings.threads}")
+    if settings.gop is not None and int(settings.gop) < 1:
+        raise ValueError(f"gop must be at least 1 frame, got {settings.gop}")
+    if settings.tune is not None and settings.tune not in TUNES:
+        raise ValueError(f"Unknown tune '{settings.tune}', expected one of {', '.join(TUNES)}")
+    if settings.threads is not None:
+        settings.threads = int(settings.threads)
+    if settings.gop is not None:
+        settings.gop = int(settings.gop)
+    return settings
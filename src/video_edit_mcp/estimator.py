@@ -0,0 +1,352 @@
+"""
+Dry-run cost estimates of the rendering tools.
+
+A tool call is turned into a render plan without opening any clip: output size, frame
+rate and duration, the source megapixels ffmpeg has to decode, the megapixels blended
+by compositing and the planned cost of effect chains. Source metadata comes from the probe cache (or, for stored refs, from
+the ref's summary). Plans are priced with per-host throughput numbers measured by the
+benchmark suite (`python -m benchmarks.run_benchmarks --calibrate`, written to
+VIDEO_MCP_CALIBRATION) and otherwise with conservative defaults, and the wait for
+admission is taken from the render scheduler's queue.
+"""
+
+import os
+import json
+import random
+import logging
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from . import effects, encoding
+from .media_probe import ProbeCache
+from .proxy_cache import ProxyStore
+from .render import PREVIEW_FPS, preview_resolution
+from .scheduler import RenderScheduler, job_memory_mb, make_job
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_PATH = os.environ.get("VIDEO_MCP_CALIBRATION",
+                                  str(Path.home() / ".cache" / "video_mcp" / "calibration.json"))
+
+# Used for any number the calibration file does not have
+DEFAULT_CALIBRATION: Dict[str, float] = {
+    # Source megapixels ffmpeg decodes and pipes as rgb per second
+    "decode_mp_per_second": 300.0,
+    # Output megapixels encoded per second (default encoding profile, including one composite pass)
+    "encode_mp_per_second": 20.0,
+    # Same for draft renders (fast-preview profile)
+    "preview_encode_mp_per_second": 10.0,
+    # Megapixels blended per second by compositing and per-frame transforms
+    "composite_mp_per_second": 150.0,
+    # Compressed size of the video stream
+    "bits_per_pixel": 0.06,
+    "preview_bits_per_pixel": 0.1,
+    # Tool call, clip setup and encoder start
+    "overhead_seconds": 0.5,
+    # Resident memory of the server before the render's frame buffers
+    "base_rss_mb": 100.0,
+}
+# Default AAC bitrates of final and draft renders
+AUDIO_KBPS = 128
+PREVIEW_AUDIO_KBPS = 64
+# x264 compresses a still repeated every frame to a small fraction of a moving picture
+STATIC_BITS_FACTOR = 0.1
+
+_calibration_cache: Dict[str, Any] = {"mtime": None, "values": None}
+
+
+def calibration() -> Dict[str, Any]:
+    """Throughput numbers for this host: the calibration file over the defaults"""
+    try:
+        mtime = os.stat(CALIBRATION_PATH).st_mtime_ns
+    except OSError:
+        return dict(DEFAULT_CALIBRATION, source="defaults")
+    if _calibration_cache["mtime"] != mtime:
+        try:
+            with open(CALIBRATION_PATH) as f:
+                measured = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable calibration {CALIBRATION_PATH}: {e}")
+            measured = {}
+        values = dict(DEFAULT_CALIBRATION)
+        values.update({k: float(v) for k, v in measured.get("values", {}).items()
+                       if k in DEFAULT_CALIBRATION and v and v > 0})
+        values["source"] = CALIBRATION_PATH if measured.get("values") else "defaults"
+        values["measured"] = measured.get("created")
+        _calibration_cache.update(mtime=mtime, values=values)
+    return dict(_calibration_cache["values"])
+
+
+@dataclass
+class Source:
+    width: int
+    height: int
+    fps: float
+    duration: float
+    has_audio: bool
+    path: Optional[str] = None
+    codec: Optional[str] = None
+    bitrate_kbps: Optional[int] = None
+
+    @property
+    def megapixels(self) -> float:
+        return self.width * self.height / 1e6
+
+
+@dataclass
+class RenderPlan:
+    width: int
+    height: int
+    fps: float
+    duration: float
+    preview: bool = False
+    has_audio: bool = False
+    # Totals over the whole render
+    decode_mp: float = 0.0
+    composite_mp: float = 0.0
+    effect_ms: float = 0.0
+    # Sources decoded at the same time, for the memory estimate
+    layers: int = 1
+    static_frame: bool = False
+    fast_paths: Dict[str, bool] = field(default_factory=lambda: {
+        "static_frame": False, "proxy": False})
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def megapixels(self) -> float:
+        return self.width * self.height / 1e6
+
+    @property
+    def frames(self) -> int:
+        return max(1, int(self.duration * self.fps))
+
+
+def _is_file(value: Any) -> bool:
+    return isinstance(value, str) and len(value) < 4096 and os.path.isfile(value)
+
+
+def video_source(value: str, preview: bool = False) -> Source:
+    """Metadata of a video file (from the probe cache) or of a stored video ref"""
+    if _is_file(value):
+        probe = ProbeCache.probe(value)
+        if probe.get("error") or not probe.get("has_video"):
+            raise ValueError(probe.get("error") or f"No video stream in {value}")
+        width, height = probe["width"], probe["height"]
+        if probe.get("rotation") in (90, 270):
+            width, height = height, width
+        return Source(width, height, probe.get("fps") or 24.0, probe.get("duration") or 0.0,
+                      probe.get("has_audio", False), value, probe.get("video_codec"), probe.get("bitrate_kbps"))
+
+    from .utils import VideoStore
+    summary = VideoStore.summaries().get(value)
+    if summary is None or not summary.get("size"):
+        raise LookupError(f"{value} is neither a video file nor a video ref of this session")
+    width, height = summary["size"]
+    return Source(width, height, summary.get("fps") or 24.0, summary.get("duration") or 0.0,
+                  bool(summary.get("has_audio")))
+
+
+def _decoded(plan: RenderPlan, source: Source, seconds: float) -> float:
+    """Megapixels decoded for `seconds` of a source: ffmpeg decodes every source frame whatever the output rate"""
+    megapixels = source.megapixels
+    if plan.preview:
+        if source.path and ProxyStore.ready(source.path):
+            plan.fast_paths["proxy"] = True
+            width, height = preview_resolution(source.width, source.height)
+            megapixels = width * height / 1e6
+        elif source.path:
+            plan.notes.append(f"No preview proxy of {os.path.basename(source.path)} yet, "
+                              f"the source is decoded at full size and scaled")
+    return megapixels * source.fps * seconds
+
+
+def _output(plan: RenderPlan, width: int, height: int, fps: float):
+    """Apply the draft render's size and frame rate caps"""
+    if plan.preview:
+        width, height = preview_resolution(width, height)
+        fps = min(fps, PREVIEW_FPS)
+    plan.width, plan.height, plan.fps = width, height, fps
+
+
+def _plan_resize_video(video_path: str, size: Tuple[int, int], preview: bool = False, **_) -> RenderPlan:
+    source = video_source(video_path, preview)
+    target_width, target_height = size
+    plan = RenderPlan(target_width, target_height, source.fps, source.duration, preview, source.has_audio)
+    _output(plan, target_width, target_height, source.fps)
+    plan.decode_mp = _decoded(plan, source, source.duration)
+    # The scaled video is blended onto a black background of the target size
+    plan.composite_mp = plan.megapixels * plan.fps * plan.duration
+    plan.layers = 2
+    return plan
+
+
+def _plan_add_text_overlay(video_path: str, texts: List[str], preview: bool = False, **_) -> RenderPlan:
+    source = video_source(video_path, preview)
+    plan = RenderPlan(source.width, source.height, source.fps, source.duration, preview, source.has_audio)
+    _output(plan, source.width, source.height, source.fps)
+    plan.decode_mp = _decoded(plan, source, source.duration)
+    # One text is shown at a time over the video
+    plan.composite_mp = plan.megapixels * plan.fps * plan.duration
+    plan.layers = 2
+    return plan
+
+
+def _plan_merge_videos(video_paths: List[str], audios_folder: Optional[str] = None, transition_duration: float = 1.0,
+                       preview: bool = False, seed: Optional[int] = None, **_) -> RenderPlan:
+    if not video_paths:
+        raise ValueError("At least one video file is required")
+    sources = [video_source(path, preview) for path in video_paths]
+    duration = sum(s.duration for s in sources) - transition_duration * (len(sources) - 1)
+    if seed is not None:
+        # The composite takes the size of the first clip after the seeded shuffle
+        order = list(sources)
+        random.Random(seed).shuffle(order)
+        first = order[0]
+    else:
+        first = max(sources, key=lambda s: s.megapixels)
+    fps = max(s.fps for s in sources)
+    has_music = bool(audios_folder) and os.path.isdir(audios_folder) and any(
+        name.lower().endswith(('.mp3', '.wav', '.aac', '.m4a', '.ogg')) for name in os.listdir(audios_folder))
+    plan = RenderPlan(first.width, first.height, fps, duration, preview, has_music or any(s.has_audio for s in sources))
+    _output(plan, first.width, first.height, fps)
+    if seed is None and len({(s.width, s.height) for s in sources}) > 1:
+        plan.notes.append("Without a seed the output size depends on the shuffled order; the largest source is assumed")
+    plan.decode_mp = sum(_decoded(plan, s, s.duration) for s in sources)
+    # Every frame is blended; during transitions two clips are
+    plan.composite_mp = plan.megapixels * plan.fps * (duration + transition_duration * (len(sources) - 1))
+    plan.layers = 2 if len(sources) > 1 else 1
+    return plan
+
+
+def _plan_apply_effects(video_path: str, effects_chain: List[Any], start: Optional[float] = None,
+                        end: Optional[float] = None, preview: bool = False, **_) -> RenderPlan:
+    source = video_source(video_path, preview)
+    plan = RenderPlan(source.width, source.height, source.fps, source.duration, preview, source.has_audio)
+    _output(plan, source.width, source.height, source.fps)
+    t0 = max(0.0, start or 0.0)
+    t1 = source.duration if end is None else min(end, source.duration)
+    if t1 <= t0:
+        raise ValueError(f"Empty time range {t0}-{t1} for a {source.duration:.2f}s video")
+    chain = effects.compile_chain(effects_chain, (plan.width, plan.height), source.duration)
+    # Effects only run inside the range; frames outside it are passed through, but the whole video is re-encoded
+    plan.effect_ms = chain.estimated_ms() * plan.fps * (t1 - t0)
+    plan.decode_mp = _decoded(plan, source, source.duration)
+    return plan
+
+
+def _plan_image_to_video(image_path: str, duration: float = 5.0, fps: int = 24, effect: Optional[str] = None,
+                         zoom_factor: Optional[float] = None, pan_start=None, pan_end=None,
+                         rotation_angle: Optional[float] = None, brightness: Optional[float] = None,
+                         contrast: Optional[float] = None, saturation: Optional[float] = None,
+                         preview: bool = False, **_) -> RenderPlan:
+    from PIL import Image
+    with Image.open(image_path) as image:
+        width, height = image.size
+    plan = RenderPlan(width, height, fps, duration, preview, False)
+    _output(plan, width, height, fps)
+    # Previews shrink the still once, so everything after runs at the output size
+    steps: List[Any] = []
+    if brightness is not None:
+        steps.append({"name": "brightness", "factor": 1.0 + max(-1.0, min(1.0, brightness))})
+    if contrast is not None:
+        steps.append({"name": "contrast", "factor": max(0.0, contrast)})
+    if saturation is not None:
+        steps.append({"name": "saturation", "factor": max(0.0, saturation)})
+    if effect:
+        steps.append(effect)
+    chain = effects.compile_chain(steps, (plan.width, plan.height), duration) if steps else None
+    moving = zoom_factor is not None or pan_start is not None or pan_end is not None or rotation_angle is not None
+    if chain is not None and chain.is_time_varying:
+        plan.effect_ms = chain.estimated_ms() * plan.fps * duration
+    elif chain is not None:
+        plan.effect_ms = chain.estimated_ms()
+    plan.decode_mp = plan.megapixels
+    if moving:
+        # Zoom/pan and rotation transform the whole still every frame
+        plan.composite_mp = plan.megapixels * plan.fps * duration * (2 if rotation_angle is not None else 1)
+    elif chain is None or not chain.is_time_varying:
+        plan.static_frame = True
+        plan.fast_paths["static_frame"] = True
+        plan.notes.append("The frame never changes: it is prepared once and only encoded per frame")
+    return plan
+
+
+PLANNERS: Dict[str, Callable[..., RenderPlan]] = {
+    "resize_video": _plan_resize_video,
+    "add_text_overlay": _plan_add_text_overlay,
+    "merge_videos": _plan_merge_videos,
+    "apply_effects": _plan_apply_effects,
+    "image_to_video": _plan_image_to_video,
+}
+
+
+def plan(tool: str, arguments: Dict[str, Any]) -> RenderPlan:
+    planner = PLANNERS.get(tool)
+    if planner is None:
+        raise ValueError(f"Can not estimate '{tool}', expected one of {', '.join(PLANNERS)}")
+    return planner(**arguments)
+
+
+def _bits(bitrate: str) -> float:
+    """'5000k' / '5M' / '800000' -> bits per second"""
+    text = str(bitrate).strip().lower()
+    scale = {"k": 1e3, "m": 1e6}.get(text[-1:], 1)
+    return float(text[:-1] if scale != 1 else text) * scale
+
+
+def estimate(tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Predicted wall time, peak memory and output size of a tool call, and the fast paths it takes"""
+    render_plan = plan(tool, arguments)
+    settings = encoding.resolve(arguments.get("encoding"), render_plan.preview)
+    cal = calibration()
+    frames = render_plan.frames
+    output_mp = render_plan.megapixels
+    # Calibrated with the default profile (fast-preview for drafts); scaled to the requested preset
+    measured = encoding.resolve(None, render_plan.preview)
+    encode_rate = (cal["preview_encode_mp_per_second" if render_plan.preview else "encode_mp_per_second"]
+                   * settings.speed / measured.speed)
+    workers = max(1, min(effects.FX_WORKERS, os.cpu_count() or 1))
+    breakdown = {
+        "overhead": cal["overhead_seconds"],
+        "decode": render_plan.decode_mp / cal["decode_mp_per_second"],
+        "composite": render_plan.composite_mp / cal["composite_mp_per_second"],
+        "effects": render_plan.effect_ms / 1000 / workers,
+        "encode": output_mp * frames / encode_rate,
+    }
+    render_seconds = sum(breakdown.values())
+    job = make_job(output_mp, frames, render_plan.layers, render_plan.effect_ms / frames, settings.threads)
+    queue_seconds = RenderScheduler.estimated_wait(job)
+
+    bits_per_pixel = cal["preview_bits_per_pixel" if render_plan.preview else "bits_per_pixel"]
+    if settings.crf is not None and measured.crf is not None:
+        # x264 rule of thumb: 6 CRF steps halve or double the bitrate
+        bits_per_pixel *= 2 ** ((measured.crf - settings.crf) / 6)
+    if render_plan.static_frame:
+        bits_per_pixel *= STATIC_BITS_FACTOR
+    video_bytes = output_mp * 1e6 * frames * bits_per_pixel / 8
+    if settings.bitrate:
+        video_bytes = _bits(settings.bitrate) * render_plan.duration / 8
+    audio_bytes = (render_plan.duration * (PREVIEW_AUDIO_KBPS if render_plan.preview else AUDIO_KBPS) * 125
+                   if render_plan.has_audio else 0)
+    output_bytes = video_bytes + audio_bytes
+
+    return {
+        "wall_seconds": round(render_seconds + queue_seconds, 2),
+        "render_seconds": round(render_seconds, 2),
+        "queue_seconds": round(queue_seconds, 2),
+        "peak_memory_mb": round(cal["base_rss_mb"] + job_memory_mb(output_mp, render_plan.layers), 1),
+        "output_bytes": int(output_bytes),
+        "output": {
+            "size": [render_plan.width, render_plan.height],
+            "fps": render_plan.fps,
+            "duration": round(render_plan.duration, 3),
+            "frames_encoded": frames,
+            "has_audio": render_plan.has_audio,
+        },
+        "breakdown_seconds": {stage: round(seconds, 3) for stage, seconds in breakdown.items() if seconds},
+        "fast_paths": render_plan.fast_paths,
+        "encoding": settings.describe(),
+        "notes": render_plan.notes,
+        "calibration": {"source": cal["source"], "measured": cal.get("measured")},
+    }
@@ -0,0 +1,148 @@
+"""
+Header-only image metadata for whole directories.
+
+Each file is opened once: PIL parses the container header (dimensions, mode, format)
+without decoding pixels and the EXIF block comes from the bytes it already read.
+Files are read on a thread pool (the work is mostly waiting on the disk) and records
+are cached by (path, size, mtime) so re-scanning a large library only reads changed files.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from .startup import lazy_import
+
+Image = lazy_import("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+# Threads reading headers; mostly I/O so more than the core count helps on network/HDD storage
+SCAN_WORKERS = int(os.environ.get("VIDEO_MCP_SCAN_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+# Records kept in memory (roughly 0.5 KB each)
+METADATA_CACHE_SIZE = int(os.environ.get("VIDEO_MCP_IMAGE_META_CACHE", "500000"))
+
+COLUMNS = ("path", "format", "width", "height", "mode", "orientation", "taken_at",
+           "camera_make", "camera_model", "has_gps", "file_size", "mtime", "error")
+
+_EXIF_IFD = 0x8769
+_GPS_IFD = 0x8825
+_TAG_ORIENTATION = 0x0112
+_TAG_MAKE = 0x010F
+_TAG_MODEL = 0x0110
+_TAG_DATETIME = 0x0132
+_TAG_DATETIME_ORIGINAL = 0x9003
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    return str(value).strip("\x00 ") or None
+
+
+def read_header(path: str, stat: Optional[os.stat_result] = None) -> Dict[str, Any]:
+    """Metadata record for one image from its header and EXIF segment, without decoding pixels"""
+    stat = stat or os.stat(path)
+    record: Dict[str, Any] = {"path": path, "file_size": stat.st_size, "mtime": int(stat.st_mtime)}
+    try:
+        with open(path, "rb") as f, Image.open(f) as img:
+            record.update(format=img.format, width=img.width, height=img.height, mode=img.mode)
+            if img.format == "TIFF":
+                exif = img.getexif()
+            elif img.info.get("exif"):
+                # Parse the bytes read with the header; getexif() on some formats loads the pixels
+                exif = Image.Exif()
+                exif.load(img.info["exif"])
+            else:
+                exif = None
+            if exif:
+                details = exif.get_ifd(_EXIF_IFD)
+                record.update(
+                    orientation=exif.get(_TAG_ORIENTATION, 1),
+                    taken_at=_text(details.get(_TAG_DATETIME_ORIGINAL) or exif.get(_TAG_DATETIME)),
+                    camera_make=_text(exif.get(_TAG_MAKE)),
+                    camera_model=_text(exif.get(_TAG_MODEL)),
+                    has_gps=bool(exif.get_ifd(_GPS_IFD)),
+                )
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+class ImageMetadataCache:
+    """LRU of header records keyed by absolute path, valid while size and mtime are unchanged"""
+    _lock = threading.Lock()
+    _records: "OrderedDict[str, Tuple[int, int, Dict[str, Any]]]" = OrderedDict()
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def lookup(cls, path: str) -> Tuple[Dict[str, Any], bool]:
+        """The record for `path` and whether it came from the cache"""
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            return {"path": path, "error": f"{type(e).__name__}: {e}"}, False
+        with cls._lock:
+            cached = cls._records.get(path)
+            if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                cls._records.move_to_end(path)
+                return cached[2], True
+        record = read_header(path, stat)
+        with cls._lock:
+            cls._records[path] = (stat.st_size, stat.st_mtime_ns, record)
+            while len(cls._records) > METADATA_CACHE_SIZE:
+                cls._records.popitem(last=False)
+        return record, False
+
+    @classmethod
+    def scan(cls, paths: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+        """Records for `paths` in order, read in parallel; also returns how many were served from cache"""
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="image-scan")
+            executor = cls._executor
+        chunk = max(1, min(256, len(paths) // (SCAN_WORKERS * 4)))
+        results = list(executor.map(cls.lookup, paths, chunksize=chunk))
+        return [record for record, _ in results], sum(1 for _, hit in results if hit)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {"records": len(cls._records), "limit": METADATA_CACHE_SIZE}
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._records.clear()
+
+
+def to_columns(records: List[Dict[str, Any]], columns: Tuple[str, ...] = COLUMNS,
+               root: Optional[str] = None) -> Dict[str, List[Any]]:
+    """Columnar form of the records ({column: [values...]}), with paths relative to `root`"""
+    table = {column: [record.get(column) for record in records] for column in columns}
+    if root and "path" in table:
+        table["path"] = [os.path.relpath(path, root) for path in table["path"]]
+    return table
+
+
+def scan_images(paths: List[str], root: Optional[str] = None,
+                columns: Tuple[str, ...] = COLUMNS) -> Dict[str, Any]:
+    start = time.perf_counter()
+    records, cached = ImageMetadataCache.scan(paths)
+    seconds = time.perf_counter() - start
+    return {
+        "count": len(records),
+        "errors": sum(1 for record in records if record.get("error")),
+        "cached": cached,
+        "seconds": round(seconds, 3),
+        "files_per_second": round(len(records) / seconds, 1) if seconds > 0 else None,
+        "root": root,
+        "columns": list(columns),
+        "table": to_columns(records, columns, root),
+    }
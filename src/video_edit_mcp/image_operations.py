@@ -1,15 +1,21 @@
-import cv2
-import numpy as np
 import os
+import base64
 import logging
-import exifread
-from .editorpy.editor import *
-from moviepy.editor import *
-from moviepy.video.fx import *
-from PIL import Image
 from .utils import get_output_path, VideoStore
-from typing import Dict, Any, Optional, Tuple
-from moviepy.editor import ImageClip, ImageSequenceClip
+from .render import write_video, preview_resolution
+from .startup import lazy_import
+from .effects import compile_chain
+from .imaging import load_image, resize_to_box, collect_inputs, run_batch, OUTPUT_FORMATS, RESIZE_MODES
+from .image_metadata import scan_images, COLUMNS
+from .metrics import REGISTRY, current_tool, timed
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+# Heavy libraries are imported on the first tool call that uses them
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+exifread = lazy_import("exifread")
+Image = lazy_import("PIL.Image")
+mpy = lazy_import("moviepy.editor")
 
 logger = logging.getLogger(__name__)
 
@@ -155,6 +161,67 @@ def register_image_tools(mcp):
                 "image_path": image_path
             }
 
+    @mcp.tool()
+    def scan_image_metadata(
+        input_path: str,
+        recursive: bool = True,
+        columns: Optional[List[str]] = None,
+        offset: int = 0,
+        limit: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Read dimensions, format and key EXIF fields for every image in a directory (or glob) from
+        file headers only, in parallel. Much faster than get_image_info per file; results are cached
+        until a file changes.
+        
+        Args:
+            input_path: Directory of images or a glob pattern
+            recursive: Include sub directories
+            columns: Columns to return (default all): path, format, width, height, mode, orientation,
+                taken_at, camera_make, camera_model, has_gps, file_size, mtime, error
+            offset: Index of the first file to return (files are sorted by path)
+            limit: Maximum number of files to return
+        
+        Returns:
+            Dictionary with a columnar 'table' ({column: [values]}), paths relative to 'root', and 'next_offset' for the next page
+        """
+        try:
+            columns = tuple(columns) if columns else COLUMNS
+            unknown = [column for column in columns if column not in COLUMNS]
+            if unknown:
+                return {
+                    "success": False,
+                    "error": f"Unknown columns: {', '.join(unknown)}",
+                    "message": f"Available columns: {', '.join(COLUMNS)}"
+                }
+            if offset < 0 or limit <= 0:
+                return {
+                    "success": False,
+                    "error": "offset must be >= 0 and limit > 0",
+                    "message": "Invalid paging parameters"
+                }
+            
+            files, base = collect_inputs(input_path, recursive)
+            page = files[offset:offset + limit]
+            with timed("scan_images"):
+                result = scan_images(page, base, columns)
+            next_offset = offset + len(page)
+            return {
+                "success": True,
+                "total_files": len(files),
+                "offset": offset,
+                "next_offset": next_offset if next_offset < len(files) else None,
+                **result
+            }
+        except Exception as e:
+            logger.error(f"Error scanning image metadata in {input_path}: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error scanning image metadata"
+            }
+
     @mcp.tool(description="Use this tool for resizing the image")
     def resize_image(image_path: str, size: Tuple[int, int], output_path: str) -> Dict[str, Any]:
         try:
@@ -166,8 +233,8 @@ def register_image_tools(mcp):
                     "message": "Invalid size parameters"
                 }
             
-            # Load the image
-            image = cv2.imread(image_path)
+            # Load the image, at reduced scale when it is going to be shrunk anyway
+            image, source_size = load_image(image_path, tuple(size))
             if image is None:
                 return {
                     "success": False,
@@ -175,31 +242,11 @@ def register_image_tools(mcp):
                     "message": "Invalid image file"
                 }
             
-            target_width, target_height = size
-            original_height, original_width = image.shape[:2]
-            
-            # Calculate scaling ratio
-            scale = min(target_width / original_width, target_height / original_height)
-            
-            # Calculate new dimensions
-            new_width = int(original_width * scale)
-            new_height = int(original_height * scale)
-            
-            # Resize image
-            resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-            
-            # Create black background
-            result = np.zeros((target_height, target_width, 3), dtype=np.uint8)
-            
-            # Calculate position to center the image
-            x_offset = (target_width - new_width) // 2
-            y_offset = (target_height - new_height) // 2
-            
-            # Place resized image on black background
-            result[y_offset:y_offset+new_height, x_offset:x_offset+new_width] = resized
+            # Scale to fit and center on a black background
+            result = resize_to_box(image, tuple(size), "letterbox", source_size)
             
             # Ensure output directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
             
             # Save the result
             cv2.imwrite(output_path, result)
@@ -218,6 +265,109 @@ def register_image_tools(mcp):
                 "message": "Error resizing image"
             }
 
+    @mcp.tool()
+    def batch_process_images(
+        input_path: str,
+        output_dir: str,
+        size: Optional[Tuple[int, int]] = None,
+        mode: str = "letterbox",
+        output_format: Optional[str] = None,
+        effects_chain: Optional[List[Union[str, Dict[str, Any]]]] = None,
+        quality: int = 90,
+        recursive: bool = False,
+        overwrite: bool = False,
+        max_details: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Resize, convert and apply effects to a whole folder of images on a pool of worker processes.
+        Outputs that are already up to date (same source file and same settings) are skipped.
+        
+        Args:
+            input_path: Directory of images or a glob pattern (e.g. '/photos/**/*.jpg' with recursive=True)
+            output_dir: Directory for the outputs; the input folder layout is kept
+            size: Optional target (width, height)
+            mode: How to fit into size: 'letterbox' (pad with black), 'fit' (no padding) or 'fill' (crop)
+            output_format: Optional output format ('jpg', 'png', 'webp'); default keeps each file's format
+            effects_chain: Optional effects applied after resizing, as for apply_effects (see list_effects)
+            quality: JPEG/WebP quality (1-100)
+            recursive: Include sub directories
+            overwrite: Reprocess files even if their output is up to date
+            max_details: Maximum number of per-file records in the result (failures are listed first)
+        
+        Returns:
+            Dictionary with processed/skipped/failed counts, throughput and per-file status
+        """
+        try:
+            if size is not None and (len(size) != 2 or size[0] <= 0 or size[1] <= 0):
+                return {
+                    "success": False,
+                    "error": "Size must be a tuple of two positive integers (width, height)",
+                    "message": "Invalid size parameters"
+                }
+            if mode not in RESIZE_MODES:
+                return {
+                    "success": False,
+                    "error": f"Unknown mode '{mode}', expected one of {', '.join(RESIZE_MODES)}",
+                    "message": "Invalid mode parameter"
+                }
+            if output_format is not None:
+                output_format = output_format.lower().lstrip(".").replace("jpeg", "jpg")
+                if output_format not in OUTPUT_FORMATS:
+                    return {
+                        "success": False,
+                        "error": f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}",
+                        "message": "Invalid output format"
+                    }
+            if not size and not output_format and not effects_chain:
+                return {
+                    "success": False,
+                    "error": "Nothing to do: give a size, an output_format or an effects_chain",
+                    "message": "Invalid operation parameters"
+                }
+            if effects_chain:
+                # Validate up front instead of failing every file in the workers
+                compile_chain(effects_chain)
+            
+            files, base = collect_inputs(input_path, recursive)
+            if not files:
+                return {
+                    "success": False,
+                    "error": f"No images found at {input_path}",
+                    "message": "Provide a directory or glob pattern matching image files"
+                }
+            
+            spec = {
+                "size": list(size) if size else None,
+                "mode": mode,
+                "effects": effects_chain or [],
+                "quality": max(1, min(100, int(quality))),
+            }
+            with timed("batch_images"):
+                summary = run_batch(files, base, output_dir, spec, output_format, overwrite)
+            REGISTRY.inc("video_mcp_bytes_written_total", summary["bytes_written"], tool=current_tool.get())
+            
+            results = summary.pop("results")
+            failures = [r for r in results if r["status"] == "failed"]
+            others = [r for r in results if r["status"] != "failed"]
+            details = (failures + others)[:max(0, max_details)]
+            return {
+                "success": summary["failed"] < summary["total"],
+                **summary,
+                "output_dir": os.path.abspath(output_dir),
+                "results": details,
+                "results_truncated": len(results) > len(details),
+                "message": f"Processed {summary['processed']}, skipped {summary['skipped']} up to date, "
+                           f"{summary['failed']} failed"
+            }
+        except Exception as e:
+            logger.error(f"Error batch processing images {input_path}: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error batch processing images"
+            }
+
     @mcp.tool()
     def image_to_video(
         image_path: str,
@@ -236,7 +386,13 @@ def register_image_tools(mcp):
         # 颜色调整
         brightness: Optional[float] = None,
         contrast: Optional[float] = None,
-        saturation: Optional[float] = None
+        saturation: Optional[float] = None,
+        return_path: bool = True,
+        output_mode: str = "file",
+        preview: bool = False,
+        profile: bool = False,
+        profile_trace_path: Optional[str] = None,
+        encoding: Union[str, Dict[str, Any], None] = None
     ) -> Dict[str, Any]:
         """
         Convert an image to video with various effects and transformations.
@@ -246,7 +402,7 @@ def register_image_tools(mcp):
             output_path: Path to the output video filename
             duration: Duration of the output video in seconds
             fps: Frames per second for the output video
-            effect: Special effect to apply ('blackwhite', 'sepia', 'blur', 'edge_detect', 'invert', 'sharpen', 'emboss', 'sketch')
+            effect: Special effect to apply, any registered effect name ('blackwhite', 'sepia', 'blur', 'edge_detect', 'invert', 'sharpen', 'emboss', 'sketch', 'gamma', ...)
             zoom_factor: Zoom factor (e.g., 1.5 for 1.5x zoom)
             zoom_direction: Direction for zoom effect ('center', 'top', 'left', 'right', 'bottom')
             pan_start: Starting position for pan effect (x, y)
@@ -255,6 +411,12 @@ def register_image_tools(mcp):
             brightness: Brightness adjustment (-1.0 to 1.0)
             contrast: Contrast adjustment (0.0 to 2.0+)
             saturation: Saturation adjustment (0.0 to 2.0+)
+            return_path: Write the video and return its path; false keeps the result in memory and returns an object reference
+            output_mode: 'file' for a regular MP4, 'fmp4' for a fragmented MP4 readable while rendering, 'hls' for a growing HLS playlist plus segments
+            preview: Render a fast low resolution draft instead of the final video
+            profile: Include per-frame decode/effect/composite/encode timings (p50/p95/max) in the result
+            profile_trace_path: Optional path for a Chrome trace file of the profiled render
+            encoding: Encoder settings, a profile name ('fast-preview', 'balanced', 'archive') or an object with a profile and any of preset, crf, bitrate, threads, gop, pix_fmt, tune
         
         Returns:
             Dictionary with success status and output path or object reference
@@ -275,59 +437,40 @@ def register_image_tools(mcp):
                     "message": "Invalid FPS parameter"
                 }
             
-            return_path = True
-
             # Load the image
-            image_clip = ImageClip(image_path).set_duration(duration)
-            
-            # Apply color adjustments
+            image_clip = mpy.ImageClip(image_path).set_duration(duration)
+
+            if preview:
+                # Shrink the still once up front so effects and zoom run on the small frame
+                orig_w = image_clip.w
+                preview_size = preview_resolution(*image_clip.size)
+                if preview_size != tuple(image_clip.size):
+                    image_clip = image_clip.resize(newsize=preview_size)
+                    scale = image_clip.w / orig_w
+                    if pan_start:
+                        pan_start = (int(pan_start[0] * scale), int(pan_start[1] * scale))
+                    if pan_end:
+                        pan_end = (int(pan_end[0] * scale), int(pan_end[1] * scale))
+            
+            # Colour adjustments and the special effect run as one compiled effect chain
+            steps = []
             if brightness is not None:
                 # 亮度调整 (-1.0 到 1.0)
-                brightness_factor = 1.0 + max(-1.0, min(1.0, brightness))
-                image_clip = image_clip.fx(vfx.colorx, factor=brightness_factor)
-            
+                steps.append({"name": "brightness", "factor": 1.0 + max(-1.0, min(1.0, brightness))})
             if contrast is not None:
                 # 对比度调整 (0.0 到 2.0+)
-                contrast_factor = max(0.0, contrast)
-                image_clip = image_clip.fx(ifx.contrast, factor=contrast_factor)
-            
+                steps.append({"name": "contrast", "factor": max(0.0, contrast)})
             if saturation is not None:
                 # 饱和度调整 (0.0 到 2.0+)
-                saturation_factor = max(0.0, saturation)
-                image_clip = image_clip.fx(ifx.saturation, factor=saturation_factor)
-            
-            # Apply special effects
+                steps.append({"name": "saturation", "factor": max(0.0, saturation)})
             if effect:
-                effect = effect.lower()
-                if effect == 'blackwhite':
-                    image_clip = image_clip.fx(vfx.blackwhite)
-                
-                elif effect == 'sepia':
-                    image_clip = image_clip.fl_image(ifx.sepia)
-                
-                elif effect == 'blur':
-                    # 模糊效果
-                    image_clip = image_clip.fl_image(ifx.blur)
-                
-                elif effect == 'edge_detect':
-                    # 边缘检测效果
-                    image_clip = image_clip.fl_image(ifx.edge_detect)
-                
-                elif effect == 'invert':
-                    # 颜色反转效果
-                    image_clip = image_clip.fx(vfx.invert_colors)
-
-                elif effect == 'sharpen':
-                    # 锐化效果
-                    image_clip = image_clip.fl_image(ifx.sharpen)
-                
-                elif effect == 'emboss':
-                    # 浮雕效果
-                    image_clip = image_clip.fl_image(ifx.emboss)
-                
-                elif effect == 'sketch':
-                    # 素描效果
-                    image_clip = image_clip.fl_image(ifx.sketch)
+                steps.append(effect)
+            if steps:
+                chain = compile_chain(steps, tuple(image_clip.size), duration)
+                if chain.is_time_varying:
+                    image_clip = image_clip.fl(lambda gf, t: chain.apply(gf(t), t))
+                else:
+                    image_clip = image_clip.fl_image(chain.apply)
             
             # Apply zoom and pan effects using a simpler approach
             if zoom_factor is not None or pan_start is not None or pan_end is not None:
@@ -337,17 +480,18 @@ def register_image_tools(mcp):
             
             # Apply rotation
             if rotation_angle is not None:
-                final_clip = final_clip.fx(vfx.rotate, angle=rotation_angle)
+                final_clip = final_clip.fx(mpy.vfx.rotate, angle=rotation_angle)
             
             # Set FPS
             final_clip = final_clip.set_fps(fps)
             
             # Output handling
             if return_path:
-                final_clip.write_videofile(output_path, fps=fps)
+                written = write_video(final_clip, output_path, output_mode, preview, profile, profile_trace_path,
+                                      encoding, fps=fps)
                 result = {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Image converted to video successfully"
                 }
             else:
@@ -525,12 +669,12 @@ def register_image_tools(mcp):
     def images_to_video(images_folder_path:str, fps:int, output_name:str, return_path:bool) -> Dict[str,Any]:
         try:
             output_path = get_output_path(output_name)
-            clip = ImageSequenceClip(images_folder_path, fps=fps)
+            clip = mpy.ImageSequenceClip(images_folder_path, fps=fps)
             if return_path:
-                clip.write_videofile(output_path)
+                written = write_video(clip, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video created from images successfully"
                 }
             else:
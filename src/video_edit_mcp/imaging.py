@@ -0,0 +1,341 @@
+"""
+Image file helpers shared by the single image tools and the batch image tool.
+
+Batches run on a process pool (image decode/resize/encode holds the GIL for long
+stretches, so threads do not scale); the worker entry points are module level
+functions so they can be pickled, and this module only imports cv2 on first use so
+starting a worker stays cheap.
+"""
+
+import os
+import glob
+import json
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
+
+from .startup import lazy_import
+
+cv2 = lazy_import("cv2")
+Image = lazy_import("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for batch image jobs
+IMAGE_WORKERS = int(os.environ.get("VIDEO_MCP_IMAGE_WORKERS", str(os.cpu_count() or 1)))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+OUTPUT_FORMATS = ("jpg", "png", "webp")
+RESIZE_MODES = ("letterbox", "fit", "fill")
+
+# Records the source and spec each output was made from, so re-runs skip finished files
+MANIFEST_NAME = ".batch_manifest.json"
+
+
+def scaled_size(source_size: Tuple[int, int], size: Tuple[int, int], mode: str = "letterbox") -> Tuple[int, int]:
+    """Size of a (width, height) source scaled into the `size` box, keeping its aspect ratio"""
+    original_width, original_height = source_size
+    target_width, target_height = size
+    if mode == "fill":
+        scale = max(target_width / original_width, target_height / original_height)
+    else:
+        scale = min(target_width / original_width, target_height / original_height)
+    return max(1, int(original_width * scale)), max(1, int(original_height * scale))
+
+
+def header_size(path: str) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """Format and displayed (width, height) read from the file header only, EXIF rotation applied"""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            # Orientations 5-8 are stored rotated by 90 degrees; imread turns them upright
+            if img.format == "JPEG" and img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                width, height = height, width
+            return img.format, (width, height)
+    except Exception:
+        return None, None
+
+
+def load_image(path: str, size: Optional[Tuple[int, int]] = None, mode: str = "letterbox"):
+    """
+    Read an image as BGR, decoding JPEGs at 1/2, 1/4 or 1/8 scale when they are going to be
+    shrunk into `size` anyway (the reduction happens in the DCT domain, so decode time and
+    memory drop with the pixel count).
+
+    Returns:
+        (image, source (width, height)) - the image may be smaller than the source
+    """
+    flags = cv2.IMREAD_COLOR
+    image_format, source_size = header_size(path) if size else (None, None)
+    if image_format == "JPEG":
+        needed_width, needed_height = scaled_size(source_size, size, mode)
+        # Largest reduction that still leaves at least the pixels the final resample needs
+        for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                     (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if source_size[0] // factor >= needed_width and source_size[1] // factor >= needed_height:
+                flags = reduced_flag
+                break
+    image = cv2.imread(path, flags)
+    if image is not None and source_size is None:
+        source_size = (image.shape[1], image.shape[0])
+    return image, source_size
+
+
+def resize_to_box(image, size: Tuple[int, int], mode: str = "letterbox",
+                  source_size: Optional[Tuple[int, int]] = None):
+    """
+    Resize a BGR image into a (width, height) box keeping its aspect ratio.
+
+    'letterbox' pads the scaled image with black to exactly `size`, 'fit' returns the
+    scaled image without padding and 'fill' scales to cover the box and crops the centre.
+    `source_size` is the full resolution size when `image` was decoded at reduced scale,
+    so the output size does not depend on the decode path.
+    """
+    target_width, target_height = size
+    new_width, new_height = scaled_size(source_size or (image.shape[1], image.shape[0]), size, mode)
+    if (new_width, new_height) != (image.shape[1], image.shape[0]):
+        # Area averaging when shrinking (no aliasing), Lanczos when enlarging
+        shrinking = new_width < image.shape[1]
+        image = cv2.resize(image, (new_width, new_height),
+                           interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4)
+
+    if mode == "fit":
+        return image
+    if mode == "fill":
+        x_offset = (new_width - target_width) // 2
+        y_offset = (new_height - target_height) // 2
+        return image[y_offset:y_offset + target_height, x_offset:x_offset + target_width]
+
+    if (new_width, new_height) == (target_width, target_height):
+        return image
+    # 黑色背景, 居中放置; the canvas is only built when there is padding to add
+    x_offset = (target_width - new_width) // 2
+    y_offset = (target_height - new_height) // 2
+    return cv2.copyMakeBorder(image, y_offset, target_height - new_height - y_offset,
+                              x_offset, target_width - new_width - x_offset,
+                              cv2.BORDER_CONSTANT, value=(0, 0, 0))
+
+
+def encode_params(extension: str, quality: int) -> List[int]:
+    extension = extension.lower()
+    if extension in (".jpg", ".jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if extension == ".webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    if extension == ".png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, 3]
+    return []
+
+
+def write_image(path: str, image, quality: int = 90) -> int:
+    """Encode and write atomically (a half written file is never mistaken for a finished one); returns bytes"""
+    extension = os.path.splitext(path)[1]
+    ok, buffer = cv2.imencode(extension, image, encode_params(extension, quality))
+    if not ok:
+        raise ValueError(f"Could not encode image as {extension}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.tobytes())
+    os.replace(tmp_path, path)
+    return len(buffer)
+
+
+def transform_image(image, spec: Dict[str, Any], source_size: Optional[Tuple[int, int]] = None):
+    """Apply the resize and effect steps of a batch spec to a BGR image"""
+    if spec.get("size"):
+        image = resize_to_box(image, tuple(spec["size"]), spec.get("mode", "letterbox"), source_size)
+    if spec.get("effects"):
+        from .effects import compile_chain
+        height, width = image.shape[:2]
+        # Effects work on RGB frames like the video pipeline
+        chain = compile_chain(spec["effects"], (width, height), workers=1)
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        image = cv2.cvtColor(chain.apply(rgb), cv2.COLOR_RGB2BGR)
+    return image
+
+
+def process_file(source: str, output: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one image through a batch spec; never raises, the status is in the result"""
+    start = time.perf_counter()
+    try:
+        size = tuple(spec["size"]) if spec.get("size") else None
+        image, source_size = load_image(source, size, spec.get("mode", "letterbox"))
+        if image is None:
+            raise ValueError(f"Failed to load image: {source}")
+        image = transform_image(image, spec, source_size)
+        written = write_image(output, image, spec.get("quality", 90))
+        return {"input": source, "output": output, "status": "done", "bytes": written,
+                "size": [int(image.shape[1]), int(image.shape[0])],
+                "ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        return {"input": source, "output": output, "status": "failed", "error": str(e),
+                "error_type": type(e).__name__, "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+def _process_chunk(tasks: List[Tuple[str, str]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [process_file(source, output, spec) for source, output in tasks]
+
+
+def _init_worker():
+    # One image per process already uses every core; keep OpenCV from oversubscribing them
+    cv2.setNumThreads(1)
+
+
+def collect_inputs(input_path: str, recursive: bool = False) -> Tuple[List[str], str]:
+    """Image files of a directory or glob pattern, sorted, and the base directory outputs are relative to"""
+    if os.path.isdir(input_path):
+        base = os.path.abspath(input_path)
+        if recursive:
+            files = [os.path.join(root, name) for root, _, names in os.walk(base) for name in names]
+        else:
+            files = [entry.path for entry in os.scandir(base) if entry.is_file()]
+    else:
+        files = [os.path.abspath(path) for path in glob.glob(input_path, recursive=recursive)]
+        files = [path for path in files if os.path.isfile(path)]
+        base = os.path.commonpath([os.path.dirname(path) for path in files]) if files else ""
+    files = sorted(path for path in files if path.lower().endswith(IMAGE_EXTENSIONS))
+    return files, base
+
+
+def spec_digest(spec: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _load_manifest(output_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(output_dir: str, manifest: Dict[str, Any]):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.part"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(source: str, output: str, digest: str, entry: Optional[Dict[str, Any]]) -> bool:
+    """An output is current when it exists, is newer than its source and was made with the same spec"""
+    try:
+        source_stat = os.stat(source)
+        output_stat = os.stat(output)
+    except OSError:
+        return False
+    if entry is not None:
+        return (entry.get("spec") == digest and entry.get("source_size") == source_stat.st_size
+                and entry.get("source_mtime_ns") == source_stat.st_mtime_ns)
+    return output_stat.st_mtime_ns >= source_stat.st_mtime_ns
+
+
+class ImageBatchPool:
+    """Process pool shared by batch image calls, started on first use and kept warm"""
+    _lock = threading.Lock()
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def get(cls) -> ProcessPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                # spawn: forking a server with live threads can deadlock the children
+                cls._executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"),
+                                                    initializer=_init_worker)
+            return cls._executor
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+
+def run_batch(files: List[str], base: str, output_dir: str, spec: Dict[str, Any],
+              output_format: Optional[str] = None, overwrite: bool = False,
+              workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Process `files` into `output_dir` (mirroring their layout under `base`) with a batch spec.
+
+    Returns:
+        Dictionary with counts, throughput and one status record per file (done, skipped or failed)
+    """
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    digest = spec_digest(spec)
+    manifest = _load_manifest(output_dir)
+    start = time.perf_counter()
+
+    results: List[Dict[str, Any]] = []
+    tasks: List[Tuple[str, str]] = []
+    for source in files:
+        relative = os.path.relpath(source, base) if base else os.path.basename(source)
+        if output_format:
+            relative = os.path.splitext(relative)[0] + "." + output_format
+        output = os.path.join(output_dir, relative)
+        if os.path.abspath(output) == source:
+            results.append({"input": source, "output": output, "status": "failed",
+                            "error": "Output would overwrite its source", "error_type": "ValueError"})
+        elif not overwrite and is_up_to_date(source, output, digest, manifest.get(relative)):
+            results.append({"input": source, "output": output, "status": "skipped"})
+        else:
+            tasks.append((source, output))
+
+    workers = max(1, min(workers or IMAGE_WORKERS, IMAGE_WORKERS, len(tasks) or 1))
+    done_results: List[Dict[str, Any]] = []
+    if workers == 1 or len(tasks) < 2:
+        # Not worth starting processes for
+        for source, output in tasks:
+            done_results.append(process_file(source, output, spec))
+    else:
+        # Several files per task amortise the IPC; small enough that workers stay evenly loaded
+        chunk = max(1, min(16, len(tasks) // (workers * 4)))
+        chunks = [tasks[i:i + chunk] for i in range(0, len(tasks), chunk)]
+        executor = ImageBatchPool.get()
+        futures = {executor.submit(_process_chunk, part, spec): part for part in chunks}
+        finished, next_log = 0, max(1, len(tasks) // 10)
+        for future in as_completed(futures):
+            try:
+                chunk_results = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (usually out of memory on a huge image); start a fresh pool next time
+                ImageBatchPool.reset()
+                chunk_results = [{"input": source, "output": output, "status": "failed", "error": str(e),
+                                  "error_type": type(e).__name__} for source, output in futures[future]]
+            done_results.extend(chunk_results)
+            finished += len(chunk_results)
+            if finished >= next_log:
+                logger.info(f"Batch images: {finished}/{len(tasks)} processed")
+                next_log += max(1, len(tasks) // 10)
+
+    for result in done_results:
+        if result["status"] == "done":
+            relative = os.path.relpath(result["output"], output_dir)
+            source_stat = os.stat(result["input"])
+            manifest[relative] = {"spec": digest, "source_size": source_stat.st_size,
+                                  "source_mtime_ns": source_stat.st_mtime_ns}
+    if done_results:
+        _save_manifest(output_dir, manifest)
+    results.extend(done_results)
+
+    seconds = time.perf_counter() - start
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("done", "skipped", "failed")}
+    return {
+        "total": len(results),
+        "processed": counts["done"],
+        "skipped": counts["skipped"],
+        "failed": counts["failed"],
+        "bytes_written": sum(r.get("bytes", 0) for r in results),
+        "seconds": round(seconds, 3),
+        "images_per_second": round(counts["done"] / seconds, 2) if seconds > 0 else None,
+        "workers": workers,
+        "results": sorted(results, key=lambda r: r["input"]),
+    }
@@ -1,22 +1,55 @@
-from mcp.server.fastmcp import FastMCP
+from .startup import phase, log_report, STARTUP_REPORT
+import os
 import logging
-from .image_operations import register_image_tools
-from .video_operations import register_video_tools
-from .audio_operations import register_audio_tools
-from .download_utils import register_download_and_utility_tools
-from .util_tools import register_util_tools
+
+with phase("import mcp"):
+    from mcp.server.fastmcp import FastMCP
+
+with phase("import tool modules"):
+    from .image_operations import register_image_tools
+    from .video_operations import register_video_tools
+    from .audio_operations import register_audio_tools
+    from .download_utils import register_download_and_utility_tools
+    from .util_tools import register_util_tools
+    from .pipeline import register_pipeline_tools
+    from .metrics import install_metrics
+    from .resources import install_resource_scopes
+    from .recipes import install_recipe_recording
+    from .scheduler import install_worker_threads
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-mcp = FastMCP("VideoEdit", host="0.0.0.0", port=9000)
+mcp = FastMCP(
+    "VideoEdit",
+    host=os.environ.get("VIDEO_MCP_HOST", "0.0.0.0"),
+    port=int(os.environ.get("VIDEO_MCP_PORT", "9000")),
+)
 
-# Register all tools from different modules
-register_image_tools(mcp)
-register_video_tools(mcp)
-register_audio_tools(mcp)
+# Run tool calls in worker threads so renders waiting for admission do not block the server
+install_worker_threads(mcp)
+# Record calls, errors and latency of every tool registered below and serve /metrics
+install_metrics(mcp)
+# Release the ffmpeg decoders each tool call opened when it returns (unless a stored ref keeps them)
+install_resource_scopes(mcp)
+# Record each call's tool and arguments so stored refs can be rebuilt after a restart or on another worker
+install_recipe_recording(mcp)
+
+# Register all tools from different modules; heavy libraries are imported on first use
+with phase("register image tools"):
+    register_image_tools(mcp)
+with phase("register video tools"):
+    register_video_tools(mcp)
+with phase("register audio tools"):
+    register_audio_tools(mcp)
 #register_download_and_utility_tools(mcp)
-register_util_tools(mcp)
+with phase("register util tools"):
+    register_util_tools(mcp)
+with phase("register pipeline tools"):
+    register_pipeline_tools(mcp)
+
+if STARTUP_REPORT:
+    log_report()
 
 def main():
     """Entry point for the MCP server"""
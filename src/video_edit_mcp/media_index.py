@@ -0,0 +1,236 @@
+"""
+Indexed media listing for directories.
+
+The first listing of a directory walks it with scandir, classifies each file by
+extension and probes the media ones (videos/audio with a cached ffmpeg header probe,
+images with the header-only metadata reader) on a thread pool. Later listings stat the
+tree again but only probe files that are new or whose size/mtime changed, and drop the
+ones that disappeared. Queries filter and sort the index server side and page through
+it with an opaque cursor.
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from .imaging import IMAGE_EXTENSIONS
+from .image_metadata import ImageMetadataCache
+from .media_probe import ProbeCache
+
+logger = logging.getLogger(__name__)
+
+# Files probed concurrently; probing is an ffmpeg subprocess per video/audio file
+PROBE_WORKERS = int(os.environ.get("VIDEO_MCP_PROBE_WORKERS", str(min(16, (os.cpu_count() or 1) * 2))))
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v", ".flv", ".wmv", ".mpg", ".mpeg", ".ts", ".mts")
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".aac", ".m4a", ".flac", ".ogg", ".opus", ".wma")
+MEDIA_TYPES = ("video", "audio", "image", "other")
+SORT_KEYS = ("name", "size", "mtime", "duration", "resolution", "type")
+
+# Probe fields copied into listing rows
+_PROBE_FIELDS = ("duration", "width", "height", "fps", "video_codec", "audio_codec", "has_audio",
+                 "rotation", "format", "error")
+
+
+def media_type(name: str) -> str:
+    extension = os.path.splitext(name)[1].lower()
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    if extension in AUDIO_EXTENSIONS:
+        return "audio"
+    if extension in IMAGE_EXTENSIONS or extension == ".gif":
+        return "image"
+    return "other"
+
+
+@dataclass
+class MediaEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    type: str
+    meta: Optional[Dict[str, Any]] = None
+
+    @property
+    def pixels(self) -> Optional[int]:
+        if self.meta and self.meta.get("width") and self.meta.get("height"):
+            return self.meta["width"] * self.meta["height"]
+        return None
+
+    def row(self) -> Dict[str, Any]:
+        row = {"path": self.path, "type": self.type, "size": self.size, "mtime": self.mtime_ns // 1_000_000_000}
+        if self.meta:
+            row.update({k: self.meta[k] for k in _PROBE_FIELDS if self.meta.get(k) is not None})
+        return row
+
+
+def _probe(root: str, entry: MediaEntry) -> Dict[str, Any]:
+    path = os.path.join(root, entry.path)
+    try:
+        if entry.type == "image":
+            record, _ = ImageMetadataCache.lookup(path)
+            return {k: record.get(k) for k in ("width", "height", "format", "error")}
+        return ProbeCache.probe(path)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def _walk(root: str, recursive: bool):
+    """Yield (relative path, stat) for the regular files under root, skipping hidden entries"""
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    if item.name.startswith("."):
+                        continue
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            if recursive:
+                                pending.append(item.path)
+                        elif item.is_file():
+                            yield os.path.relpath(item.path, root), item.stat()
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Could not list {directory}: {e}")
+
+
+class MediaLibrary:
+    """Per-directory media indexes kept up to date incrementally"""
+    _lock = threading.Lock()
+    _indexes: Dict[Tuple[str, bool], Dict[str, MediaEntry]] = {}
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def _pool(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="media-probe")
+            return cls._executor
+
+    @classmethod
+    def refresh(cls, root: str, recursive: bool = False, probe: bool = True) -> Tuple[List[MediaEntry], Dict[str, Any]]:
+        """Bring the index of `root` up to date; returns its entries and what changed"""
+        start = time.perf_counter()
+        root = os.path.abspath(root)
+        key = (root, recursive)
+        with cls._lock:
+            previous = cls._indexes.get(key, {})
+
+        index: Dict[str, MediaEntry] = {}
+        stats = {"added": 0, "changed": 0, "removed": 0, "probed": 0}
+        for path, stat in _walk(root, recursive):
+            entry = previous.get(path)
+            if entry is not None and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                index[path] = entry
+                continue
+            stats["changed" if entry is not None else "added"] += 1
+            index[path] = MediaEntry(path, stat.st_size, stat.st_mtime_ns, media_type(path))
+        stats["removed"] = len(set(previous) - set(index))
+
+        if probe:
+            to_probe = [entry for entry in index.values() if entry.meta is None and entry.type != "other"]
+            if to_probe:
+                for entry, meta in zip(to_probe, cls._pool().map(lambda e: _probe(root, e), to_probe)):
+                    entry.meta = meta
+                stats["probed"] = len(to_probe)
+
+        with cls._lock:
+            cls._indexes[key] = index
+        stats["entries"] = len(index)
+        stats["index_seconds"] = round(time.perf_counter() - start, 3)
+        return list(index.values()), stats
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {"indexes": len(cls._indexes), "entries": sum(len(i) for i in cls._indexes.values())}
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._indexes.clear()
+
+
+def _sort_value(entry: MediaEntry, sort_by: str):
+    if sort_by == "name":
+        return entry.path
+    if sort_by == "size":
+        return entry.size
+    if sort_by == "mtime":
+        return entry.mtime_ns
+    if sort_by == "type":
+        return entry.type
+    if sort_by == "resolution":
+        return entry.pixels
+    return (entry.meta or {}).get(sort_by)
+
+
+def _matches(entry: MediaEntry, filters: Dict[str, Any]) -> bool:
+    meta = entry.meta or {}
+    if filters.get("media_type") and entry.type != filters["media_type"]:
+        return False
+    if filters.get("name_contains") and filters["name_contains"].lower() not in entry.path.lower():
+        return False
+    duration = meta.get("duration")
+    if filters.get("min_duration") is not None and (duration is None or duration < filters["min_duration"]):
+        return False
+    if filters.get("max_duration") is not None and (duration is None or duration > filters["max_duration"]):
+        return False
+    if filters.get("min_width") is not None and (meta.get("width") or 0) < filters["min_width"]:
+        return False
+    if filters.get("min_height") is not None and (meta.get("height") or 0) < filters["min_height"]:
+        return False
+    return True
+
+
+def encode_cursor(query: str, last_path: str, offset: int) -> str:
+    payload = json.dumps({"q": query, "after": last_path, "offset": offset}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str, query: str) -> Tuple[Optional[str], int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if payload.get("q") != query:
+        raise ValueError("Cursor belongs to a different listing; repeat the query without a cursor")
+    return payload.get("after"), int(payload.get("offset", 0))
+
+
+def query(entries: List[MediaEntry], filters: Dict[str, Any], sort_by: str = "name", descending: bool = False,
+          cursor: Optional[str] = None, limit: int = 100, query_id: str = "") -> Dict[str, Any]:
+    """Filter, sort and page index entries; entries without the sort value come last"""
+    selected = [entry for entry in entries if _matches(entry, filters)]
+    with_value = [entry for entry in selected if _sort_value(entry, sort_by) is not None]
+    without_value = sorted((entry for entry in selected if _sort_value(entry, sort_by) is None),
+                           key=lambda entry: entry.path)
+    with_value.sort(key=lambda entry: (_sort_value(entry, sort_by), entry.path), reverse=descending)
+    ordered = with_value + without_value
+
+    query_hash = hashlib.sha1(json.dumps([query_id, filters, sort_by, descending], sort_keys=True,
+                                         default=str).encode()).hexdigest()[:12]
+    start = 0
+    if cursor:
+        after, offset = decode_cursor(cursor, query_hash)
+        # Resume after the last returned file; fall back to its position if it has since been removed
+        positions = {entry.path: i for i, entry in enumerate(ordered)}
+        start = positions[after] + 1 if after in positions else min(offset, len(ordered))
+    page = ordered[start:start + limit]
+    end = start + len(page)
+    return {
+        "total_matches": len(ordered),
+        "returned": len(page),
+        "files": [entry.row() for entry in page],
+        "next_cursor": encode_cursor(query_hash, page[-1].path, end) if page and end < len(ordered) else None,
+    }
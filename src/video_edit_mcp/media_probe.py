@@ -0,0 +1,206 @@
+"""
+Cached container probes and keyframe indexes of audio/video files.
+
+A probe is one `ffmpeg -i` run (demuxer header only, nothing is decoded) parsed into
+duration, resolution, frame rate, codecs and bitrate. The keyframe index comes from a
+demux-only pass over the packets and is built the first time a file is seeked into. Results are kept in memory and as
+small JSON files under VIDEO_MCP_PROBE_DIR, keyed by (path, size, mtime) so a changed
+file is probed again and an unchanged one never is, across server restarts.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from .metrics import timed
+
+logger = logging.getLogger(__name__)
+
+PROBE_DIR = os.environ.get("VIDEO_MCP_PROBE_DIR", str(Path.home() / ".cache" / "video_mcp" / "probes"))
+# Probes kept in memory; the on-disk cache is not bounded (a few hundred bytes per file)
+PROBE_MEMORY_ENTRIES = int(os.environ.get("VIDEO_MCP_PROBE_MEMORY_ENTRIES", "100000"))
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_BITRATE = re.compile(r"bitrate: (\d+) kb/s")
+_VIDEO = re.compile(r"Stream #\S+.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})")
+_FPS = re.compile(r"([\d.]+)(k?) (?:fps|tbr)")
+_AUDIO = re.compile(r"Stream #\S+.*?: Audio: (\w+).*?, (\d+) Hz, ([^,]+)")
+_ROTATION = re.compile(r"(?:rotate\s*:\s*|rotation of )(-?[\d.]+)")
+# framecrc line: stream, dts, pts, duration, size, checksum[, F=flags when not just a keyframe]
+_PACKET = re.compile(r"^0,\s*(-?\d+),\s*(-?\d+),\s*-?\d+,\s*\d+,\s*0x[0-9a-f]+(.*)$")
+_TIMEBASE = re.compile(r"^#tb 0: (\d+)/(\d+)")
+_NOPTS = -(2 ** 63)
+
+
+def _ffmpeg_binary() -> str:
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+def parse_ffmpeg_info(text: str) -> Dict[str, Any]:
+    """Probe fields from the stderr of `ffmpeg -i <file>`"""
+    info: Dict[str, Any] = {"duration": None, "bitrate_kbps": None, "has_video": False, "has_audio": False}
+    match = _DURATION.search(text)
+    if match:
+        hours, minutes, seconds = match.groups()
+        info["duration"] = round(int(hours) * 3600 + int(minutes) * 60 + float(seconds), 3)
+    match = _BITRATE.search(text)
+    if match:
+        info["bitrate_kbps"] = int(match.group(1))
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not info["has_video"] and ": Video: " in line and "(attached pic)" not in line:
+            match = _VIDEO.search(line)
+            if match:
+                codec, width, height = match.groups()
+                info.update(has_video=True, video_codec=codec, width=int(width), height=int(height))
+                fps = _FPS.search(line)
+                if fps:
+                    info["fps"] = float(fps.group(1)) * (1000 if fps.group(2) else 1)
+        elif not info["has_audio"] and ": Audio: " in line:
+            match = _AUDIO.search(line)
+            if match:
+                codec, sample_rate, channels = match.groups()
+                info.update(has_audio=True, audio_codec=codec, sample_rate=int(sample_rate),
+                            channels=channels.strip())
+        elif info["has_video"] and "rotation" not in info:
+            match = _ROTATION.search(line)
+            if match:
+                info["rotation"] = int(float(match.group(1))) % 360
+    return info
+
+
+def probe_file(path: str) -> Dict[str, Any]:
+    """Probe a media file with ffmpeg (header only)"""
+    with timed("probe"):
+        completed = subprocess.run([_ffmpeg_binary(), "-hide_banner", "-i", path],
+                                   capture_output=True, text=True, errors="replace")
+    if "Input #0" not in completed.stderr:
+        raise ValueError(f"Not a media file ffmpeg can read: {path}")
+    return parse_ffmpeg_info(completed.stderr)
+
+
+def scan_keyframes(path: str) -> Dict[str, Any]:
+    """
+    Keyframe times of the first video stream from a demux-only pass (packets are stream
+    copied into ffmpeg's framecrc muxer, nothing is decoded), plus packet count and the
+    longest GOP.
+    """
+    with timed("keyframe_scan"):
+        completed = subprocess.run(
+            [_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", path,
+             "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"],
+            capture_output=True, text=True, errors="replace",
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Could not index keyframes of {path}: {completed.stderr.strip()[-300:]}")
+    timebase = None
+    packets = 0
+    keyframes = []
+    for line in completed.stdout.splitlines():
+        if timebase is None:
+            match = _TIMEBASE.match(line)
+            if match:
+                timebase = int(match.group(1)) / int(match.group(2))
+            continue
+        match = _PACKET.match(line)
+        if not match:
+            continue
+        packets += 1
+        if "F=" not in match.group(3):
+            dts, pts = int(match.group(1)), int(match.group(2))
+            keyframes.append(round((pts if pts != _NOPTS else dts) * timebase, 6))
+    keyframes.sort()
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+    return {"keyframes": keyframes, "packets": packets, "max_gop_seconds": round(max(gaps), 3) if gaps else None}
+
+
+def file_key(path: str, stat: Optional[os.stat_result] = None) -> Tuple[str, int, int]:
+    stat = stat or os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+class ProbeCache:
+    """Memory + disk cache of per-file probe data, invalidated when size or mtime change"""
+    _lock = threading.Lock()
+    _entries: "OrderedDict[Tuple[str, int, int], Dict[str, Any]]" = OrderedDict()
+
+    @classmethod
+    def _disk_path(cls, key: Tuple[str, int, int]) -> str:
+        digest = hashlib.sha1(json.dumps(list(key)).encode()).hexdigest()
+        return os.path.join(PROBE_DIR, digest[:2], digest + ".json")
+
+    @classmethod
+    def _load(cls, key: Tuple[str, int, int]) -> Dict[str, Any]:
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None:
+                cls._entries.move_to_end(key)
+                return entry
+        try:
+            with open(cls._disk_path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = {}
+        with cls._lock:
+            cls._entries[key] = entry
+            while len(cls._entries) > PROBE_MEMORY_ENTRIES:
+                cls._entries.popitem(last=False)
+        return entry
+
+    @classmethod
+    def _save(cls, key: Tuple[str, int, int], entry: Dict[str, Any]):
+        with cls._lock:
+            cls._entries[key] = entry
+        path = cls._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write probe cache {path}: {e}")
+
+    @classmethod
+    def probe(cls, path: str, stat: Optional[os.stat_result] = None) -> Dict[str, Any]:
+        """Probe data for `path`, from cache when the file is unchanged"""
+        key = file_key(path, stat)
+        entry = cls._load(key)
+        if "probe" not in entry:
+            try:
+                probe = probe_file(path)
+            except ValueError as e:
+                # Remember unreadable files too, they would fail the same way next time
+                probe = {"error": str(e)}
+            entry = dict(entry, probe=probe)
+            cls._save(key, entry)
+        return entry["probe"]
+
+    @classmethod
+    def keyframes(cls, path: str) -> List[float]:
+        """Sorted keyframe times of the first video stream, indexed once per file version"""
+        key = file_key(path)
+        entry = cls._load(key)
+        if "keyframes" not in entry:
+            entry = dict(entry, **scan_keyframes(path))
+            cls._save(key, entry)
+        return entry["keyframes"]
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {"memory_entries": len(cls._entries), "limit": PROBE_MEMORY_ENTRIES, "dir": PROBE_DIR}
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
@@ -0,0 +1,262 @@
+import os
+import time
+import bisect
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Set VIDEO_MCP_METRICS=0 to turn every recording call into a no-op and drop the endpoint
+METRICS_ENABLED = os.environ.get("VIDEO_MCP_METRICS", "1") != "0"
+METRICS_PATH = os.environ.get("VIDEO_MCP_METRICS_PATH", "/metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+FPS_BUCKETS = (1, 5, 10, 15, 24, 30, 60, 120, 240, 480)
+
+# Name of the MCP tool running in the current context, used as the default 'tool' label
+current_tool: contextvars.ContextVar[str] = contextvars.ContextVar("current_tool", default="none")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = ",".join(
+        '%s="%s"' % (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in items
+    )
+    return "{" + escaped + "}"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Minimal thread-safe metrics registry rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._histogram_buckets: Dict[str, Tuple[float, ...]] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+
+    def counter(self, name: str, help_text: str):
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self._help[name] = ("histogram", help_text)
+        self._histograms.setdefault(name, {})
+        self._histogram_buckets[name] = tuple(buckets)
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], Any]):
+        """Register a gauge computed at scrape time; the callback returns a number or {labels dict tuple: number}"""
+        self._help[name] = ("gauge", help_text)
+        self._gauges[name] = callback
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self._histogram_buckets.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                self._header(lines, name)
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, series in self._histograms.items():
+                self._header(lines, name)
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(float(bound))))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            gauges = list(self._gauges.items())
+        for name, callback in gauges:
+            try:
+                value = callback()
+            except Exception as e:
+                logger.warning(f"Gauge {name} failed: {e}")
+                continue
+            if value is None:
+                continue
+            self._header(lines, name)
+            if isinstance(value, dict):
+                for labels, v in value.items():
+                    lines.append(f"{name}{_format_labels(tuple(labels))} {v}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name):
+        kind, help_text = self._help.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.counter("video_mcp_tool_calls_total", "MCP tool calls")
+REGISTRY.counter("video_mcp_tool_errors_total", "MCP tool calls that raised or returned success=false")
+REGISTRY.histogram("video_mcp_tool_latency_seconds", "MCP tool call latency")
+REGISTRY.histogram("video_mcp_stage_seconds", "Time spent per processing stage (probe, render, ...)")
+REGISTRY.counter("video_mcp_frames_rendered_total", "Video frames encoded")
+REGISTRY.counter("video_mcp_bytes_written_total", "Bytes of media written")
+REGISTRY.histogram("video_mcp_encode_fps", "Frames per second achieved by renders", FPS_BUCKETS)
+REGISTRY.counter("video_mcp_renders_rejected_total", "Renders refused because the render queue was saturated")
+
+
+@contextmanager
+def timed(stage: str, tool: Optional[str] = None):
+    """Record the duration of a processing stage of the current tool"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe("video_mcp_stage_seconds", time.perf_counter() - start,
+                         tool=tool or current_tool.get(), stage=stage)
+
+
+def record_render(frames: int, seconds: float, bytes_written: int, tool: Optional[str] = None):
+    """Record the output of a finished render"""
+    tool = tool or current_tool.get()
+    REGISTRY.inc("video_mcp_frames_rendered_total", frames, tool=tool)
+    REGISTRY.inc("video_mcp_bytes_written_total", bytes_written, tool=tool)
+    REGISTRY.observe("video_mcp_stage_seconds", seconds, tool=tool, stage="render")
+    if seconds > 0 and frames:
+        REGISTRY.observe("video_mcp_encode_fps", frames / seconds, tool=tool)
+
+
+def instrument(fn: Callable, name: str) -> Callable:
+    """Wrap a tool function so its calls, errors and latency are recorded"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = current_tool.set(name)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = isinstance(result, dict) and result.get("success") is False
+            return result
+        finally:
+            REGISTRY.inc("video_mcp_tool_calls_total", tool=name)
+            if failed:
+                REGISTRY.inc("video_mcp_tool_errors_total", tool=name)
+            REGISTRY.observe("video_mcp_tool_latency_seconds", time.perf_counter() - start, tool=name)
+            current_tool.reset(token)
+    return wrapper
+
+
+def _resident_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _store_sizes():
+    from .utils import VideoStore, AudioStore
+    return {(("store", "video"),): VideoStore.stats()["refs"], (("store", "audio"),): AudioStore.stats()["refs"]}
+
+
+def _queue_depths():
+    from .proxy_cache import ProxyStore
+    return {(("queue", "proxy"),): len(ProxyStore._pending)}
+
+
+def _decoders():
+    from .decoder_pool import DecoderPool
+    stats = DecoderPool.stats()
+    return {(("state", "idle"),): stats["idle"], (("state", "leased"),): stats["leased"]}
+
+
+def _processes():
+    from .resources import ProcessSlots
+    stats = ProcessSlots.stats()
+    return {(("kind", kind),): n for kind, n in stats["by_kind"].items()} or 0
+
+
+def _render_jobs():
+    from .scheduler import RenderScheduler
+    stats = RenderScheduler.stats()
+    return {(("state", "running"),): stats["running"], (("state", "queued"),): stats["queued"]}
+
+
+def _frame_cache_bytes():
+    from .decoder_pool import FrameCache
+    return FrameCache.stats()["bytes"]
+
+
+REGISTRY.gauge("video_mcp_store_refs", "Objects held in the in-memory stores", _store_sizes)
+REGISTRY.gauge("video_mcp_queue_depth", "Jobs waiting in background queues", _queue_depths)
+REGISTRY.gauge("video_mcp_resident_bytes", "Resident memory of the server process", _resident_bytes)
+REGISTRY.gauge("video_mcp_decoders", "Pooled ffmpeg decoder processes", _decoders)
+REGISTRY.gauge("video_mcp_processes", "Live ffmpeg reader/writer processes counted against VIDEO_MCP_MAX_PROCESSES", _processes)
+REGISTRY.gauge("video_mcp_render_jobs", "Renders running and waiting for admission", _render_jobs)
+REGISTRY.gauge("video_mcp_frame_cache_bytes", "Decoded frames held in the shared frame cache", _frame_cache_bytes)
+
+
+def install_metrics(mcp):
+    """Instrument every tool registered on the server afterwards and expose the metrics endpoint"""
+    if not METRICS_ENABLED:
+        return
+
+    register_tool = mcp.tool
+
+    def tool(*args, **kwargs):
+        decorator = register_tool(*args, **kwargs)
+
+        def wrap(fn):
+            return decorator(instrument(fn, kwargs.get("name") or fn.__name__))
+        return wrap
+
+    mcp.tool = tool
+
+    @mcp.custom_route(METRICS_PATH, methods=["GET"])
+    async def metrics_endpoint(request):
+        from starlette.responses import PlainTextResponse
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
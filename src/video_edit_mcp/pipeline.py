@@ -0,0 +1,316 @@
+"""
+Edit scripts: a whole edit (sources, ordered operations, outputs) run in one tool call.
+
+Each step calls one of the clip-producing tools with its result kept in memory, so the
+steps only build up the clip graph; nothing is encoded until the outputs are written,
+and every frame of an output is computed in that single render. The script is checked
+before anything runs: operations and their arguments, references between steps, and
+outputs. Steps no output depends on are skipped. The intermediate refs are dropped when
+the script finishes.
+
+    {
+      "sources": {"intro": "/media/intro.mp4", "main": "/media/main.mp4"},
+      "steps": [
+        {"id": "small", "op": "resize_video", "args": {"video_path": "$main", "size": [1280, 720]}},
+        {"id": "graded", "op": "apply_effects", "args": {"video_path": "$small", "effects_chain": ["sepia"]}},
+        {"id": "cut", "op": "merge_videos", "args": {"video_paths": ["$intro", "$graded"], "audios_folder": "", "seed": 7}}
+      ],
+      "outputs": [{"step": "cut", "output_path": "/out/final.mp4"}]
+    }
+
+A string "$name" anywhere in a step's arguments stands for a source or an earlier step.
+"""
+
+import os
+import re
+import time
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Union
+
+from . import effects, encoding, recipes
+from .render import OUTPUT_MODES, write_video
+from .utils import VideoStore
+
+logger = logging.getLogger(__name__)
+
+# Tools that can be steps: they all build a clip and can keep it in memory (return_path=False)
+OPERATIONS = ("resize_video", "add_text_overlay", "merge_videos", "apply_effects", "image_to_video")
+# Arguments the pipeline sets itself; outputs are declared in "outputs"
+MANAGED_ARGUMENTS = ("return_path", "output_path", "output_mode", "preview", "profile", "profile_trace_path", "encoding")
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-]*$")
+
+
+class ScriptError(ValueError):
+    """An edit script that can not run; `errors` lists every problem found"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+@dataclass
+class Step:
+    id: str
+    op: str
+    args: Dict[str, Any]
+    needed: bool = False
+
+
+@dataclass
+class Output:
+    step: str
+    output_path: Optional[str] = None
+    output_mode: str = "file"
+    profile: bool = False
+    profile_trace_path: Optional[str] = None
+    encoding: Union[str, Dict[str, Any], None] = None
+    # Keep the result in memory and return its ref instead of writing a file
+    keep_ref: bool = False
+
+
+@dataclass
+class EditScript:
+    sources: Dict[str, str]
+    steps: List[Step]
+    outputs: List[Output]
+    preview: bool = False
+    skipped: List[str] = field(default_factory=list)
+
+
+def _references(value) -> List[str]:
+    if isinstance(value, str):
+        return [value[1:]] if value.startswith("$") and _NAME.match(value[1:]) else []
+    if isinstance(value, (list, tuple)):
+        return [name for item in value for name in _references(item)]
+    if isinstance(value, dict):
+        return [name for item in value.values() for name in _references(item)]
+    return []
+
+
+def _substitute(value, bindings: Dict[str, str]):
+    if isinstance(value, str):
+        return bindings[value[1:]] if value[1:] in _references(value) else value
+    if isinstance(value, (list, tuple)):
+        return [_substitute(item, bindings) for item in value]
+    if isinstance(value, dict):
+        return {key: _substitute(item, bindings) for key, item in value.items()}
+    return value
+
+
+def _call_arguments(fn, args: Dict[str, Any], preview: bool) -> Dict[str, Any]:
+    """Step arguments plus the ones the pipeline manages: keep the clip in memory, no file"""
+    parameters = inspect.signature(fn).parameters
+    kwargs = dict(args, return_path=False)
+    if "output_path" in parameters:
+        kwargs["output_path"] = ""
+    if preview and "preview" in parameters:
+        kwargs["preview"] = True
+    return kwargs
+
+
+def parse(script: Dict[str, Any]) -> EditScript:
+    """Check a script without running anything; raises ScriptError listing every problem"""
+    if not isinstance(script, dict):
+        raise ScriptError(["The script must be an object with 'sources', 'steps' and 'outputs'"])
+    errors: List[str] = []
+    unknown = set(script) - {"sources", "steps", "outputs", "preview"}
+    if unknown:
+        errors.append(f"Unknown script keys: {', '.join(sorted(unknown))}")
+
+    sources = script.get("sources") or {}
+    if not isinstance(sources, dict):
+        errors.append("'sources' must map names to file paths or refs")
+        sources = {}
+    known_refs = VideoStore.summaries()
+    for name, path in sources.items():
+        if not _NAME.match(str(name)):
+            errors.append(f"Source name '{name}' must be letters, digits, '_' or '-'")
+        elif not isinstance(path, str) or not (os.path.exists(path) or path in known_refs):
+            errors.append(f"Source '{name}' is neither an existing file nor a video ref of this session: {path}")
+
+    steps: List[Step] = []
+    defined = set(sources)
+    raw_steps = script.get("steps")
+    if not isinstance(raw_steps, list) or not raw_steps:
+        errors.append("'steps' must be a non-empty list")
+        raw_steps = []
+    for index, raw in enumerate(raw_steps):
+        if not isinstance(raw, dict):
+            errors.append(f"Step {index} must be an object with 'id', 'op' and 'args'")
+            continue
+        step_id, op, args = raw.get("id"), raw.get("op"), raw.get("args") or {}
+        label = f"Step '{step_id}'" if step_id else f"Step {index}"
+        if not isinstance(step_id, str) or not _NAME.match(step_id):
+            errors.append(f"{label} needs an 'id' of letters, digits, '_' or '-'")
+        elif step_id in defined:
+            errors.append(f"{label}: the id is already used by a source or an earlier step")
+        if op not in OPERATIONS:
+            errors.append(f"{label}: unknown op '{op}', expected one of {', '.join(OPERATIONS)}")
+        if not isinstance(args, dict):
+            errors.append(f"{label}: 'args' must be an object")
+            args = {}
+        managed = sorted(set(args) & set(MANAGED_ARGUMENTS))
+        if managed:
+            errors.append(f"{label}: {', '.join(managed)} can not be set on a step (declare files under 'outputs')")
+        for name in _references(args):
+            if name not in defined:
+                errors.append(f"{label}: '${name}' is not a source or an earlier step")
+        fn = recipes.TOOLS.get(op) if op in OPERATIONS else None
+        if op in OPERATIONS and fn is None:
+            errors.append(f"{label}: the {op} tool is not registered on this server")
+        if fn is not None and not managed:
+            try:
+                inspect.signature(fn).bind(**_call_arguments(fn, args, False))
+            except TypeError as e:
+                errors.append(f"{label}: {e}")
+        if op == "apply_effects" and isinstance(args.get("effects_chain"), list):
+            try:
+                effects.parse_steps(args["effects_chain"])
+            except ValueError as e:
+                errors.append(f"{label}: {e}")
+        if isinstance(step_id, str):
+            defined.add(step_id)
+        steps.append(Step(str(step_id), op, args))
+
+    outputs: List[Output] = []
+    raw_outputs = script.get("outputs")
+    if not isinstance(raw_outputs, list) or not raw_outputs:
+        errors.append("'outputs' must be a non-empty list")
+        raw_outputs = []
+    step_ids = {step.id for step in steps}
+    for index, raw in enumerate(raw_outputs):
+        if not isinstance(raw, dict):
+            errors.append(f"Output {index} must be an object with 'step' and 'output_path'")
+            continue
+        try:
+            output = Output(**raw)
+        except TypeError as e:
+            errors.append(f"Output {index}: {e}")
+            continue
+        if output.step not in step_ids:
+            errors.append(f"Output {index}: '{output.step}' is not a step")
+        if not output.keep_ref and not output.output_path:
+            errors.append(f"Output {index} needs an 'output_path' (or 'keep_ref': true)")
+        if (output.output_mode or "file").lower() not in OUTPUT_MODES:
+            errors.append(f"Output {index}: unsupported output_mode '{output.output_mode}', "
+                          f"expected one of {', '.join(OUTPUT_MODES)}")
+        try:
+            encoding.resolve(output.encoding)
+        except ValueError as e:
+            errors.append(f"Output {index}: {e}")
+        outputs.append(output)
+
+    if errors:
+        raise ScriptError(errors)
+
+    # Only steps an output depends on run
+    by_id = {step.id: step for step in steps}
+    pending = [output.step for output in outputs]
+    while pending:
+        step = by_id.get(pending.pop())
+        if step is not None and not step.needed:
+            step.needed = True
+            pending.extend(_references(step.args))
+    return EditScript(sources, steps, outputs, bool(script.get("preview")),
+                      [step.id for step in steps if not step.needed])
+
+
+def run(script: EditScript) -> Dict[str, Any]:
+    """Build every needed step in memory, then render each output once"""
+    bindings: Dict[str, str] = dict(script.sources)
+    made: List[str] = []
+    kept: List[str] = []
+    step_reports: List[Dict[str, Any]] = []
+    output_reports: List[Dict[str, Any]] = []
+    try:
+        for step in script.steps:
+            if not step.needed:
+                step_reports.append({"id": step.id, "op": step.op, "skipped": True})
+                continue
+            fn = recipes.TOOLS[step.op]
+            start = time.perf_counter()
+            result = recipes.call_tool(step.op, **_call_arguments(fn, _substitute(step.args, bindings), script.preview))
+            if not result.get("success"):
+                raise RuntimeError(f"Step '{step.id}' ({step.op}) failed: {result.get('error')}")
+            bindings[step.id] = result["output_object"]
+            made.append(result["output_object"])
+            report = {"id": step.id, "op": step.op, "seconds": round(time.perf_counter() - start, 3)}
+            if "seed" in result:
+                report["seed"] = result["seed"]
+            step_reports.append(report)
+
+        for output in script.outputs:
+            ref = bindings[output.step]
+            if output.keep_ref:
+                kept.append(ref)
+                output_reports.append({"step": output.step, "output_object": ref})
+                continue
+            start = time.perf_counter()
+            written = write_video(VideoStore.load(ref), output.output_path, output.output_mode, script.preview,
+                                  output.profile, output.profile_trace_path, output.encoding,
+                                  codec='libx264', audio_codec='aac')
+            output_reports.append({"step": output.step, **written, "seconds": round(time.perf_counter() - start, 3)})
+    finally:
+        # Kept refs may be rebuilt from the intermediate ones' recipes later
+        VideoStore.discard([ref for ref in made if ref not in kept], forget=not kept)
+    return {"steps": step_reports, "outputs": output_reports}
+
+
+def register_pipeline_tools(mcp):
+    @mcp.tool()
+    def run_edit_script(script: Dict[str, Any], validate_only: bool = False) -> Dict[str, Any]:
+        """
+        Run a whole edit in one call: the steps are chained in memory and only the outputs are encoded.
+
+        Args:
+            script: {"sources": {name: path or video ref}, "steps": [{"id": ..., "op": ..., "args": {...}}],
+                "outputs": [{"step": id, "output_path": ..., "output_mode": "file", "encoding": "balanced", "profile": false}],
+                "preview": false}.
+                op is one of resize_video, add_text_overlay, merge_videos, apply_effects, image_to_video with that
+                tool's arguments except return_path/output_path/output_mode/preview/profile/encoding; "$name" in an argument
+                refers to a source or an earlier step. An output with "keep_ref": true returns a video ref instead
+                of writing a file. "preview": true makes every step and output a fast draft.
+            validate_only: Only check the script and report which steps would run
+
+        Returns:
+            Dictionary with success status, the outputs (paths or refs) and per-step and per-output timings,
+            or every problem found in the script
+        """
+        started = time.perf_counter()
+        try:
+            edit = parse(script)
+            if validate_only:
+                return {
+                    "success": True,
+                    "valid": True,
+                    "steps": [{"id": step.id, "op": step.op, "runs": step.needed} for step in edit.steps],
+                    "outputs": len(edit.outputs),
+                    "message": "The script is valid"
+                }
+            result = run(edit)
+            return {
+                "success": True,
+                **result,
+                "skipped_steps": edit.skipped,
+                "total_seconds": round(time.perf_counter() - started, 3),
+                "message": f"Ran {len(edit.steps) - len(edit.skipped)} step(s) and produced {len(edit.outputs)} output(s)"
+            }
+        except ScriptError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "errors": e.errors,
+                "error_type": type(e).__name__,
+                "message": "Invalid edit script"
+            }
+        except Exception as e:
+            logger.error(f"Error running edit script: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error running edit script"
+            }
@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Also track per-frame peak memory with tracemalloc (slows rendering down noticeably)
+PROFILE_MEMORY = os.environ.get("VIDEO_MCP_PROFILE_MEMORY", "0") == "1"
+
+_state = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _callable_name(func, depth: int = 0) -> Optional[str]:
+    """Find a readable name for a frame function, looking through fl/fl_image lambdas"""
+    name = getattr(func, "__qualname__", None) or getattr(func, "__name__", None)
+    if name and "<lambda>" not in name and not name.endswith("get_frame"):
+        return ".".join(part for part in name.split(".") if part != "<locals>")[-60:]
+    if depth >= 3:
+        return None
+    for cell in getattr(func, "__closure__", None) or ():
+        try:
+            content = cell.cell_contents
+        except ValueError:
+            continue
+        if callable(content) and not hasattr(content, "__self__"):
+            found = _callable_name(content, depth + 1)
+            if found:
+                return found
+    return None
+
+
+def _wraps_other_clip(clip, func) -> bool:
+    """Whether a clip's frame function pulls frames from another clip (fl, fl_image, fx, subclip...)"""
+    for cell in getattr(func, "__closure__", None) or ():
+        try:
+            content = cell.cell_contents
+        except ValueError:
+            continue
+        if content is not clip and hasattr(content, "get_frame") and hasattr(content, "duration"):
+            return True
+    return False
+
+
+class RenderProfiler:
+    """Collects per-frame timings of every stage and clip layer of a render running in this thread"""
+
+    def __init__(self, trace: bool = False):
+        self.trace = trace
+        self.frames: List[Dict[str, float]] = []
+        self.frame_blocks: List[int] = []
+        self.frame_peaks: List[int] = []
+        self.audio_seconds = 0.0
+        self.events: List[Dict[str, Any]] = []
+        self._labels: Dict[int, str] = {}
+        self._stack: List[list] = []
+        self._current: Dict[str, float] = {}
+        self._frame_start_blocks: Optional[int] = None
+        self._origin = 0.0
+        self._tracing_memory = False
+
+    def __enter__(self):
+        _install()
+        self._origin = time.perf_counter()
+        if PROFILE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing_memory = True
+        _state.profiler = self
+        return self
+
+    def __exit__(self, *exc):
+        _state.profiler = None
+        if self._tracing_memory:
+            tracemalloc.stop()
+        return False
+
+    def label(self, clip) -> str:
+        label = self._labels.get(id(clip))
+        if label is None:
+            kind = type(clip).__name__
+            make_frame = getattr(clip, "make_frame", None)
+            if kind == "CompositeVideoClip":
+                stage = "composite"
+            elif _wraps_other_clip(clip, make_frame):
+                stage = "effect"
+            else:
+                stage = "source"
+            name = _callable_name(make_frame) if stage == "effect" else None
+            label = f"{stage}:{kind}#{len(self._labels)}" + (f"({name})" if name else "")
+            self._labels[id(clip)] = label
+        return label
+
+    def enter(self, label: str):
+        if not self._stack and self._frame_start_blocks is None:
+            self._frame_start_blocks = sys.getallocatedblocks()
+            if self._tracing_memory:
+                tracemalloc.reset_peak()
+        self._stack.append([label, time.perf_counter(), 0.0])
+
+    def exit(self):
+        label, start, children = self._stack.pop()
+        end = time.perf_counter()
+        duration = end - start
+        self._current[label] = self._current.get(label, 0.0) + duration - children
+        if self._stack:
+            self._stack[-1][2] += duration
+        if self.trace:
+            self.events.append({
+                "name": label.split("(")[0], "cat": label.split(":")[0], "ph": "X",
+                "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+                "pid": os.getpid(), "tid": threading.get_ident(),
+                "args": {"layer": label, "frame": len(self.frames)},
+            })
+
+    def end_frame(self):
+        """Close the record of the frame that was just handed to the encoder"""
+        self.frames.append(self._current)
+        self._current = {}
+        if self._frame_start_blocks is not None:
+            self.frame_blocks.append(sys.getallocatedblocks() - self._frame_start_blocks)
+            self._frame_start_blocks = None
+        if self._tracing_memory:
+            self.frame_peaks.append(tracemalloc.get_traced_memory()[1])
+
+    def summary(self) -> Dict[str, Any]:
+        labels = sorted({label for frame in self.frames for label in frame})
+        rows = []
+        totals = [sum(frame.values()) for frame in self.frames]
+        grand_total = sum(totals) or 1.0
+        for label in labels:
+            values = [frame.get(label, 0.0) for frame in self.frames]
+            rows.append({
+                "stage": label.split(":")[0],
+                "layer": label,
+                "p50_ms": round(_percentile(values, 0.5) * 1000, 3),
+                "p95_ms": round(_percentile(values, 0.95) * 1000, 3),
+                "max_ms": round(max(values) * 1000, 3),
+                "total_ms": round(sum(values) * 1000, 1),
+                "share": round(sum(values) / grand_total, 3),
+            })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        summary = {
+            "frames": len(self.frames),
+            "frame_p50_ms": round(_percentile(totals, 0.5) * 1000, 3),
+            "frame_p95_ms": round(_percentile(totals, 0.95) * 1000, 3),
+            "frame_max_ms": round(max(totals, default=0.0) * 1000, 3),
+            "audio_seconds": round(self.audio_seconds, 3),
+            "stages": rows,
+            "allocated_blocks_per_frame": {
+                "p50": _percentile(self.frame_blocks, 0.5),
+                "max": max(self.frame_blocks, default=0),
+            },
+        }
+        if self.frame_peaks:
+            summary["peak_traced_bytes_per_frame"] = {
+                "p50": _percentile(self.frame_peaks, 0.5),
+                "max": max(self.frame_peaks),
+            }
+        return summary
+
+    def dump_trace(self, trace_path: str) -> str:
+        """Write a Chrome trace event file (open in chrome://tracing or ui.perfetto.dev)"""
+        directory = os.path.dirname(trace_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(trace_path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        return trace_path
+
+
+def _install():
+    """Patch the MoviePy frame pipeline once; the hooks are no-ops in threads without a profiler"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        from moviepy.Clip import Clip
+        from moviepy.audio.AudioClip import AudioClip
+        from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+        clip_get_frame = Clip.get_frame
+        reader_get_frame = FFMPEG_VideoReader.get_frame
+        writer_write_frame = FFMPEG_VideoWriter.write_frame
+
+        def get_frame(self, t):
+            profiler = getattr(_state, "profiler", None)
+            if profiler is None:
+                return clip_get_frame(self, t)
+            if isinstance(self, AudioClip):
+                start = time.perf_counter()
+                try:
+                    return clip_get_frame(self, t)
+                finally:
+                    profiler.audio_seconds += time.perf_counter() - start
+            profiler.enter(profiler.label(self))
+            try:
+                return clip_get_frame(self, t)
+            finally:
+                profiler.exit()
+
+        def read_frame(self, t):
+            profiler = getattr(_state, "profiler", None)
+            if profiler is None:
+                return reader_get_frame(self, t)
+            profiler.enter("decode:ffmpeg")
+            try:
+                return reader_get_frame(self, t)
+            finally:
+                profiler.exit()
+
+        def write_frame(self, img_array):
+            profiler = getattr(_state, "profiler", None)
+            if profiler is None:
+                return writer_write_frame(self, img_array)
+            profiler.enter("encode:ffmpeg")
+            try:
+                return writer_write_frame(self, img_array)
+            finally:
+                profiler.exit()
+                profiler.end_frame()
+
+        get_frame.__doc__ = clip_get_frame.__doc__
+        Clip.get_frame = get_frame
+        FFMPEG_VideoReader.get_frame = read_frame
+        FFMPEG_VideoWriter.write_frame = write_frame
+        _installed = True
@@ -0,0 +1,207 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Optional, Tuple
+from .render import PREVIEW_HEIGHT
+from .resources import ProcessSlots
+
+logger = logging.getLogger(__name__)
+
+PROXIES_ENABLED = os.environ.get("VIDEO_MCP_PROXIES", "1") != "0"
+PROXY_DIR = os.environ.get("VIDEO_MCP_PROXY_DIR", str(Path.home() / ".cache" / "video_mcp" / "proxies"))
+PROXY_CACHE_MB = float(os.environ.get("VIDEO_MCP_PROXY_CACHE_MB", "2048"))
+# Number of proxies encoded concurrently in the background
+PROXY_WORKERS = int(os.environ.get("VIDEO_MCP_PROXY_WORKERS", "1"))
+# Source fingerprints kept in memory, least recently used dropped first
+FINGERPRINT_ENTRIES = int(os.environ.get("VIDEO_MCP_PROXY_FINGERPRINT_ENTRIES", "10000"))
+
+# Bytes hashed from the start and the end of a file for its fingerprint
+_FINGERPRINT_CHUNK = 1024 * 1024
+
+
+def fingerprint(path: str) -> str:
+    """Get a content fingerprint for a media file (size, head and tail bytes)"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(_FINGERPRINT_CHUNK))
+        if size > _FINGERPRINT_CHUNK:
+            f.seek(max(_FINGERPRINT_CHUNK, size - _FINGERPRINT_CHUNK))
+            digest.update(f.read(_FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+class ProxyStore:
+    """Cache of small all-intra proxies of source videos, generated in the background on first sight"""
+    _lock = threading.Lock()
+    _pending: Dict[str, Future] = {}
+    # (path, size, mtime_ns) -> fingerprint, so hot files are not re-hashed on every call
+    _fingerprints: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def fingerprint(cls, path: str) -> str:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with cls._lock:
+            fp = cls._fingerprints.get(key)
+            if fp is not None:
+                cls._fingerprints.move_to_end(key)
+                return fp
+        fp = fingerprint(path)
+        with cls._lock:
+            cls._fingerprints[key] = fp
+            while len(cls._fingerprints) > FINGERPRINT_ENTRIES:
+                cls._fingerprints.popitem(last=False)
+        return fp
+
+    @classmethod
+    def _paths(cls, fp: str) -> Tuple[str, str]:
+        base = os.path.join(PROXY_DIR, f"{fp}_{PREVIEW_HEIGHT}p")
+        return base + ".mp4", base + ".json"
+
+    @classmethod
+    def ready(cls, path: str) -> bool:
+        """Whether a proxy of the source file exists, without scheduling one"""
+        if not PROXIES_ENABLED or not os.path.isfile(path):
+            return False
+        try:
+            return os.path.exists(cls._paths(cls.fingerprint(path))[0])
+        except OSError:
+            return False
+
+    @classmethod
+    def get(cls, path: str, wait: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get the proxy for a source file, scheduling its generation if it does not exist yet.
+
+        Returns:
+            Dictionary with 'proxy_path' and the original 'source_size', or None if no proxy is ready
+        """
+        if not PROXIES_ENABLED or not os.path.isfile(path):
+            return None
+        try:
+            fp = cls.fingerprint(path)
+            proxy_path, meta_path = cls._paths(fp)
+            if not os.path.exists(proxy_path):
+                future = cls.schedule(path, fp)
+                if not wait or future is None:
+                    return None
+                future.result()
+                if not os.path.exists(proxy_path):
+                    return None
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # Touch the proxy so eviction is least-recently-used
+            os.utime(proxy_path)
+            return {"proxy_path": proxy_path, "source_size": tuple(meta["source_size"])}
+        except Exception as e:
+            logger.warning(f"Proxy lookup failed for {path}: {e}")
+            return None
+
+    @classmethod
+    def schedule(cls, path: str, fp: Optional[str] = None) -> Optional[Future]:
+        """Queue background generation of the proxy for a source file"""
+        if not PROXIES_ENABLED:
+            return None
+        try:
+            fp = fp or cls.fingerprint(path)
+        except OSError:
+            return None
+        if os.path.exists(cls._paths(fp)[0]):
+            return None
+        with cls._lock:
+            if fp in cls._pending:
+                return cls._pending[fp]
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=PROXY_WORKERS, thread_name_prefix="proxy")
+            future = cls._executor.submit(cls._generate, path, fp)
+            cls._pending[fp] = future
+        return future
+
+    @classmethod
+    def _generate(cls, path: str, fp: str):
+        from moviepy.config import get_setting
+        from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+        proxy_path, meta_path = cls._paths(fp)
+        tmp_path = proxy_path + ".tmp.mp4"
+        try:
+            infos = ffmpeg_parse_infos(path)
+            if not infos.get("video_found"):
+                return
+            width, height = infos["video_size"]
+            Path(PROXY_DIR).mkdir(parents=True, exist_ok=True)
+            # Sources that are already small are proxied at their own size
+            proxy_height = min(height, PREVIEW_HEIGHT) // 2 * 2
+            cmd = [
+                get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+                "-i", path,
+                "-vf", f"scale=-2:{proxy_height}",
+                # All-intra so any timestamp can be decoded without decoding a GOP first
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "26",
+                "-g", "1", "-bf", "0", "-tune", "fastdecode", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "96k",
+                tmp_path,
+            ]
+            # Background encodes count against the ffmpeg process limit like renders do
+            with ProcessSlots.hold("proxy"):
+                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            with open(meta_path, "w") as f:
+                json.dump({"source": os.path.abspath(path), "source_size": [width, height]}, f)
+            os.replace(tmp_path, proxy_path)
+            logger.info(f"Created proxy for {path}: {proxy_path}")
+            cls.evict()
+        except Exception as e:
+            logger.warning(f"Could not create proxy for {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            with cls._lock:
+                cls._pending.pop(fp, None)
+
+    @classmethod
+    def evict(cls, max_bytes: Optional[float] = None) -> int:
+        """Remove least recently used proxies until the cache fits in its size cap; returns bytes freed"""
+        max_bytes = PROXY_CACHE_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        try:
+            entries = [e for e in os.scandir(PROXY_DIR) if e.name.endswith(".mp4") and ".tmp" not in e.name]
+        except FileNotFoundError:
+            return 0
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+        total = sum(size for _, size, _ in stats)
+        freed = 0
+        for _, size, proxy_path in sorted(stats):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(proxy_path)
+                meta_path = os.path.splitext(proxy_path)[0] + ".json"
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+                total -= size
+                freed += size
+            except OSError as e:
+                logger.warning(f"Could not evict proxy {proxy_path}: {e}")
+        return freed
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        try:
+            sizes = [e.stat().st_size for e in os.scandir(PROXY_DIR) if e.name.endswith(".mp4") and ".tmp" not in e.name]
+        except FileNotFoundError:
+            sizes = []
+        return {
+            "enabled": PROXIES_ENABLED,
+            "directory": PROXY_DIR,
+            "proxy_count": len(sizes),
+            "total_bytes": sum(sizes),
+            "max_bytes": int(PROXY_CACHE_MB * 1024 * 1024),
+            "pending": len(cls._pending),
+        }
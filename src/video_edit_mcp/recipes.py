@@ -0,0 +1,216 @@
+"""
+Durable refs: each stored clip is also written as a recipe that any worker can rebuild.
+
+A recipe is the tool call that produced the clip (tool name and arguments, with the
+output index for tools that store several clips) plus the fingerprints of the source
+files among the arguments. It is a small JSON file under VIDEO_MCP_REF_DIR, so after a
+restart, or on another replica sharing that directory, loading a ref that is not in
+memory replays the call with the same arguments. Refs given as inputs are rebuilt the
+same way, recursively. A recipe whose sources have changed since it was recorded is
+refused rather than silently producing a different clip.
+
+The ref itself authorizes a replay: refs are random UUIDs returned only to the caller
+that created them. The MCP session that stored a ref is recorded but not checked, since
+clients get a new session after a restart and a different one on each replica.
+"""
+
+import os
+import json
+import time
+import inspect
+import logging
+import functools
+import contextvars
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from .proxy_cache import ProxyStore
+
+logger = logging.getLogger(__name__)
+
+RECIPE_DIR = os.environ.get("VIDEO_MCP_REF_DIR", str(Path.home() / ".cache" / "video_mcp" / "refs"))
+# Recipes not used for this long are pruned
+RECIPE_TTL_SECONDS = float(os.environ.get("VIDEO_MCP_REF_DAYS", "7")) * 86400
+
+# Tool name -> undecorated tool function, for replays
+TOOLS: Dict[str, Callable] = {}
+
+# (tool name, bound arguments, outputs stored so far) of the running tool call
+current_call: contextvars.ContextVar[Optional[Tuple[str, Dict[str, Any], List[int]]]] = \
+    contextvars.ContextVar("current_call", default=None)
+# Clips stored by a replay, collected instead of becoming new refs
+_replay_outputs: contextvars.ContextVar[Optional[List[Any]]] = contextvars.ContextVar("replay_outputs", default=None)
+
+
+def _path(ref: str) -> str:
+    return os.path.join(RECIPE_DIR, ref[:2], ref + ".json")
+
+
+def source_paths(value) -> List[str]:
+    """File paths among the (possibly nested) argument values"""
+    if isinstance(value, str):
+        return [value] if len(value) < 4096 and os.path.isfile(value) else []
+    if isinstance(value, (list, tuple)):
+        return [path for item in value for path in source_paths(item)]
+    if isinstance(value, dict):
+        return [path for item in value.values() for path in source_paths(item)]
+    return []
+
+
+def capture(clip) -> bool:
+    """During a replay, take the stored clip instead of creating a ref; returns True if taken"""
+    outputs = _replay_outputs.get()
+    if outputs is None:
+        return False
+    outputs.append(clip)
+    return True
+
+
+def record(ref: str, kind: str, session: str, **overrides) -> bool:
+    """Write the recipe of a clip being stored by the running tool call; False outside tool calls"""
+    call = current_call.get()
+    if call is None:
+        return False
+    tool, arguments, outputs = call
+    arguments = dict(arguments, **overrides)
+    recipe = {
+        "ref": ref,
+        "kind": kind,
+        "session": session,
+        "tool": tool,
+        "arguments": arguments,
+        "output_index": len(outputs),
+        "sources": {path: ProxyStore.fingerprint(path) for path in source_paths(arguments)},
+        "created": time.time(),
+    }
+    outputs.append(1)
+    path = _path(ref)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.part"
+        with open(tmp_path, "w") as f:
+            json.dump(recipe, f, default=str)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not write recipe for ref {ref}: {e}")
+        return False
+    return True
+
+
+def load(ref: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_path(ref)) as f:
+            recipe = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Using a recipe keeps it alive
+    try:
+        os.utime(_path(ref))
+    except OSError:
+        pass
+    return recipe
+
+
+def forget(ref: str):
+    try:
+        os.remove(_path(ref))
+    except OSError:
+        pass
+
+
+def rebuild(recipe: Dict[str, Any]):
+    """Replay the tool call of a recipe and return the clip it stored"""
+    for path, fp in recipe["sources"].items():
+        try:
+            current = ProxyStore.fingerprint(path)
+        except OSError:
+            current = None
+        if current != fp:
+            raise LookupError(f"Ref {recipe['ref']} can not be rebuilt: its source {path} "
+                              f"{'is missing' if current is None else 'has changed'}")
+    fn = TOOLS.get(recipe["tool"])
+    if fn is None:
+        raise LookupError(f"Ref {recipe['ref']} was made by unknown tool {recipe['tool']}")
+
+    logger.info(f"Rebuilding ref {recipe['ref']} by replaying {recipe['tool']}")
+    outputs: List[Any] = []
+    token = _replay_outputs.set(outputs)
+    call_token = current_call.set(None)
+    try:
+        result = fn(**recipe["arguments"])
+    finally:
+        current_call.reset(call_token)
+        _replay_outputs.reset(token)
+    if isinstance(result, dict) and result.get("success") is False:
+        raise LookupError(f"Replaying {recipe['tool']} for ref {recipe['ref']} failed: {result.get('error')}")
+    index = recipe.get("output_index", 0)
+    if index >= len(outputs):
+        raise LookupError(f"Replaying {recipe['tool']} did not produce ref {recipe['ref']}")
+    return outputs[index]
+
+
+def prune(now: Optional[float] = None) -> int:
+    """Delete recipes unused for RECIPE_TTL_SECONDS; returns how many"""
+    deadline = (now or time.time()) - RECIPE_TTL_SECONDS
+    removed = 0
+    try:
+        shards = list(os.scandir(RECIPE_DIR))
+    except OSError:
+        return 0
+    for shard in shards:
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < deadline:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
+
+
+def _call_recorded(name: str, fn: Callable, signature: inspect.Signature, args: tuple, kwargs: Dict[str, Any]):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    token = current_call.set((name, dict(bound.arguments), []))
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        current_call.reset(token)
+
+
+def call_tool(name: str, **arguments):
+    """Call a registered tool from server code the way a client call runs, so clips it stores get recipes"""
+    fn = TOOLS.get(name)
+    if fn is None:
+        raise LookupError(f"Unknown tool {name}")
+    return _call_recorded(name, fn, inspect.signature(fn), (), arguments)
+
+
+def note_arguments(**values):
+    """Replace arguments of the running tool call with the values actually used (e.g. a drawn seed)"""
+    call = current_call.get()
+    if call is not None:
+        call[1].update(values)
+
+
+def install_recipe_recording(mcp):
+    """Record the name and arguments of every tool call registered afterwards, for recipes"""
+    register_tool = mcp.tool
+
+    def tool(*args, **kwargs):
+        decorator = register_tool(*args, **kwargs)
+
+        def wrap(fn):
+            name = kwargs.get("name") or fn.__name__
+            signature = inspect.signature(fn)
+            TOOLS[name] = fn
+
+            @functools.wraps(fn)
+            def recorded(*fn_args, **fn_kwargs):
+                return _call_recorded(name, fn, signature, fn_args, fn_kwargs)
+            return decorator(recorded)
+        return wrap
+
+    mcp.tool = tool
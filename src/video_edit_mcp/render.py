@@ -0,0 +1,490 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Union
+from .encoding import resolve as resolve_encoding
+from .metrics import record_render, timed
+from .profiler import RenderProfiler
+from .resources import ProcessSlots
+from .scheduler import RenderScheduler, estimate
+
+logger = logging.getLogger(__name__)
+
+# Supported output modes for every tool that writes a video file:
+#   file - regular MP4, readable once the encode has finished
+#   fmp4 - fragmented MP4 (empty moov up front, one fragment per keyframe),
+#          readable while it is still being written
+#   hls  - HLS event playlist plus segments; the playlist grows as segments complete
+OUTPUT_MODES = ("file", "fmp4", "hls")
+
+# Segment/fragment length in seconds for the streaming modes
+STREAM_SEGMENT_SECONDS = float(os.environ.get("VIDEO_MCP_STREAM_SEGMENT_SECONDS", "4"))
+
+# Draft renders are capped to this height and frame rate (and use the fast-preview encoding profile)
+PREVIEW_HEIGHT = int(os.environ.get("VIDEO_MCP_PREVIEW_HEIGHT", "360"))
+PREVIEW_FPS = float(os.environ.get("VIDEO_MCP_PREVIEW_FPS", "12"))
+
+# File renders at least this long are encoded as checkpointed segments that a repeated
+# call (after a crash or restart) resumes from; 0 disables checkpointing
+CHECKPOINT_MIN_SECONDS = float(os.environ.get("VIDEO_MCP_CHECKPOINT_MIN_SECONDS", "120"))
+CHECKPOINT_SEGMENT_SECONDS = float(os.environ.get("VIDEO_MCP_CHECKPOINT_SEGMENT_SECONDS", "30"))
+CHECKPOINT_DIR = os.environ.get("VIDEO_MCP_CHECKPOINT_DIR", str(Path.home() / ".cache" / "video_mcp" / "checkpoints"))
+# Checkpoints of renders that were never resumed are pruned after this long
+CHECKPOINT_TTL_SECONDS = float(os.environ.get("VIDEO_MCP_CHECKPOINT_DAYS", "2")) * 86400
+# Containers whose segments the concat demuxer can join without re-encoding
+CHECKPOINT_CONTAINERS = (".mp4", ".m4v", ".mov", ".mkv", ".webm")
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): identical renders are only excluded within this process
+    fcntl = None
+_checkpoint_locks: Dict[str, threading.Lock] = {}
+_checkpoint_locks_guard = threading.Lock()
+
+
+def preview_resolution(width: int, height: int) -> Tuple[int, int]:
+    """Get the (even) size a draft render of a width x height clip is produced at"""
+    scale = min(1.0, PREVIEW_HEIGHT / height) if height > 0 else 1.0
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def source_scale(clip) -> float:
+    """Ratio between the decoded height of a file-backed clip and the height of its source"""
+    source_size = getattr(clip, "source_size", None)
+    if source_size and source_size[1]:
+        return clip.h / source_size[1]
+    infos = getattr(getattr(clip, "reader", None), "infos", None)
+    if infos and infos.get("video_size") and infos["video_size"][1]:
+        return clip.h / infos["video_size"][1]
+    return 1.0
+
+
+def prepare_preview(clip, write_kwargs: Dict[str, Any]):
+    """Downscale a clip and adjust write arguments for a fast draft render"""
+    width, height = preview_resolution(*clip.size)
+    if (width, height) != tuple(clip.size):
+        clip = clip.resize(newsize=(width, height))
+
+    fps = write_kwargs.get("fps") or getattr(clip, "fps", None)
+    write_kwargs["fps"] = min(fps, PREVIEW_FPS) if fps else PREVIEW_FPS
+    write_kwargs["audio_bitrate"] = "64k"
+    return clip
+
+
+def hls_paths(output_path: str) -> Dict[str, str]:
+    """Get the playlist and segment filename pattern used for an HLS output"""
+    stem, ext = os.path.splitext(output_path)
+    playlist_path = output_path if ext.lower() == ".m3u8" else stem + ".m3u8"
+    return {
+        "playlist_path": playlist_path,
+        "segment_pattern": os.path.splitext(playlist_path)[0] + "_%05d.ts",
+    }
+
+
+def write_video(clip, output_path: str, output_mode: str = "file", preview: bool = False,
+                profile: bool = False, profile_trace_path: Optional[str] = None,
+                encoding: Union[str, Dict[str, Any], None] = None, **write_kwargs) -> Dict[str, Any]:
+    """
+    Write a clip to disk in the requested output mode.
+
+    Args:
+        clip: MoviePy clip to render
+        output_path: Target path (for 'hls' this is the playlist, '.m3u8' is appended if missing)
+        output_mode: One of 'file', 'fmp4' or 'hls'
+        preview: Render a low resolution, low frame rate draft with the fastest encoder settings
+        profile: Record per-frame timings of decode, effect layers, compositing and encode
+        profile_trace_path: Also write the profile as a Chrome trace file (chrome://tracing, Perfetto)
+        encoding: Encoding profile name or settings (see encoding.resolve); defaults to the server's profile
+        **write_kwargs: Extra arguments passed through to write_videofile
+
+    Returns:
+        Dictionary with the final output path and mode details, meant to be merged into tool results
+    """
+    output_mode = (output_mode or "file").lower()
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unsupported output mode '{output_mode}', expected one of {', '.join(OUTPUT_MODES)}")
+    settings = resolve_encoding(encoding, preview)
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    result = {"output_path": output_path, "output_mode": output_mode}
+    if preview:
+        clip = prepare_preview(clip, write_kwargs)
+        result.update({"preview": True, "preview_size": list(clip.size), "preview_fps": write_kwargs["fps"]})
+
+    # Wait for a share of the render budget before taking anything else; the encoder is
+    # one more ffmpeg process (the audio track is written before it starts)
+    job = estimate(clip, write_kwargs.get("fps"), settings.threads)
+    with RenderScheduler.admit(job), ProcessSlots.hold("writer"):
+        queued = job.started - job.enqueued
+        if queued >= 0.1:
+            result["queued_seconds"] = round(queued, 2)
+        # Encoder threads are the CPUs the scheduler allotted to this render
+        requested, settings.threads = settings.threads, job.cpus
+        settings.apply(output_path, write_kwargs)
+        result["encoding"] = settings.describe()
+        if requested and requested > job.cpus:
+            result["encoding"]["threads_requested"] = requested
+            result["encoding"]["note"] = (f"threads reduced from {requested} to {job.cpus}, "
+                                          f"the render CPU budget (VIDEO_MCP_RENDER_CPUS)")
+        if profile or profile_trace_path:
+            profiler = RenderProfiler(trace=bool(profile_trace_path))
+            with profiler:
+                result = _write(clip, output_path, output_mode, result, write_kwargs)
+            result["profile"] = profiler.summary()
+            if profile_trace_path:
+                result["profile"]["trace_path"] = profiler.dump_trace(profile_trace_path)
+            return result
+        return _write(clip, output_path, output_mode, result, write_kwargs)
+
+
+def _write(clip, output_path: str, output_mode: str, result: Dict[str, Any], write_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    if output_mode == "file":
+        key = _checkpoint_key(clip, output_path, write_kwargs)
+        if key is not None:
+            result["checkpoint"] = _write_checkpointed(clip, output_path, key, write_kwargs)
+            return _finish(result, clip, write_kwargs, start)
+        # Written under a temporary name, so output_path never holds a partial file
+        partial_path = _partial_path(output_path)
+        try:
+            clip.write_videofile(partial_path, **write_kwargs)
+            os.replace(partial_path, output_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        return _finish(result, clip, write_kwargs, start)
+
+    # Streaming modes need a keyframe at every segment boundary so that each
+    # fragment/segment can be decoded on its own as soon as it is flushed
+    ffmpeg_params = list(write_kwargs.pop("ffmpeg_params", None) or [])
+    ffmpeg_params += ["-force_key_frames", f"expr:gte(t,n_forced*{STREAM_SEGMENT_SECONDS})"]
+    # The container cannot be inferred from '.m3u8', so always name the codecs
+    write_kwargs.setdefault("codec", "libx264")
+    write_kwargs.setdefault("audio_codec", "aac")
+
+    if output_mode == "fmp4":
+        ffmpeg_params += ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]
+        clip.write_videofile(output_path, ffmpeg_params=ffmpeg_params, **write_kwargs)
+        return _finish(result, clip, write_kwargs, start)
+
+    paths = hls_paths(output_path)
+    ffmpeg_params += [
+        "-f", "hls",
+        "-hls_time", str(STREAM_SEGMENT_SECONDS),
+        "-hls_list_size", "0",
+        "-hls_playlist_type", "event",
+        # Segments are written under a temporary name and renamed once complete,
+        # so the playlist only ever references finished segments
+        "-hls_flags", "independent_segments+temp_file",
+        "-hls_segment_filename", paths["segment_pattern"],
+    ]
+    logger.info(f"Writing HLS playlist to {paths['playlist_path']}")
+    clip.write_videofile(paths["playlist_path"], ffmpeg_params=ffmpeg_params, **write_kwargs)
+    result.update(paths)
+    result["output_path"] = paths["playlist_path"]
+    return _finish(result, clip, write_kwargs, start)
+
+
+def _partial_path(output_path: str) -> str:
+    """Hidden temporary name next to output_path, keeping its extension for the muxer"""
+    directory, name = os.path.split(output_path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{stem}.{os.getpid()}.{threading.get_ident()}.partial{ext}")
+
+
+def _checkpoint_key(clip, output_path: str, write_kwargs: Dict[str, Any]) -> Optional[str]:
+    """
+    Identity of a checkpointable render: the running tool call (name, arguments and the
+    fingerprints of its source files), the output path and the encoder settings.
+
+    None when the render is too short, not in a joinable container, or not made by a tool
+    call, since a repeated call could then not be recognised.
+    """
+    if CHECKPOINT_MIN_SECONDS <= 0 or (clip.duration or 0) < CHECKPOINT_MIN_SECONDS:
+        return None
+    if os.path.splitext(output_path)[1].lower() not in CHECKPOINT_CONTAINERS:
+        return None
+    # Imported here: recipes depends on this module through the proxy cache
+    from .recipes import current_call, source_paths
+    from .proxy_cache import ProxyStore
+
+    call = current_call.get()
+    if call is None:
+        return None
+    tool, arguments, _ = call
+    output_path = os.path.abspath(output_path)
+    try:
+        sources = {path: ProxyStore.fingerprint(path) for path in source_paths(arguments)
+                   if os.path.abspath(path) != output_path}
+        identity = json.dumps({
+            "tool": tool,
+            "arguments": arguments,
+            "sources": sources,
+            "output_path": output_path,
+            "size": list(clip.size),
+            "duration": clip.duration,
+            "write": {k: v for k, v in write_kwargs.items() if k != "threads"},
+        }, sort_keys=True, default=str)
+    except (OSError, TypeError, ValueError):
+        return None
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+def _save_manifest(path: str, manifest: Dict[str, Any]):
+    tmp_path = f"{path}.{os.getpid()}.part"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _segment_times(duration: float, fps: float) -> List[Tuple[float, float, int]]:
+    """(start, end, frames) of every segment; boundaries fall on frames of the full render"""
+    total = max(1, int(-(-duration * fps // 1)))
+    frames = max(1, int(round(CHECKPOINT_SEGMENT_SECONDS * fps)))
+    segments = []
+    for first in range(0, total, frames):
+        count = min(frames, total - first)
+        start = first / fps
+        # Half a frame short, so the subclip yields exactly `count` frames at these times
+        end = duration if first + count >= total else start + (count - 0.5) / fps
+        segments.append((start, end, count))
+    return segments
+
+
+@contextmanager
+def _checkpoint_lock(key: str):
+    """Exclusive use of a checkpoint directory, across threads and processes"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    if fcntl is None:
+        with _checkpoint_locks_guard:
+            lock = _checkpoint_locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
+        return
+    # The lock file lives beside the directory, which is removed once the output is joined
+    with open(os.path.join(CHECKPOINT_DIR, key + ".lock"), "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _segment_matches(clip, path: str, start: float, frames: int, fps: float) -> bool:
+    """
+    Whether a finished segment still holds the clip's frames: its last frame must be closer
+    to the clip's frame at that time than to the neighbouring ones, so a segment shifted by
+    a frame (or made from different content) is not joined into the output.
+    """
+    import numpy as np
+    from .seeking import IndexedVideoReader
+
+    try:
+        reader = IndexedVideoReader(path)
+        try:
+            reader.initialize((frames - 1) / fps)
+            written = reader.read_frame().astype(np.int16)
+        finally:
+            reader.close()
+    except Exception as e:
+        logger.warning(f"Could not read checkpoint segment {path}: {e}")
+        return False
+    t = start + (frames - 1) / fps
+    times = [t] + [t + k / fps for k in (-1, 1) if 0 <= t + k / fps < clip.duration]
+    errors = []
+    for frame_time in times:
+        expected = clip.get_frame(frame_time)
+        if expected.shape != written.shape:
+            return False
+        errors.append(np.abs(written - expected.astype(np.int16)).mean())
+    return errors[0] <= min(errors)
+
+
+def _write_checkpointed(clip, output_path: str, key: str, write_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Render a long clip as independently finalized segments listed in a manifest, then join
+    them into output_path atomically.
+
+    Segments (video only) and the audio track are each written under a temporary name and
+    renamed once complete, and the manifest records them as they finish, so a repeated call
+    with the same key skips everything already done; a finished segment is reused only if
+    its last frame still matches the clip. The segments are joined by stream copy while the
+    audio is encoded once over the whole duration, so no gaps appear at the joins. Calls
+    with the same key take turns on a lock file.
+    """
+    with _checkpoint_lock(key):
+        return _render_checkpointed(clip, output_path, key, write_kwargs)
+
+
+def _render_checkpointed(clip, output_path: str, key: str, write_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    fps = write_kwargs.get("fps") or getattr(clip, "fps", None) or 24
+    ext = os.path.splitext(output_path)[1].lower()
+    directory = os.path.join(CHECKPOINT_DIR, key)
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, "manifest.json")
+    segments = _segment_times(clip.duration, fps)
+
+    manifest = None
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+    if not manifest or manifest.get("segment_count") != len(segments):
+        manifest = {
+            "key": key,
+            "output_path": os.path.abspath(output_path),
+            "duration": clip.duration,
+            "fps": fps,
+            "segment_count": len(segments),
+            "segments": {},
+            "audio": None,
+            "created": time.time(),
+        }
+        _save_manifest(manifest_path, manifest)
+
+    segment_kwargs = {k: v for k, v in write_kwargs.items()
+                      if k not in ("audio", "audio_codec", "audio_bitrate", "audio_fps", "audio_nbytes")}
+    segment_kwargs["fps"] = fps
+    resumed_names = set()
+    paths = []
+    for index, (start, end, frames) in enumerate(segments):
+        name = f"segment_{index:05d}{ext}"
+        path = os.path.join(directory, name)
+        paths.append(path)
+        if name in manifest["segments"] and os.path.exists(path):
+            if _segment_matches(clip, path, start, frames, fps):
+                resumed_names.add(name)
+                continue
+            logger.warning(f"Checkpoint segment {name} of {output_path} does not match the clip, rendering it again")
+        partial_path = _partial_path(path)
+        try:
+            clip.subclip(start, end).without_audio().write_videofile(partial_path, audio=False, **segment_kwargs)
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        manifest["segments"][name] = {"start": round(start, 6), "frames": frames, "bytes": os.path.getsize(path)}
+        _save_manifest(manifest_path, manifest)
+        logger.info(f"Checkpoint {index + 1}/{len(segments)} of {output_path} written")
+
+    audio_path = None
+    if clip.audio is not None and write_kwargs.get("audio", True):
+        audio_path = os.path.join(directory, "audio.wav")
+        if not (manifest.get("audio") and os.path.exists(audio_path)):
+            partial_path = _partial_path(audio_path)
+            try:
+                clip.audio.write_audiofile(partial_path, fps=write_kwargs.get("audio_fps", 44100),
+                                           nbytes=2, codec="pcm_s16le")
+                os.replace(partial_path, audio_path)
+            finally:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+            manifest["audio"] = {"bytes": os.path.getsize(audio_path)}
+            _save_manifest(manifest_path, manifest)
+
+    _join_segments(paths, audio_path, output_path, write_kwargs)
+    shutil.rmtree(directory, ignore_errors=True)
+    return {"segments": len(segments), "resumed_segments": len(resumed_names),
+            "segment_seconds": round(segments[0][2] / fps, 3),
+            "encoded_frames": sum(frames for i, (_, _, frames) in enumerate(segments)
+                                  if f"segment_{i:05d}{ext}" not in resumed_names)}
+
+
+def _join_segments(paths: List[str], audio_path: Optional[str], output_path: str, write_kwargs: Dict[str, Any]):
+    """Concatenate finished video segments (stream copy) and encode the audio, into output_path atomically"""
+    ext = os.path.splitext(output_path)[1].lower()
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+        listing.write("".join(f"file '{_concat_path(path)}'\n" for path in paths))
+    partial_path = _partial_path(output_path)
+    try:
+        cmd = [_ffmpeg_binary(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", listing.name]
+        if audio_path:
+            # MoviePy's own default audio codec for the container
+            audio_codec = write_kwargs.get("audio_codec") or ("libvorbis" if ext == ".webm" else "libmp3lame")
+            cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", audio_codec]
+            if write_kwargs.get("audio_bitrate"):
+                cmd += ["-b:a", str(write_kwargs["audio_bitrate"])]
+        else:
+            cmd += ["-c", "copy"]
+        if ext in (".mp4", ".m4v", ".mov"):
+            cmd += ["-movflags", "+faststart"]
+        cmd.append(partial_path)
+        with timed("join_segments"):
+            completed = subprocess.run(cmd, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Joining checkpointed segments failed: {completed.stderr.strip()[-500:]}")
+        os.replace(partial_path, output_path)
+    finally:
+        os.unlink(listing.name)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+def prune_checkpoints(now: Optional[float] = None) -> int:
+    """Delete checkpoints of renders not resumed for CHECKPOINT_TTL_SECONDS; returns how many"""
+    deadline = (now or time.time()) - CHECKPOINT_TTL_SECONDS
+    removed = 0
+    try:
+        entries = list(os.scandir(CHECKPOINT_DIR))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime >= deadline:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+                removed += 1
+            elif entry.name.endswith(".lock"):
+                os.remove(entry.path)
+        except OSError:
+            continue
+    return removed
+
+
+def _output_bytes(result: Dict[str, Any]) -> int:
+    paths = [result["output_path"]]
+    if "segment_pattern" in result:
+        directory = os.path.dirname(result["segment_pattern"]) or "."
+        prefix = os.path.basename(result["segment_pattern"]).split("%")[0]
+        paths += [os.path.join(directory, name) for name in os.listdir(directory) if name.startswith(prefix)]
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+def _finish(result: Dict[str, Any], clip, write_kwargs: Dict[str, Any], start: float) -> Dict[str, Any]:
+    """Record render throughput and add it to the result"""
+    elapsed = time.perf_counter() - start
+    fps = write_kwargs.get("fps") or getattr(clip, "fps", None) or 0
+    frames = int((clip.duration or 0) * fps)
+    # Segments resumed from a checkpoint were encoded by an earlier call
+    frames = result.get("checkpoint", {}).get("encoded_frames", frames)
+    bytes_written = _output_bytes(result)
+    record_render(frames, elapsed, bytes_written)
+    result["render_seconds"] = round(elapsed, 3)
+    if elapsed > 0 and frames:
+        result["encode_fps"] = round(frames / elapsed, 2)
+    return result
+
+
+def _ffmpeg_binary() -> str:
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+def _concat_path(path: str) -> str:
+    # Quoting rules of the concat demuxer's file directive
+    return os.path.abspath(path).replace("'", "'\\''")
@@ -0,0 +1,215 @@
+"""
+Ownership and limits for ffmpeg processes held by clips.
+
+Every decoder handle opened while a tool runs is owned by that call. When a clip is
+stored under a ref, the ref becomes a co-owner of everything the call opened (the
+stored clip may read from any of it), and loading a ref makes the call a co-owner of
+the ref's resources. A resource is closed as soon as its last owner goes away: when
+the tool returns, or when the ref is cleared. Closing a pooled decoder handle only
+returns its process to the pool, so a clip that is used again simply leases another.
+
+Reader, writer and background proxy processes together are capped at
+VIDEO_MCP_MAX_PROCESSES. A call that needs one more first makes the pool close an idle
+decoder, and otherwise waits in line for up to VIDEO_MCP_PROCESS_WAIT seconds before
+failing with ResourceLimitError.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_PROCESSES = int(os.environ.get("VIDEO_MCP_MAX_PROCESSES", "32"))
+PROCESS_WAIT_SECONDS = float(os.environ.get("VIDEO_MCP_PROCESS_WAIT", "120"))
+
+# Owner (scope id or stored ref) of the resources opened by the running tool call
+current_scope: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_scope", default=None)
+
+
+class ResourceLimitError(RuntimeError):
+    """No ffmpeg process slot became free in time"""
+
+
+class ProcessSlots:
+    """Counting limit on live ffmpeg processes; callers wait first come, first served"""
+    _cond = threading.Condition()
+    _in_use: Dict[str, int] = {}
+    _queue: "deque[object]" = deque()
+    # Called (without the lock) to free a slot held by something idle; return True if they did
+    _reclaimers: List[Callable[[], bool]] = []
+
+    @classmethod
+    def add_reclaimer(cls, reclaim: Callable[[], bool]):
+        cls._reclaimers.append(reclaim)
+
+    @classmethod
+    def _used(cls) -> int:
+        return sum(cls._in_use.values())
+
+    @classmethod
+    def acquire(cls, kind: str, count: int = 1, timeout: Optional[float] = None):
+        timeout = PROCESS_WAIT_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        ticket = object()
+        with cls._cond:
+            cls._queue.append(ticket)
+        try:
+            while True:
+                with cls._cond:
+                    first = cls._queue[0] is ticket
+                    if first and cls._used() + count <= MAX_PROCESSES:
+                        cls._in_use[kind] = cls._in_use.get(kind, 0) + count
+                        return
+                # Close an idle decoder before waiting for a busy process to finish
+                if first and any(reclaim() for reclaim in cls._reclaimers):
+                    continue
+                with cls._cond:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ResourceLimitError(
+                            f"All {MAX_PROCESSES} ffmpeg process slots stayed busy for {timeout:g}s "
+                            f"({cls._describe()}); retry later or raise VIDEO_MCP_MAX_PROCESSES")
+                    cls._cond.wait(min(remaining, 0.5))
+        finally:
+            with cls._cond:
+                cls._queue.remove(ticket)
+                cls._cond.notify_all()
+
+    @classmethod
+    def release(cls, kind: str, count: int = 1):
+        with cls._cond:
+            cls._in_use[kind] = max(0, cls._in_use.get(kind, 0) - count)
+            cls._cond.notify_all()
+
+    @classmethod
+    @contextmanager
+    def hold(cls, kind: str, count: int = 1):
+        cls.acquire(kind, count)
+        try:
+            yield
+        finally:
+            cls.release(kind, count)
+
+    @classmethod
+    def _describe(cls) -> str:
+        return ", ".join(f"{kind}: {n}" for kind, n in sorted(cls._in_use.items()) if n) or "none"
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._cond:
+            return {"in_use": cls._used(), "by_kind": {k: n for k, n in cls._in_use.items() if n},
+                    "waiting": len(cls._queue), "limit": MAX_PROCESSES}
+
+
+class ResourceManager:
+    """Closeable resources and the scopes/refs that own them"""
+    _lock = threading.Lock()
+    # id(resource) -> (resource, owners)
+    _resources: Dict[int, Tuple[Any, Set[str]]] = {}
+    _by_owner: Dict[str, Set[int]] = {}
+
+    @classmethod
+    def track(cls, resource, owner: Optional[str] = None):
+        """Make the running tool call (or `owner`) an owner of `resource`; untracked outside tool calls"""
+        owner = owner or current_scope.get()
+        if owner is None:
+            return resource
+        with cls._lock:
+            _, owners = cls._resources.setdefault(id(resource), (resource, set()))
+            owners.add(owner)
+            cls._by_owner.setdefault(owner, set()).add(id(resource))
+        return resource
+
+    @classmethod
+    def share(cls, source: str, target: str):
+        """Make `target` a co-owner of everything `source` owns"""
+        with cls._lock:
+            ids = cls._by_owner.get(source)
+            if not ids:
+                return
+            for resource_id in ids:
+                cls._resources[resource_id][1].add(target)
+            cls._by_owner.setdefault(target, set()).update(ids)
+
+    @classmethod
+    def release(cls, owner: str) -> int:
+        """Drop `owner`; resources nobody else owns are closed. Returns how many were closed"""
+        orphans = []
+        with cls._lock:
+            for resource_id in cls._by_owner.pop(owner, ()):
+                resource, owners = cls._resources[resource_id]
+                owners.discard(owner)
+                if not owners:
+                    del cls._resources[resource_id]
+                    orphans.append(resource)
+        for resource in orphans:
+            try:
+                resource.close()
+            except Exception as e:
+                logger.warning(f"Error releasing {type(resource).__name__}: {e}")
+        return len(orphans)
+
+    @classmethod
+    def open_processes(cls, owner: str) -> int:
+        """How many of `owner`'s resources currently hold a live process"""
+        with cls._lock:
+            resources = [cls._resources[resource_id][0] for resource_id in cls._by_owner.get(owner, ())]
+        return sum(1 for resource in resources if getattr(resource, "leased", False))
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            refs = [owner for owner in cls._by_owner if not owner.startswith("call:")]
+            return {"resources": len(cls._resources), "owners": len(cls._by_owner), "refs_holding": len(refs)}
+
+
+@contextmanager
+def resource_scope():
+    """Own everything opened inside; close what was not handed to a stored ref on exit"""
+    scope = f"call:{uuid.uuid4().hex}"
+    token = current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        current_scope.reset(token)
+        ResourceManager.release(scope)
+
+
+def adopt(ref: str):
+    """A clip is being stored under `ref`: it keeps what the running call opened"""
+    scope = current_scope.get()
+    if scope is not None:
+        ResourceManager.share(scope, ref)
+
+
+def borrow(ref: str):
+    """A stored clip is being used by the running call: clips derived from it need its resources"""
+    scope = current_scope.get()
+    if scope is not None:
+        ResourceManager.share(ref, scope)
+
+
+def install_resource_scopes(mcp):
+    """Run every tool registered on the server afterwards in its own resource scope"""
+    register_tool = mcp.tool
+
+    def tool(*args, **kwargs):
+        decorator = register_tool(*args, **kwargs)
+
+        def wrap(fn):
+            @functools.wraps(fn)
+            def scoped(*fn_args, **fn_kwargs):
+                with resource_scope():
+                    return fn(*fn_args, **fn_kwargs)
+            return decorator(scoped)
+        return wrap
+
+    mcp.tool = tool
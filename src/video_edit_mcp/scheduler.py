@@ -0,0 +1,327 @@
+"""
+Admission control for renders.
+
+Every `write_video` is a job with an estimated cost: output megapixels x frames x a
+weight for the work behind each frame (one per composited source layer, plus the
+planned cost of any effect chains). Jobs are admitted while the running ones fit in a
+CPU budget (VIDEO_MCP_RENDER_CPUS encoder threads) and a memory budget
+(VIDEO_MCP_RENDER_MEMORY_MB of frame buffers); a job larger than the whole budget still
+runs, alone. The rest wait in a queue that admits the shortest estimated job first,
+with waiting time counted against the estimate so long jobs are not starved. A job that
+does not ask for a number of encoder threads is allotted them when admitted: an even
+share of the CPU budget among the jobs running and queued, within what is free.
+
+A job is rejected before any work is done when the queue already holds
+VIDEO_MCP_RENDER_QUEUE jobs or its estimated wait exceeds VIDEO_MCP_RENDER_MAX_WAIT;
+the RenderRejected error carries a retry-after estimate, which tools return as
+`retry_after`. Estimates are turned into seconds with the throughput measured on
+finished renders.
+
+Tools are synchronous, so the server runs each tool call in a worker thread
+(`install_worker_threads`); a queued render then waits without blocking other calls.
+"""
+
+import os
+import time
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from .effects import EffectChain, FrameExecutor
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+def _physical_memory_mb() -> int:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return 4096
+
+
+RENDER_CPUS = int(os.environ.get("VIDEO_MCP_RENDER_CPUS", str(os.cpu_count() or 1)))
+# Half of physical memory unless configured
+RENDER_MEMORY_MB = int(os.environ.get("VIDEO_MCP_RENDER_MEMORY_MB", str(_physical_memory_mb() // 2)))
+RENDER_QUEUE_LIMIT = int(os.environ.get("VIDEO_MCP_RENDER_QUEUE", "16"))
+RENDER_MAX_WAIT_SECONDS = float(os.environ.get("VIDEO_MCP_RENDER_MAX_WAIT", "600"))
+# Most encoder threads a render is allotted when the caller does not set them; MoviePy
+# produces frames on one Python thread, so more rarely speeds up the encode
+ENCODER_MAX_THREADS = int(os.environ.get("VIDEO_MCP_ENCODER_MAX_THREADS", "4"))
+
+# Rough single-thread cost of decoding, compositing and encoding one megapixel of one layer
+BASE_MS_PER_MP = 10.0
+# Frames held per source layer (decoder pipe, lookahead) and by the encoder, and fixed overhead
+FRAMES_PER_LAYER = 4
+ENCODER_FRAMES = 8
+JOB_OVERHEAD_MB = 64
+# Nodes visited when walking a clip graph for its cost
+_WALK_LIMIT = 500
+
+# Retry-after of the render rejected in the running tool call, for its result
+_rejection: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("render_rejection", default=None)
+
+
+class RenderRejected(RuntimeError):
+    """The render queue is saturated; retry after `retry_after` seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class RenderJob:
+    megapixels: float
+    frames: int
+    layers: int
+    effect_ms: float
+    # Weighted megapixel-frames
+    work: float
+    memory_mb: float
+    # CPUs reserved in the budget, and the encoder threads the render runs with
+    cpus: int = 1
+    # Threads the caller asked for; None lets the scheduler allot them at admission
+    threads: Optional[int] = None
+    enqueued: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "megapixels": round(self.megapixels, 3),
+            "frames": self.frames,
+            "layers": self.layers,
+            "effect_ms_per_frame": round(self.effect_ms, 2),
+            "work": round(self.work, 1),
+            "memory_mb": round(self.memory_mb, 1),
+            "cpus": self.cpus,
+            "estimated_seconds": round(RenderScheduler.seconds(self), 2),
+        }
+
+
+def _children(node) -> List[Any]:
+    """Clips, frame functions and effect executors a clip (or frame function) reads from"""
+    children = list(getattr(node, "clips", None) or [])
+    fn = getattr(node, "make_frame", None) if hasattr(node, "get_frame") else node
+    owner = getattr(fn, "__self__", None)
+    if owner is not None:
+        children.append(owner)
+    for cell in getattr(getattr(fn, "__func__", fn), "__closure__", None) or ():
+        try:
+            value = cell.cell_contents
+        except ValueError:
+            continue
+        # e.g. the clip list of a concatenation
+        children.extend(value if isinstance(value, (list, tuple)) else [value])
+    return children
+
+
+def job_memory_mb(megapixels: float, layers: int) -> float:
+    """Frame buffers and fixed overhead of one render with `layers` sources at this output size"""
+    return megapixels * 3 * (layers * FRAMES_PER_LAYER + ENCODER_FRAMES) + JOB_OVERHEAD_MB
+
+
+def estimate(clip, fps: Optional[float] = None, threads: Optional[int] = None) -> RenderJob:
+    """Cost of rendering `clip` at `fps` (defaults to the clip's frame rate) with `threads` encoder threads"""
+    width, height = clip.size
+    megapixels = width * height / 1e6
+    fps = fps or getattr(clip, "fps", None) or 24
+    frames = max(1, int((clip.duration or 0) * fps))
+
+    layers = 0
+    effect_ms = 0.0
+    seen = set()
+    stack = [clip]
+    while stack and len(seen) < _WALK_LIMIT:
+        node = stack.pop()
+        if id(node) in seen or node is None:
+            continue
+        seen.add(id(node))
+        if isinstance(node, FrameExecutor):
+            effect_ms += node.chain.estimated_ms()
+            continue
+        if isinstance(node, EffectChain):
+            effect_ms += node.estimated_ms()
+            continue
+        children = [child for child in _children(node)
+                    if hasattr(child, "get_frame") or callable(child) or isinstance(child, EffectChain)]
+        if hasattr(node, "get_frame") and not any(hasattr(child, "get_frame") for child in children):
+            # A source (file, image, colour): one more layer decoded per output frame
+            layers += 1
+        stack.extend(children)
+
+    layers = max(1, layers)
+    return make_job(megapixels, frames, layers, effect_ms, threads)
+
+
+def make_job(megapixels: float, frames: int, layers: int, effect_ms: float = 0.0,
+             threads: Optional[int] = None) -> RenderJob:
+    weight = layers + effect_ms / (BASE_MS_PER_MP * max(megapixels, 1e-3))
+    return RenderJob(
+        megapixels=megapixels,
+        frames=frames,
+        layers=layers,
+        effect_ms=effect_ms,
+        work=megapixels * frames * weight,
+        memory_mb=job_memory_mb(megapixels, layers),
+        # Requested threads are reserved up front (a job larger than the budget still runs alone)
+        cpus=min(threads, RENDER_CPUS) if threads else 1,
+        threads=threads,
+    )
+
+
+class RenderScheduler:
+    """Admits renders against the CPU and memory budgets, shortest estimated job first"""
+    _cond = threading.Condition()
+    _running: List[RenderJob] = []
+    _waiting: List[RenderJob] = []
+    # Weighted megapixel-frames rendered per second, learned from finished renders
+    _rate = 1000.0 / BASE_MS_PER_MP
+    _admitted = 0
+    _rejected = 0
+
+    @classmethod
+    def seconds(cls, job: RenderJob) -> float:
+        return job.work / cls._rate
+
+    @classmethod
+    def _priority(cls, job: RenderJob, now: float) -> float:
+        # Shortest job first; every second spent waiting counts as a second less work
+        return cls.seconds(job) - (now - job.enqueued)
+
+    @classmethod
+    def _fits(cls, job: RenderJob) -> bool:
+        if not cls._running:
+            return True
+        cpus = sum(j.cpus for j in cls._running) + job.cpus
+        memory = sum(j.memory_mb for j in cls._running) + job.memory_mb
+        return cpus <= RENDER_CPUS and memory <= RENDER_MEMORY_MB
+
+    @classmethod
+    def _estimated_wait(cls, job: RenderJob, now: float) -> float:
+        """Seconds until `job` would start: running work left plus queued jobs ahead, over the CPU budget"""
+        remaining = sum(max(0.0, cls.seconds(j) - (now - j.started)) for j in cls._running)
+        ahead = sum(cls.seconds(j) for j in cls._waiting
+                    if j is not job and cls._priority(j, now) <= cls._priority(job, now))
+        if not remaining and not ahead:
+            return 0.0
+        return (remaining + ahead) / max(1, RENDER_CPUS)
+
+    @classmethod
+    def estimated_wait(cls, job: RenderJob) -> float:
+        """Seconds a job submitted now would wait for admission"""
+        with cls._cond:
+            now = time.monotonic()
+            if not cls._waiting and cls._fits(job):
+                return 0.0
+            return cls._estimated_wait(job, now)
+
+    @classmethod
+    def _reject(cls, job: RenderJob, reason: str, retry_after: float):
+        cls._rejected += 1
+        REGISTRY.inc("video_mcp_renders_rejected_total")
+        retry_after = max(1.0, round(retry_after, 1))
+        rejection = _rejection.get()
+        if rejection is not None:
+            rejection.append(retry_after)
+        raise RenderRejected(f"Render not admitted: {reason}; retry after ~{retry_after:g}s", retry_after)
+
+    @classmethod
+    def _allot(cls, job: RenderJob) -> int:
+        """Encoder threads for a job being admitted: an even share of the budget among the
+        renders running and queued, within what is free"""
+        free = RENDER_CPUS - sum(j.cpus for j in cls._running)
+        share = RENDER_CPUS // (len(cls._running) + len(cls._waiting) + 1)
+        return max(1, min(free, share, ENCODER_MAX_THREADS))
+
+    @classmethod
+    def _next(cls, now: float) -> Optional[RenderJob]:
+        return min(cls._waiting, key=lambda j: cls._priority(j, now)) if cls._waiting else None
+
+    @classmethod
+    @contextmanager
+    def admit(cls, job: RenderJob):
+        """Wait for `job`'s turn and budget, run the block, then free the budget for the next job"""
+        with cls._cond:
+            now = time.monotonic()
+            if cls._waiting or not cls._fits(job):
+                wait = cls._estimated_wait(job, now)
+                if len(cls._waiting) >= RENDER_QUEUE_LIMIT:
+                    cls._reject(job, f"{len(cls._waiting)} renders already queued", wait)
+                if wait > RENDER_MAX_WAIT_SECONDS:
+                    cls._reject(job, f"estimated wait {wait:.0f}s exceeds {RENDER_MAX_WAIT_SECONDS:g}s", wait)
+            cls._waiting.append(job)
+            try:
+                while not (cls._next(time.monotonic()) is job and cls._fits(job)):
+                    cls._cond.wait(1.0)
+            finally:
+                cls._waiting.remove(job)
+                cls._cond.notify_all()
+            job.started = time.monotonic()
+            if job.threads is None:
+                job.cpus = cls._allot(job)
+            cls._running.append(job)
+            cls._admitted += 1
+        if job.started - job.enqueued > 0.01:
+            logger.info(f"Render admitted after {job.started - job.enqueued:.1f}s in queue ({job.describe()})")
+        finished = False
+        try:
+            yield job
+            finished = True
+        finally:
+            elapsed = time.monotonic() - job.started
+            with cls._cond:
+                cls._running.remove(job)
+                if finished and elapsed > 0.5:
+                    cls._rate += 0.3 * (job.work / elapsed - cls._rate)
+                cls._cond.notify_all()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._cond:
+            return {
+                "running": len(cls._running),
+                "queued": len(cls._waiting),
+                "cpus_in_use": sum(j.cpus for j in cls._running),
+                "memory_mb_in_use": round(sum(j.memory_mb for j in cls._running), 1),
+                "cpu_budget": RENDER_CPUS,
+                "memory_budget_mb": RENDER_MEMORY_MB,
+                "queue_limit": RENDER_QUEUE_LIMIT,
+                "work_per_second": round(cls._rate, 1),
+                "admitted": cls._admitted,
+                "rejected": cls._rejected,
+            }
+
+
+def install_worker_threads(mcp):
+    """Run every tool registered afterwards in a worker thread instead of on the event loop"""
+    import anyio.to_thread
+
+    register_tool = mcp.tool
+
+    def tool(*args, **kwargs):
+        decorator = register_tool(*args, **kwargs)
+
+        def wrap(fn):
+            def call(*fn_args, **fn_kwargs):
+                rejection: List[float] = []
+                token = _rejection.set(rejection)
+                try:
+                    result = fn(*fn_args, **fn_kwargs)
+                finally:
+                    _rejection.reset(token)
+                if rejection and isinstance(result, dict) and result.get("success") is False:
+                    result["retry_after"] = rejection[-1]
+                return result
+
+            @functools.wraps(fn)
+            async def threaded(*fn_args, **fn_kwargs):
+                return await anyio.to_thread.run_sync(functools.partial(call, *fn_args, **fn_kwargs))
+            return decorator(threaded)
+        return wrap
+
+    mcp.tool = tool
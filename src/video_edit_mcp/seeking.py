@@ -0,0 +1,119 @@
+"""
+Keyframe-aware replacement for MoviePy's ffmpeg video reader.
+
+MoviePy restarts ffmpeg for any jump of more than 100 frames and otherwise pipes every
+frame in between through rgb conversion; a restart seeks to `t - 1s` and then decodes,
+converts and throws away another second of frames. With the file's keyframe index the
+reader instead:
+
+- decodes forward only while no keyframe lies between the current and the target frame,
+- restarts once one does, seeking straight to the target (ffmpeg decodes from the
+  preceding keyframe and drops the frames before the target ahead of any conversion),
+- when both are possible, picks the cheaper one from running estimates of the time a
+  restart and a skipped frame take on this file (a restart costs a process start, so
+  short hops within a few frames of a keyframe still decode forward).
+
+So the cost of reaching any frame is bounded by about one GOP of decoding. The index is
+built on the first non-sequential access, so plain front-to-back renders never pay for it.
+"""
+
+import os
+import time
+import bisect
+import logging
+import subprocess as sp
+from typing import List, Optional
+
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+
+from .media_probe import ProbeCache
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedVideoReader(FFMPEG_VideoReader):
+    """FFMPEG_VideoReader that uses the cached keyframe index to decide how to seek"""
+
+    keyframe_path: Optional[str] = None
+    _keyframes: Optional[List[float]] = None
+    # Running estimates in seconds; until measured a restart is assumed to cost ~30 skipped frames
+    _restart_seconds: Optional[float] = None
+    _skip_frame_seconds: Optional[float] = None
+
+    @property
+    def keyframes(self) -> List[float]:
+        if self._keyframes is None:
+            try:
+                self._keyframes = ProbeCache.keyframes(self.keyframe_path or self.filename)
+            except Exception as e:
+                logger.warning(f"No keyframe index for {self.filename}, using plain seeking: {e}")
+                self._keyframes = []
+        return self._keyframes
+
+    def initialize(self, starttime=0):
+        """Opens the file, creates the pipe; starts at the frame shown at `starttime`"""
+        self.close()
+        if starttime != 0:
+            # A tenth of a frame early so rounding of the printed time (or of millisecond container
+            # timestamps) can not skip the target frame; any earlier and the constant frame rate
+            # output would repeat the target frame to fill the gap
+            frame_index = int(self.fps * starttime + 0.00001)
+            i_arg = ["-ss", "%.06f" % max(0.0, (frame_index - 0.1) / self.fps), "-i", self.filename]
+        else:
+            i_arg = ["-i", self.filename]
+
+        cmd = ([get_setting("FFMPEG_BINARY")] + i_arg +
+               ["-loglevel", "error",
+                "-f", "image2pipe",
+                "-vf", "scale=%d:%d" % tuple(self.size),
+                "-sws_flags", self.resize_algo,
+                "-pix_fmt", self.pix_fmt,
+                "-vcodec", "rawvideo", "-"])
+        popen_params = {"bufsize": self.bufsize,
+                        "stdout": sp.PIPE,
+                        "stderr": sp.PIPE,
+                        "stdin": sp.DEVNULL}
+        if os.name == "nt":
+            popen_params["creationflags"] = 0x08000000
+        self.proc = sp.Popen(cmd, **popen_params)
+
+    def get_frame(self, t):
+        pos = int(self.fps * t + 0.00001) + 1
+        if not self.proc or pos <= self.pos + 1 or not self.keyframes:
+            return super().get_frame(t)
+
+        # Jumping forward: is there a keyframe after the current frame, at or before the target?
+        half_frame = 0.5 / self.fps
+        current_time = (self.pos - 1) / self.fps
+        index = bisect.bisect_right(self.keyframes, t + half_frame) - 1
+        skipped = pos - self.pos - 1
+        start = time.perf_counter()
+        if index >= 0 and self.keyframes[index] > current_time + half_frame and self._restart_is_cheaper(skipped):
+            self.initialize(t)
+            result = self.read_frame()
+            self._restart_seconds = _ewma(self._restart_seconds, time.perf_counter() - start)
+        else:
+            self.skip_frames(skipped)
+            result = self.read_frame()
+            self._skip_frame_seconds = _ewma(self._skip_frame_seconds, (time.perf_counter() - start) / (skipped + 1))
+        self.pos = pos
+        return result
+
+    def _restart_is_cheaper(self, skipped: int) -> bool:
+        if self._restart_seconds is None or self._skip_frame_seconds is None:
+            return skipped > 30
+        return self._restart_seconds < skipped * self._skip_frame_seconds
+
+
+def _ewma(previous: Optional[float], value: float, alpha: float = 0.3) -> float:
+    return value if previous is None else previous + alpha * (value - previous)
+
+
+def index_reader(clip, source_path: Optional[str] = None):
+    """Switch a VideoFileClip (and its subclips, which share the reader) to keyframe-aware seeking"""
+    reader = getattr(clip, "reader", None)
+    if isinstance(reader, FFMPEG_VideoReader) and not isinstance(reader, IndexedVideoReader):
+        reader.__class__ = IndexedVideoReader
+        reader.keyframe_path = source_path
+    return clip
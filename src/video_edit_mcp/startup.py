@@ -0,0 +1,117 @@
+"""
+Lazy imports of the heavy media libraries and a report of what server startup costs.
+
+Tool modules bind `cv2`, `moviepy.editor` & co. through `lazy_import` so registering the
+tools only touches metadata; the real import happens on the first attribute access,
+inside the first tool call that needs it, and its duration is recorded.
+"""
+
+import os
+import sys
+import time
+import types
+import logging
+import importlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Log the startup report once the server has registered its tools
+STARTUP_REPORT = os.environ.get("VIDEO_MCP_STARTUP_REPORT", "0") == "1"
+
+_T0 = time.perf_counter()
+_lock = threading.RLock()
+_phases: List[Dict[str, Any]] = []
+_lazy_imports: Dict[str, Dict[str, Any]] = {}
+
+# Imported lazily by the tool modules; listed so reports can show which are still deferred
+HEAVY_MODULES = ("moviepy.editor", "cv2", "numpy", "imageio", "exifread", "PIL.Image", "yt_dlp")
+
+
+class LazyModule(types.ModuleType):
+    """Module stand-in that imports the real module on first attribute access"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+        with _lock:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                name = self.__name__
+                already_loaded = name in sys.modules
+                start = time.perf_counter()
+                module = importlib.import_module(name)
+                seconds = time.perf_counter() - start
+                from .metrics import current_tool
+                _lazy_imports[name] = {
+                    "module": name,
+                    "seconds": round(seconds, 4),
+                    "already_loaded": already_loaded,
+                    "first_used_by": current_tool.get(),
+                }
+                if not already_loaded:
+                    logger.info(f"Imported {name} on first use in {seconds * 1000:.0f} ms")
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for `name` that is only imported when one of its attributes is used"""
+    return LazyModule(name)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a named step of server startup (imports, tool registration, ...)"""
+    loaded_before = len(sys.modules)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append({
+            "phase": name,
+            "seconds": round(time.perf_counter() - start, 4),
+            "modules_imported": len(sys.modules) - loaded_before,
+        })
+
+
+def report() -> Dict[str, Any]:
+    """Startup phases, heavy modules still deferred and the lazy imports that happened so far"""
+    with _lock:
+        lazy = sorted(_lazy_imports.values(), key=lambda item: item["seconds"], reverse=True)
+    return {
+        "seconds_since_package_import": round(time.perf_counter() - _T0, 3),
+        "startup_seconds": round(sum(item["seconds"] for item in _phases), 4),
+        "phases": list(_phases),
+        "lazy_imports": lazy,
+        "modules_loaded": len(sys.modules),
+        "heavy_modules_loaded": {name: name in sys.modules for name in HEAVY_MODULES},
+    }
+
+
+def log_report():
+    data = report()
+    lines = [f"Startup took {data['startup_seconds'] * 1000:.0f} ms ({data['modules_loaded']} modules loaded)"]
+    for item in data["phases"]:
+        lines.append(f"  {item['phase']:<32} {item['seconds'] * 1000:8.1f} ms  +{item['modules_imported']} modules")
+    deferred = [name for name, loaded in data["heavy_modules_loaded"].items() if not loaded]
+    if deferred:
+        lines.append(f"  deferred until first use: {', '.join(deferred)}")
+    logger.info("\n".join(lines))
@@ -1,44 +1,57 @@
-from typing import Dict, Any
-from moviepy.editor import VideoFileClip, AudioFileClip
+from typing import Dict, Any, Optional
 import os
 import shutil
 import logging
 from .utils import VideoStore, AudioStore
+from .proxy_cache import ProxyStore
+from .media_index import MediaLibrary, query, MEDIA_TYPES, SORT_KEYS
+from .metrics import timed
+from . import estimator
+from . import startup
 
 logger = logging.getLogger(__name__)
 
 
 def register_util_tools(mcp):
-    @mcp.tool(description="Use this tool to check what is stored in memory, like objects and etc.")
-    def check_memory(store_type: str = "both") -> Dict[str, Any]:
+    @mcp.tool(description="Use this tool to check what this session has stored in memory, like objects and etc.")
+    def check_memory(store_type: str = "both", top: int = 5) -> Dict[str, Any]:
         """
-        Check what objects are stored in memory.
+        Check what objects the current session has stored in memory.
         
         Args:
             store_type: Type of store to check ("video", "audio", or "both")
+            top: Number of refs to list in the most expensive first view
         """
         try:
-            if store_type.lower() == "video":
-                return {
-                    "success": True,
-                    "video_memory": VideoStore._store,
-                    "video_count": len(VideoStore._store)
-                }
-            elif store_type.lower() == "audio":
-                return {
-                    "success": True,
-                    "audio_memory": AudioStore._store,
-                    "audio_count": len(AudioStore._store)
-                }
-            else:  # both or any other value
-                return {
-                    "success": True,
-                    "video_memory": VideoStore._store,
-                    "audio_memory": AudioStore._store,
-                    "video_count": len(VideoStore._store),
-                    "audio_count": len(AudioStore._store),
-                    "total_objects": len(VideoStore._store) + len(AudioStore._store)
-                }
+            stores = {"video": VideoStore, "audio": AudioStore}
+            if store_type.lower() in stores:
+                stores = {store_type.lower(): stores[store_type.lower()]}
+
+            # Summaries are computed when a ref is stored; only process counts are read live
+            result: Dict[str, Any] = {"success": True}
+            everything = []
+            for kind, store in stores.items():
+                summaries = store.summaries()
+                result[f"{kind}_memory"] = summaries
+                result[f"{kind}_count"] = len(summaries)
+                everything += [(kind, ref, summary) for ref, summary in summaries.items()]
+            if len(stores) > 1:
+                result["total_objects"] = len(everything)
+
+            result["totals"] = {
+                "refs": len(everything),
+                "estimated_bytes": sum(summary["estimated_bytes"] for _, _, summary in everything),
+                "open_processes": sum(summary["open_processes"] for _, _, summary in everything),
+                "duration": round(sum(summary["duration"] or 0 for _, _, summary in everything), 3),
+            }
+            costly = sorted(everything, key=lambda item: (item[2]["estimated_bytes"], item[2]["open_processes"]),
+                            reverse=True)[:max(0, top)]
+            result["top_by_cost"] = [
+                {"ref": ref, "kind": kind, "operation": summary["operation"],
+                 "estimated_bytes": summary["estimated_bytes"], "open_processes": summary["open_processes"]}
+                for kind, ref, summary in costly
+            ]
+            return result
         except Exception as e:
             logger.error(f"Error checking memory: {e}")
             return {
@@ -48,7 +61,7 @@ def register_util_tools(mcp):
                 "message": "Error checking memory"
             }
 
-    @mcp.tool(description="Use this tool for clearing all stored video and audio objects from memory to free up space")
+    @mcp.tool(description="Use this tool for clearing this session's stored video and audio objects from memory to free up space")
     def clear_memory(clear_videos:bool, clear_audios:bool) -> Dict[str,Any]:
         try:
             if clear_videos:
@@ -68,6 +81,68 @@ def register_util_tools(mcp):
                 "message": "Error clearing memory"
             }
 
+    @mcp.tool(description="Use this tool to check the low resolution proxy cache used for previews, set evict to true to trim it to its size limit")
+    def check_proxy_cache(evict: bool = False) -> Dict[str, Any]:
+        try:
+            freed = ProxyStore.evict() if evict else 0
+            return {
+                "success": True,
+                "proxy_cache": ProxyStore.stats(),
+                "freed_bytes": freed
+            }
+        except Exception as e:
+            logger.error(f"Error checking proxy cache: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error checking proxy cache"
+            }
+
+    @mcp.tool(description="Use this tool to see how long server startup took per phase and which heavy libraries were imported on first use and at what cost")
+    def check_startup() -> Dict[str, Any]:
+        try:
+            return {
+                "success": True,
+                **startup.report()
+            }
+        except Exception as e:
+            logger.error(f"Error building startup report: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error building startup report"
+            }
+
+    @mcp.tool()
+    def estimate_render(tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Dry run: predict what a rendering tool call would cost without rendering anything.
+
+        Args:
+            tool: Name of the tool to estimate ('resize_video', 'add_text_overlay', 'merge_videos', 'apply_effects' or 'image_to_video')
+            arguments: The arguments the tool would be called with
+
+        Returns:
+            Dictionary with the predicted wall time (render plus admission queue), peak memory, output size,
+            a per-stage time breakdown and which fast paths (static frame, preview proxy) the call would take
+        """
+        try:
+            return {
+                "success": True,
+                "tool": tool,
+                **estimator.estimate(tool, arguments)
+            }
+        except Exception as e:
+            logger.error(f"Error estimating {tool}: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error estimating render cost"
+            }
+
     @mcp.tool(description="Use this tool for listing files in a directory, provide directory path")
     def list_files(directory_path: str) -> Dict[str, Any]:
         try:
@@ -89,6 +164,109 @@ def register_util_tools(mcp):
                 "message": "Error listing files"
             }
         
+    @mcp.tool()
+    def list_media(
+        directory_path: str,
+        recursive: bool = False,
+        media_type: Optional[str] = None,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        name_contains: Optional[str] = None,
+        sort_by: str = "name",
+        descending: bool = False,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        probe: bool = True
+    ) -> Dict[str, Any]:
+        """
+        List the media files of a directory with size, mtime, type and probed metadata (duration,
+        resolution, fps, codecs), filtered and sorted on the server. Use this instead of calling
+        get_video_info/get_image_info on every file. The index is kept and only changed files are
+        probed again on later calls.
+        
+        Args:
+            directory_path: Directory to list
+            recursive: Include sub directories
+            media_type: Only 'video', 'audio', 'image' or 'other' files
+            min_duration: Minimum duration in seconds (video/audio)
+            max_duration: Maximum duration in seconds (video/audio)
+            min_width: Minimum width in pixels
+            min_height: Minimum height in pixels
+            name_contains: Case insensitive substring of the relative path
+            sort_by: 'name', 'size', 'mtime', 'duration', 'resolution' or 'type'
+            descending: Sort in descending order
+            cursor: 'next_cursor' of the previous page to continue the listing
+            limit: Maximum number of files per page
+            probe: Read media metadata; false lists names, sizes and types only (faster on first use)
+        
+        Returns:
+            Dictionary with the 'files' of this page, 'total_matches', 'next_cursor' and what the re-index changed
+        """
+        try:
+            if not os.path.isdir(directory_path):
+                return {
+                    "success": False,
+                    "error": "Directory does not exist",
+                    "message": "Provide valid directory path"
+                }
+            if media_type is not None and media_type not in MEDIA_TYPES:
+                return {
+                    "success": False,
+                    "error": f"Unknown media_type '{media_type}'",
+                    "message": f"Use one of {', '.join(MEDIA_TYPES)}"
+                }
+            if sort_by not in SORT_KEYS:
+                return {
+                    "success": False,
+                    "error": f"Unknown sort_by '{sort_by}'",
+                    "message": f"Use one of {', '.join(SORT_KEYS)}"
+                }
+            if limit <= 0:
+                return {
+                    "success": False,
+                    "error": "limit must be positive",
+                    "message": "Invalid limit parameter"
+                }
+            
+            # Filtering on metadata needs the probes
+            needs_probe = probe or any(value is not None for value in (min_duration, max_duration, min_width, min_height)) \
+                or sort_by in ("duration", "resolution")
+            with timed("index"):
+                entries, changes = MediaLibrary.refresh(directory_path, recursive, needs_probe)
+            filters = {
+                "media_type": media_type,
+                "min_duration": min_duration,
+                "max_duration": max_duration,
+                "min_width": min_width,
+                "min_height": min_height,
+                "name_contains": name_contains,
+            }
+            query_id = f"{os.path.abspath(directory_path)}|{recursive}"
+            page = query(entries, filters, sort_by, descending, cursor, limit, query_id)
+            return {
+                "success": True,
+                "directory": os.path.abspath(directory_path),
+                **page,
+                "index": changes
+            }
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Invalid listing parameters"
+            }
+        except Exception as e:
+            logger.error(f"Error listing media in {directory_path}: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error listing media"
+            }
+
     @mcp.tool(description="Use this tool to create a directory to store output files, make sure to provide accurate path")
     def make_directory(directory_path: str) -> Dict[str, Any]:
         try:
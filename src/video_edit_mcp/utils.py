@@ -2,10 +2,19 @@
 import os
 from pathlib import Path
 import uuid
-from moviepy.editor import VideoFileClip, AudioFileClip
-from PIL import Image, ImageDraw, ImageFont
-import tempfile
+import time
 import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from .render import PREVIEW_HEIGHT
+from .proxy_cache import ProxyStore
+from .media_probe import ProbeCache
+from .startup import lazy_import
+from . import resources, recipes, render
+
+# MoviePy is imported the first time a clip is opened
+decoder_pool = lazy_import(f"{__package__}.decoder_pool")
 
 logger = logging.getLogger(__name__)
 
@@ -16,42 +25,341 @@ def get_output_path(filename: str) -> str:
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     return os.path.join(output_dir, filename)
 
-class VideoStore:
-    _store = {}
+def _display_height(video_path: str) -> int:
+    """Displayed height of a video file from the probe cache, 0 when it cannot be probed"""
+    try:
+        probe = ProbeCache.probe(video_path)
+    except OSError:
+        return 0
+    height = probe.get("width") if probe.get("rotation") in (90, 270) else probe.get("height")
+    return int(height or 0)
+
+def open_video(video_path: str, preview: bool = False):
+    """Open a video file; previews read the cached low-res proxy, or let ffmpeg scale the source down"""
+    if preview:
+        proxy = ProxyStore.get(video_path)
+        if proxy:
+            clip = decoder_pool.DecoderPool.open_clip(proxy["proxy_path"])
+            clip.source_size = proxy["source_size"]
+            return clip
+        # Only scale down: sources at or below the draft height are read as they are
+        if 0 < _display_height(video_path) <= PREVIEW_HEIGHT:
+            return decoder_pool.DecoderPool.open_clip(video_path)
+        return decoder_pool.DecoderPool.open_clip(video_path, target_resolution=(PREVIEW_HEIGHT, None))
+    # First sight of a source: build its proxy in the background for later previews
+    ProxyStore.schedule(video_path)
+    # Decoders come warm from the shared pool and seek via the cached keyframe index
+    return decoder_pool.DecoderPool.open_clip(video_path)
+
+# Refs idle for this long are closed by the reaper; per-session limits on stored refs
+REF_TTL_SECONDS = float(os.environ.get("VIDEO_MCP_REF_TTL", "1800"))
+SESSION_MAX_REFS = int(os.environ.get("VIDEO_MCP_SESSION_MAX_REFS", "200"))
+SESSION_MAX_MB = float(os.environ.get("VIDEO_MCP_SESSION_MAX_MB", "2048"))
+
+LOCAL_SESSION = "local"
+
+
+def current_session() -> str:
+    """MCP session of the running tool call: the mcp-session-id header over HTTP, an id of the
+    connection otherwise, 'local' outside tool calls. It changes whenever the client reconnects"""
+    try:
+        from mcp.server.lowlevel.server import request_ctx
+        context = request_ctx.get()
+    except (ImportError, LookupError):
+        return LOCAL_SESSION
+    request = context.request
+    session_id = request.headers.get("mcp-session-id") if request is not None and hasattr(request, "headers") else None
+    return session_id or f"session-{id(context.session):x}"
+
+
+def clip_bytes(clip, _seen=None) -> int:
+    """Rough memory held by a stored clip: in-memory pixels/samples plus one frame per file decoder"""
+    _seen = set() if _seen is None else _seen
+    if clip is None or id(clip) in _seen:
+        return 0
+    _seen.add(id(clip))
+    total = 0
+    for name in ("img", "array"):
+        value = getattr(clip, name, None)
+        total += getattr(value, "nbytes", 0)
+    reader = getattr(clip, "reader", None)
+    size = getattr(reader, "size", None)
+    if size and len(size) == 2:
+        total += int(size[0]) * int(size[1]) * 3
+    for child in getattr(clip, "clips", None) or ():
+        total += clip_bytes(child, _seen)
+    total += clip_bytes(getattr(clip, "mask", None), _seen)
+    total += clip_bytes(getattr(clip, "audio", None), _seen)
+    return total
+
+
+class _StoredRef:
+    """A stored clip and its summary, computed once when it is stored"""
+    __slots__ = ("clip", "bytes", "created", "last_used", "operation", "source", "depth",
+                 "duration", "size", "fps", "has_audio")
+
+    def __init__(self, clip, operation: Optional[str] = None, source: Optional[str] = None, depth: int = 1):
+        self.clip = clip
+        self.bytes = clip_bytes(clip)
+        self.created = self.last_used = time.time()
+        self.operation = operation
+        self.source = source
+        self.depth = depth
+        self.duration = getattr(clip, "duration", None)
+        size = getattr(clip, "size", None)
+        self.size = list(size) if size else None
+        self.fps = getattr(clip, "fps", None)
+        # Audio clips have no size; video clips carry their soundtrack in .audio
+        self.has_audio = self.size is None or getattr(clip, "audio", None) is not None
+
+    def summary(self, ref: str) -> Dict[str, Any]:
+        return {
+            "operation": self.operation,
+            "source": self.source,
+            "duration": round(self.duration, 3) if self.duration else self.duration,
+            "size": self.size,
+            "fps": self.fps,
+            "has_audio": self.has_audio,
+            "estimated_bytes": self.bytes,
+            "open_processes": resources.ResourceManager.open_processes(ref),
+            "idle_seconds": round(time.time() - self.last_used, 1),
+            "depth": self.depth,
+        }
+
+
+class _SessionStore:
+    """
+    Refs to clips, namespaced by MCP session. Clips in memory are listed and counted per
+    session, are dropped after REF_TTL_SECONDS without use, and each session keeps at most
+    SESSION_MAX_REFS refs / SESSION_MAX_MB of estimated memory (least recently used refs are
+    dropped first). Dropping a ref releases the decoders it held; its recipe stays on disk,
+    so loading it again rebuilds the clip (recipes.py). A ref is a random UUID only handed to
+    the client that made it, so presenting one is what authorizes the rebuild: session ids
+    do not survive a restart or reconnect, and the rebuilt clip joins the caller's session.
+    """
+    kind = "clip"
+    _lock = threading.RLock()
+    _sessions: Dict[str, "OrderedDict[str, _StoredRef]"]
 
     @classmethod
-    def store(cls, video_clip) -> str:
+    def store(cls, clip, **recipe_arguments) -> str:
+        """
+        Store a clip under a new ref.
+
+        Args:
+            clip: The clip to keep
+            **recipe_arguments: Tool arguments to record in place of the ones the tool was
+                called with, e.g. the seed actually drawn when the caller passed none
+        """
         ref = str(uuid.uuid4())
-        cls._store[ref] = video_clip
+        if recipes.capture(clip):
+            # Rebuilding another ref: the clip is handed back to it, no new ref is made
+            return ref
+        session = current_session()
+        call = recipes.current_call.get()
+        operation, arguments = (call[0], call[1]) if call else (None, {})
+        cls._put(session, ref, clip, operation, arguments)
+        recipes.record(ref, cls.kind, session, **recipe_arguments)
         return ref
 
     @classmethod
-    def load(cls, video_ref: str):
-        if video_ref in cls._store:
-            return cls._store[video_ref]
-        return VideoFileClip(video_ref)
-    
+    def _put(cls, session: str, ref: str, clip, operation: Optional[str], arguments: Dict[str, Any]):
+        # Lineage: the first source file, and how many tool calls deep the clip is
+        parents = [entry for value in _flatten(arguments) if isinstance(value, str) and _is_ref(value)
+                   for entry in (VideoStore._entry(session, value), AudioStore._entry(session, value)) if entry]
+        sources = recipes.source_paths(arguments)
+        entry = _StoredRef(clip, operation,
+                           sources[0] if sources else next((p.source for p in parents if p.source), None),
+                           1 + max((p.depth for p in parents), default=0))
+        with cls._lock:
+            refs = cls._sessions.setdefault(session, OrderedDict())
+            refs[ref] = entry
+            evicted = cls._enforce_quota(session, refs, keep=ref)
+        # The stored clip keeps the decoders the current tool call opened
+        resources.adopt(ref)
+        cls._drop(evicted, "session quota")
+        _Reaper.start()
+
     @classmethod
-    def clear(cls):
-        cls._store.clear()
-    
-class AudioStore:
-    _store = {}
+    def _lookup(cls, ref: str):
+        """The stored clip for `ref`, or None when `ref` is not a ref (but a file path)"""
+        session = current_session()
+        with cls._lock:
+            refs = cls._sessions.get(session, {})
+            entry = refs.get(ref)
+            if entry is not None:
+                entry.last_used = time.time()
+                refs.move_to_end(ref)
+        if entry is not None:
+            resources.borrow(ref)
+            return entry.clip
+        if not _is_ref(ref):
+            return None
+        recipe = recipes.load(ref)
+        if recipe is None or recipe.get("kind") != cls.kind:
+            raise LookupError(f"Unknown or expired {cls.kind} ref {ref}; refs are forgotten when cleared "
+                              "or unused for a long time")
+        clip = recipes.rebuild(recipe)
+        cls._put(session, ref, clip, recipe["tool"], recipe["arguments"])
+        return clip
 
     @classmethod
-    def store(cls, audio_clip) -> str:
-        ref = str(uuid.uuid4())
-        cls._store[ref] = audio_clip
-        return ref
-    
+    def _entry(cls, session: str, ref: str) -> Optional[_StoredRef]:
+        with cls._lock:
+            return cls._sessions.get(session, {}).get(ref)
+
     @classmethod
-    def load(cls, audio_ref: str):
-        if audio_ref in cls._store:
-            return cls._store[audio_ref]
-        return AudioFileClip(audio_ref)
-    
+    def refs(cls, session: Optional[str] = None) -> Dict[str, Any]:
+        """The clips stored by `session` (default: the current one)"""
+        with cls._lock:
+            return {ref: entry.clip for ref, entry in cls._sessions.get(session or current_session(), {}).items()}
+
+    @classmethod
+    def summaries(cls, session: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Per-ref summaries of what `session` (default: the current one) has stored, most recently used last"""
+        with cls._lock:
+            entries = list(cls._sessions.get(session or current_session(), {}).items())
+        return {ref: entry.summary(ref) for ref, entry in entries}
+
+    @classmethod
+    def clear(cls, all_sessions: bool = False):
+        """Drop the current session's refs (or everyone's) and forget their recipes"""
+        with cls._lock:
+            if all_sessions:
+                dropped = [ref for refs in cls._sessions.values() for ref in refs]
+                cls._sessions.clear()
+            else:
+                dropped = list(cls._sessions.pop(current_session(), {}))
+        cls._drop(dropped, "cleared")
+        for ref in dropped:
+            recipes.forget(ref)
+
     @classmethod
-    def clear(cls):
-        cls._store.clear()
+    def discard(cls, refs: List[str], forget: bool = True):
+        """Drop some of the current session's refs from memory, and unless `forget` is False their recipes"""
+        with cls._lock:
+            stored = cls._sessions.get(current_session(), {})
+            dropped = [ref for ref in refs if stored.pop(ref, None) is not None]
+        cls._drop(dropped, "discarded")
+        if forget:
+            for ref in dropped:
+                recipes.forget(ref)
 
+    @classmethod
+    def expire(cls, now: Optional[float] = None) -> int:
+        """Drop refs idle for longer than REF_TTL_SECONDS; returns how many"""
+        deadline = (now or time.time()) - REF_TTL_SECONDS
+        expired = []
+        with cls._lock:
+            for session, refs in list(cls._sessions.items()):
+                for ref, entry in list(refs.items()):
+                    if entry.last_used < deadline:
+                        del refs[ref]
+                        expired.append(ref)
+                if not refs:
+                    del cls._sessions[session]
+        cls._drop(expired, "expired")
+        return len(expired)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {
+                "sessions": len(cls._sessions),
+                "refs": sum(len(refs) for refs in cls._sessions.values()),
+                "bytes": sum(entry.bytes for refs in cls._sessions.values() for entry in refs.values()),
+            }
+
+    @classmethod
+    def _enforce_quota(cls, session: str, refs: "OrderedDict[str, _StoredRef]", keep: str) -> List[str]:
+        limit = SESSION_MAX_MB * 2**20
+        evicted = []
+        total = sum(entry.bytes for entry in refs.values())
+        for ref in list(refs):
+            if len(refs) <= SESSION_MAX_REFS and total <= limit:
+                break
+            if ref == keep:
+                continue
+            total -= refs.pop(ref).bytes
+            evicted.append(ref)
+        if evicted:
+            logger.warning(f"Session {session} over its {cls.kind} quota, dropped {len(evicted)} least recently used refs")
+        return evicted
+
+    @classmethod
+    def _drop(cls, refs: List[str], reason: str):
+        for ref in refs:
+            logger.debug(f"Releasing {cls.kind} ref {ref} ({reason})")
+            resources.ResourceManager.release(ref)
+
+
+def _flatten(value):
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _flatten(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _flatten(item)
+    else:
+        yield value
+
+
+def _is_ref(value: str) -> bool:
+    try:
+        return str(uuid.UUID(value)) == value
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+class VideoStore(_SessionStore):
+    kind = "video"
+    _sessions = {}
 
+    @classmethod
+    def load(cls, video_ref: str, preview: bool = False):
+        clip = cls._lookup(video_ref)
+        return clip if clip is not None else open_video(video_ref, preview)
+
+
+class AudioStore(_SessionStore):
+    kind = "audio"
+    _sessions = {}
+
+    @classmethod
+    def load(cls, audio_ref: str):
+        clip = cls._lookup(audio_ref)
+        return clip if clip is not None else decoder_pool.DecoderPool.open_audio(audio_ref)
+
+
+class _Reaper:
+    """Daemon thread that drops idle refs of both stores from memory and prunes old recipes and render checkpoints"""
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def start(cls):
+        with cls._lock:
+            if cls._thread is None:
+                cls._thread = threading.Thread(target=cls._run, name="ref-reaper", daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        interval = max(1.0, min(60.0, REF_TTL_SECONDS / 4))
+        last_prune = 0.0
+        while True:
+            time.sleep(interval)
+            try:
+                expired = VideoStore.expire() + AudioStore.expire()
+                if expired:
+                    logger.info(f"Dropped {expired} idle refs from memory")
+                if time.time() - last_prune > 3600:
+                    last_prune = time.time()
+                    pruned = recipes.prune()
+                    if pruned:
+                        logger.info(f"Pruned {pruned} unused ref recipes")
+                    pruned = render.prune_checkpoints()
+                    if pruned:
+                        logger.info(f"Pruned {pruned} abandoned render checkpoints")
+            except Exception as e:
+                logger.warning(f"Ref reaper failed: {e}")
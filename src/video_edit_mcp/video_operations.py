@@ -1,23 +1,20 @@
-from moviepy.editor import *
-from moviepy.video.fx import *
-from moviepy.video.fx.speedx import speedx
-from moviepy.video.fx.rotate import rotate
-from moviepy.video.fx.crop import crop
-from moviepy.video.fx.resize import resize
-from moviepy.video.fx.fadein import fadein
-from moviepy.video.fx.fadeout import fadeout
-from moviepy.video.fx.blackwhite import blackwhite
-from moviepy.video.fx.mirror_x import mirror_x
-from moviepy.editor import ColorClip, ImageClip, CompositeVideoClip, VideoFileClip, TextClip
-import cv2
-import numpy as np
 import random
 import math
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Union
 import os
 import logging
-import imageio
+from .startup import lazy_import
 from .utils import get_output_path, VideoStore, AudioStore
+from .proxy_cache import ProxyStore
+from .decoder_pool import DecoderPool
+from .metrics import timed
+from .render import write_video, preview_resolution, source_scale
+from . import effects, recipes
+
+# Heavy libraries are imported on the first tool call that uses them
+mpy = lazy_import("moviepy.editor")
+cv2 = lazy_import("cv2")
+imageio = lazy_import("imageio")
 
 
 logger = logging.getLogger(__name__)
@@ -30,7 +27,10 @@ def register_video_tools(mcp):
         """Get comprehensive information about a video file including duration, fps, resolution, codec details, and audio information."""
         try:
             # Load video file
-            video = VideoFileClip(video_path)
+            with timed("probe"):
+                video = DecoderPool.open_clip(video_path)
+            # Build the low-res proxy in the background so later previews are cheap
+            ProxyStore.schedule(video_path)
             
             # Basic video information
             info = {
@@ -143,10 +143,10 @@ def register_video_tools(mcp):
             trimmed_video = video.subclip(start_time, end_time)
 
             if return_path:
-                trimmed_video.write_videofile(output_path)
+                written = write_video(trimmed_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video trimmed successfully"
                 }
             else:
@@ -165,11 +165,16 @@ def register_video_tools(mcp):
             }
  
     @mcp.tool(description="Use this tool for resizing the video make sure first whether video needs to be saved directly or just object has to be returned for further processing, if there are multiple steps to be done after resizing then make sure to return object and return path should be false else return path should be true")
-    def resize_video(video_path: str, size: Tuple[int, int], output_path: str, return_path: bool) -> Dict[str, Any]:
-        cap = cv2.VideoCapture(video_path)
-    
-        if not cap.isOpened():
-            raise Exception(f"Can't open the video: {video_path}")
+    def resize_video(video_path: str, size: Tuple[int, int], output_path: str, return_path: bool, output_mode: str = "file", preview: bool = False,
+                     profile: bool = False, profile_trace_path: Optional[str] = None,
+                     encoding: Union[str, Dict[str, Any], None] = None) -> Dict[str, Any]:
+        # A stored video object is resized in memory; files are decoded straight at the new size
+        stored = None if os.path.isfile(video_path) else VideoStore.load(video_path, preview)
+        cap = None
+        if stored is None:
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                raise Exception(f"Can't open the video: {video_path}")
         
         try:
             # Input validation
@@ -180,10 +185,16 @@ def register_video_tools(mcp):
                     "message": "Invalid size parameters"
                 }
 
-            original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if stored is None:
+                original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            else:
+                original_width, original_height = stored.size
 
             target_width, target_height = size
+            if preview:
+                # Draft renders use a proportionally smaller canvas
+                target_width, target_height = preview_resolution(target_width, target_height)
             
             # 计算保持原始比例的新尺寸
             original_aspect = original_width / original_height
@@ -208,11 +219,14 @@ def register_video_tools(mcp):
             logger.info(f"cv_original_width: {original_width}, cv_original_height: {original_height}")
             logger.info(f"new_width: {new_width}, new_height: {new_height}")
             # 首先调整视频大小（不拉伸）
-            resized_clip = VideoFileClip(video_path, target_resolution=(new_height,new_width))
+            if stored is None:
+                resized_clip = DecoderPool.open_clip(video_path, target_resolution=(new_height,new_width))
+            else:
+                resized_clip = stored.resize(newsize=(new_width, new_height))
             logger.info(f"resized video size: {resized_clip.size}")
 
             # 创建黑色背景
-            background = ColorClip(
+            background = mpy.ColorClip(
                 size=(target_width, target_height),
                 color=(0, 0, 0),
                 duration=resized_clip.duration
@@ -223,16 +237,17 @@ def register_video_tools(mcp):
             y_pos = (target_height - new_height) // 2
             
             # 将调整后的视频叠加到黑色背景上
-            final_video = CompositeVideoClip(
+            final_video = mpy.CompositeVideoClip(
                 [background, resized_clip.set_position((x_pos, y_pos))],
                 size=(target_width, target_height)
             )
             
             if return_path:
-                final_video.write_videofile(output_path, codec='libx264', audio_codec='aac')
+                written = write_video(final_video, output_path, output_mode, preview, profile, profile_trace_path,
+                                      encoding, codec='libx264', audio_codec='aac')
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video resized successfully"
                 }
             else:
@@ -251,7 +266,8 @@ def register_video_tools(mcp):
             }
         finally:
             # 释放视频捕获对象
-            cap.release()
+            if cap is not None:
+                cap.release()
 
     #@mcp.tool(description="Use this tool for cropping the video, provide x1, y1, x2, y2 coordinates, and output name like cropped_video.mp4 , if there are multiple steps to be done after cropping then make sure to return object and return path should be false else return path should be true")
     def crop_video(video_path: str, x1: int, y1: int, x2: int, y2: int, output_name: str, return_path: bool) -> Dict[str, Any]:
@@ -266,13 +282,13 @@ def register_video_tools(mcp):
             
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            cropped_video = crop(video, x1, y1, x2, y2)
+            cropped_video = mpy.vfx.crop(video, x1, y1, x2, y2)
             
             if return_path:
-                cropped_video.write_videofile(output_path)
+                written = write_video(cropped_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video cropped successfully"
                 }
             else:
@@ -303,13 +319,13 @@ def register_video_tools(mcp):
             
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            rotated_video = rotate(video, angle)
+            rotated_video = mpy.vfx.rotate(video, angle)
             
             if return_path:
-                rotated_video.write_videofile(output_path)
+                written = write_video(rotated_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video rotated successfully"
                 }
             else:
@@ -340,13 +356,13 @@ def register_video_tools(mcp):
             
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            sped_up_video = speedx(video, speed)
+            sped_up_video = mpy.vfx.speedx(video, speed)
 
             if return_path:
-                sped_up_video.write_videofile(output_path)
+                written = write_video(sped_up_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video speed changed successfully"
                 }
             else:
@@ -373,10 +389,10 @@ def register_video_tools(mcp):
             new_video = video.set_audio(audio)
             
             if return_path:
-                new_video.write_videofile(output_path)
+                written = write_video(new_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Audio added successfully"
                 }
             else:
@@ -407,13 +423,13 @@ def register_video_tools(mcp):
             
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            faded_video = fadein(video, fade_duration)
+            faded_video = mpy.vfx.fadein(video, fade_duration)
             
             if return_path:
-                faded_video.write_videofile(output_path)
+                written = write_video(faded_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Fade in effect added successfully"
                 }
             else:
@@ -444,13 +460,13 @@ def register_video_tools(mcp):
             
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            faded_video = fadeout(video, fade_duration)
+            faded_video = mpy.vfx.fadeout(video, fade_duration)
             
             if return_path:
-                faded_video.write_videofile(output_path)
+                written = write_video(faded_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Fade out effect added successfully"
                 }
             else:
@@ -481,7 +497,14 @@ def register_video_tools(mcp):
         # 透明度效果参数
         opacity: Optional[float] = 1.0,
         fade_in: Optional[float] = 0.0,
-        fade_out: Optional[float] = 0.0
+        fade_out: Optional[float] = 0.0,
+        return_path: bool = True,
+        output_mode: str = "file",
+        preview: bool = False,
+        seed: Optional[int] = None,
+        profile: bool = False,
+        profile_trace_path: Optional[str] = None,
+        encoding: Union[str, Dict[str, Any], None] = None
     ) -> Dict[str, Any]:
         """
         Add multiple text overlays to video with sequential appearance, random colors and positions.
@@ -497,12 +520,23 @@ def register_video_tools(mcp):
             opacity: Text opacity (0.0 transparent to 1.0 opaque)
             fade_in: Fade-in duration in seconds
             fade_out: Fade-out duration in seconds
+            return_path: Write the video and return its path; false keeps the result in memory and returns an object reference
+            output_mode: 'file' for a regular MP4, 'fmp4' for a fragmented MP4 readable while rendering, 'hls' for a growing HLS playlist plus segments
+            preview: Render a fast low resolution draft instead of the final video
+            profile: Include per-frame decode/effect/composite/encode timings (p50/p95/max) in the result
+            profile_trace_path: Optional path for a Chrome trace file of the profiled render
+            seed: Random seed for colors, positions and movement; reuse the seed of a preview to get the same layout in the final render
+            encoding: Encoder settings, a profile name ('fast-preview', 'balanced', 'archive') or an object with a profile and any of preset, crf, bitrate, threads, gop, pix_fmt, tune
             
         Returns:
             Dictionary with success status and output path or object reference
         """
         try:
-            return_path = True
+            if seed is None:
+                seed = random.randrange(2**31)
+                # A repeated call resumes a checkpointed render only with the same seed
+                recipes.note_arguments(seed=seed)
+            rng = random.Random(seed)
 
             # 默认颜色列表
             colors = ["white", "gold", "LightGoldenrodYellow", "LemonChiffon", 
@@ -529,8 +563,13 @@ def register_video_tools(mcp):
                     "message": "Invalid opacity parameter"
                 }
             
-            video = VideoStore.load(video_path)
+            video = VideoStore.load(video_path, preview=preview)
             video_duration = video.duration
+
+            # Previews may decode the source at reduced resolution, keep text proportional
+            scale = source_scale(video)
+            font_size = max(1, int(round(font_size * scale)))
+            speed = speed * scale
             
             # 计算每个文本的显示时长 (总时长减去间隔时间后平均分配)
             num_texts = len(texts)
@@ -556,10 +595,10 @@ def register_video_tools(mcp):
             
             for i, text in enumerate(texts):
                 # 随机选择颜色
-                color = random.choice(colors)
+                color = rng.choice(colors)
                 
                 # 创建文本剪辑
-                text_clip = TextClip(txt=text, fontsize=font_size, color=color, font=font)
+                text_clip = mpy.TextClip(txt=text, fontsize=font_size, color=color, font=font)
                 
                 # 设置文本的出现时间
                 start_time = i * (each_text_duration + 2)  # 每个文本间隔2秒
@@ -584,13 +623,13 @@ def register_video_tools(mcp):
                 max_y = max(0, video_height - text_height)
                 
                 # 随机位置
-                random_x = random.randint(0, int(max_x))
-                random_y = random.randint(0, int(max_y))
+                random_x = rng.randint(0, int(max_x))
+                random_y = rng.randint(0, int(max_y))
                 
                 # 设置动态移动效果或静态位置
                 if random_movement:
                     # 随机初始速度方向
-                    angle = random.uniform(0, 2 * math.pi)
+                    angle = rng.uniform(0, 2 * math.pi)
                     velocity_x = speed * math.cos(angle)
                     velocity_y = speed * math.sin(angle)
 
@@ -606,24 +645,33 @@ def register_video_tools(mcp):
                 text_clips.append(text_clip)
             
             # 叠加所有文本到视频
-            final_video = CompositeVideoClip([video] + text_clips)
+            final_video = mpy.CompositeVideoClip([video] + text_clips)
             
             if return_path:
-                final_video.write_videofile(
+                written = write_video(
+                    final_video,
                     output_path,
+                    output_mode,
+                    preview,
+                    profile,
+                    profile_trace_path,
+                    encoding,
                     fps=final_video.fps,
                     codec='libx264',
                     audio_codec='aac')
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
+                    "seed": seed,
                     "message": f"Added {num_texts} text overlays with sequential appearance"
                 }
             else:
-                ref = VideoStore.store(final_video)
+                # Record the seed actually used so a rebuilt ref gets the same layout
+                ref = VideoStore.store(final_video, seed=seed)
                 return {
                     "success": True,
                     "output_object": ref,
+                    "seed": seed,
                     "message": f"Added {num_texts} text overlays with sequential appearance"
                 }
         
@@ -687,14 +735,14 @@ def register_video_tools(mcp):
             
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            logo = ImageClip(image_path).set_duration(duration).set_position((x, y))
-            final_video = CompositeVideoClip([video, logo])
+            logo = mpy.ImageClip(image_path).set_duration(duration).set_position((x, y))
+            final_video = mpy.CompositeVideoClip([video, logo])
             
             if return_path:
-                final_video.write_videofile(output_path)
+                written = write_video(final_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Image overlay added successfully"
                 }
             else:
@@ -717,13 +765,13 @@ def register_video_tools(mcp):
         try:
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            gray_video = video.fx(blackwhite)
+            gray_video = video.fx(mpy.vfx.blackwhite)
             
             if return_path:
-                gray_video.write_videofile(output_path)
+                written = write_video(gray_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video converted to grayscale successfully"
                 }
             else:
@@ -777,12 +825,12 @@ def register_video_tools(mcp):
         try:
             output_path = get_output_path(output_name)
             video = VideoStore.load(video_path)
-            mirrored_video = video.fx(mirror_x)
+            mirrored_video = video.fx(mpy.vfx.mirror_x)
             if return_path:
-                mirrored_video.write_videofile(output_path)
+                written = write_video(mirrored_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video mirrored successfully"
                 }
             else:
@@ -818,8 +866,8 @@ def register_video_tools(mcp):
                 output_paths = []
                 for i, segment in enumerate(segments):
                     segment_path = os.path.join(output_path, f"{output_name}_part_{i+1}.mp4")
-                    segment.write_videofile(segment_path)
-                    output_paths.append(segment_path)
+                    written = write_video(segment, segment_path)
+                    output_paths.append(written["output_path"])
                 return {
                     "success": True,
                     "output_paths": output_paths,
@@ -852,10 +900,10 @@ def register_video_tools(mcp):
                 write_kwargs["bitrate"] = bitrate
                 
             if return_path:
-                video.write_videofile(output_path, **write_kwargs)
+                written = write_video(video, output_path, **write_kwargs)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video format converted successfully"
                 }
             else:
@@ -881,13 +929,13 @@ def register_video_tools(mcp):
             overlay_video = VideoStore.load(overlay_video_path)
             
             overlay_positioned = overlay_video.set_position((x, y)).set_opacity(opacity).set_duration(duration)
-            final_video = CompositeVideoClip([base_video, overlay_positioned])
+            final_video = mpy.CompositeVideoClip([base_video, overlay_positioned])
             
             if return_path:
-                final_video.write_videofile(output_path)
+                written = write_video(final_video, output_path)
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
                     "message": "Video overlay added successfully"
                 }
             else:
@@ -910,22 +958,40 @@ def register_video_tools(mcp):
         video_paths: List[str],
         audios_folder: str,
         output_path: str, 
-        transition_duration: float = 1.0
+        transition_duration: float = 1.0,
+        return_path: bool = True,
+        output_mode: str = "file",
+        preview: bool = False,
+        seed: Optional[int] = None,
+        profile: bool = False,
+        profile_trace_path: Optional[str] = None,
+        encoding: Union[str, Dict[str, Any], None] = None
     ) -> Dict[str, Any]:
         """
         Use this tool for merging multiple videos, provide multiple video paths, and output path like /path/merged_video.mp4 , if there are multiple steps to be done after merging then make sure to return object and return path should be false else return path should be true
         
         Args:
-            video_paths: List of video file paths
+            video_paths: List of video file paths or stored video object references
             audios_folder: Folder containing audio files to choose from
             output_path: Output file path
             transition_duration: Transition duration in seconds
+            return_path: Write the video and return its path; false keeps the result in memory and returns an object reference
+            output_mode: 'file' for a regular MP4, 'fmp4' for a fragmented MP4 readable while rendering, 'hls' for a growing HLS playlist plus segments
+            preview: Render a fast low resolution draft instead of the final video
+            profile: Include per-frame decode/effect/composite/encode timings (p50/p95/max) in the result
+            profile_trace_path: Optional path for a Chrome trace file of the profiled render
+            seed: Random seed for clip order, transitions and music; reuse the seed of a preview to get the same edit in the final render
+            encoding: Encoder settings, a profile name ('fast-preview', 'balanced', 'archive') or an object with a profile and any of preset, crf, bitrate, threads, gop, pix_fmt, tune
         
         Returns:
             Dictionary with success status and output path or object reference
         """
         try:
-            return_path = True
+            if seed is None:
+                seed = random.randrange(2**31)
+                # A repeated call resumes a checkpointed render only with the same seed
+                recipes.note_arguments(seed=seed)
+            rng = random.Random(seed)
 
             # Validate input
             if not video_paths or len(video_paths) < 1:
@@ -935,10 +1001,10 @@ def register_video_tools(mcp):
                     "message": "Invalid video paths list"
                 }
             
-            clips = [VideoFileClip(path) for path in video_paths]
+            clips = [VideoStore.load(path, preview) for path in video_paths]
             
             # Shuffle video order randomly
-            random.shuffle(clips)
+            rng.shuffle(clips)
             
             # Define available transition effects
             transitions = [
@@ -954,23 +1020,23 @@ def register_video_tools(mcp):
             video_start = 0
             for i in range(len(clips)):
                 if i == 0:
-                    current_clip = clips[i].fx(vfx.fadein, transition_duration)
+                    current_clip = clips[i].fx(mpy.vfx.fadein, transition_duration)
                 else:
-                    trans_type, side = random.choice(transitions)
+                    trans_type, side = rng.choice(transitions)
 
                     if trans_type == "crossfade":
-                        current_clip = clips[i].fx(transfx.crossfadein, transition_duration)
+                        current_clip = clips[i].fx(mpy.transfx.crossfadein, transition_duration)
                     elif trans_type == "slide":
-                        current_clip = clips[i].fx(transfx.slide_in, duration=transition_duration, side=side)
+                        current_clip = clips[i].fx(mpy.transfx.slide_in, duration=transition_duration, side=side)
 
                     if i == len(clips) - 1:
-                        current_clip = current_clip.fx(vfx.fadeout, transition_duration)
+                        current_clip = current_clip.fx(mpy.vfx.fadeout, transition_duration)
     
                 current_clip = current_clip.set_start(video_start)
                 video_start += current_clip.duration - transition_duration
                 clips_with_transitions.append(current_clip)
 
-            final_clip = CompositeVideoClip(clips_with_transitions)
+            final_clip = mpy.CompositeVideoClip(clips_with_transitions)
 
             if audios_folder and os.path.exists(audios_folder):
                 try:
@@ -985,19 +1051,19 @@ def register_video_tools(mcp):
     
                     if audio_files:
                         # 随机选择一个音频文件
-                        random_audio_path = random.choice(audio_files)
+                        random_audio_path = rng.choice(sorted(audio_files))
                         logger.info(f"Selected random audio: {random_audio_path}")
                         
-                        audio_clip = AudioFileClip(random_audio_path)
+                        audio_clip = DecoderPool.open_audio(random_audio_path)
                         if audio_clip.duration < final_clip.duration:
                             # Loop audio to match video duration
-                            audio_clip = audio_clip.fx(afx.audio_loop, duration=final_clip.duration)
+                            audio_clip = audio_clip.fx(mpy.afx.audio_loop, duration=final_clip.duration)
                         elif audio_clip.duration > final_clip.duration:
                             # Trim audio to video duration
                             audio_clip = audio_clip.subclip(0, final_clip.duration)
         
                         fadeout_duration = 2.0  # 淡出持续时间（秒）
-                        audio_clip = audio_clip.fx(afx.audio_fadeout, duration=fadeout_duration)
+                        audio_clip = audio_clip.fx(mpy.afx.audio_fadeout, duration=fadeout_duration)
 
                         final_clip = final_clip.set_audio(audio_clip)
                     else:
@@ -1007,9 +1073,15 @@ def register_video_tools(mcp):
 
             # Decide return method based on return_path parameter
             if return_path:
-                final_clip.write_videofile(
-                    output_path, 
-                    codec='libx264', 
+                written = write_video(
+                    final_clip,
+                    output_path,
+                    output_mode,
+                    preview,
+                    profile,
+                    profile_trace_path,
+                    encoding,
+                    codec='libx264',
                     audio_codec='aac'
                 )
                 
@@ -1020,15 +1092,17 @@ def register_video_tools(mcp):
                 
                 return {
                     "success": True,
-                    "output_path": output_path,
+                    **written,
+                    "seed": seed,
                     "message": f"Video concatenation successful, processed {len(video_paths)} videos"
                 }
             else:
-                ref = VideoStore.store(final_clip)
+                ref = VideoStore.store(final_clip, seed=seed)
                 
                 return {
                     "success": True,
                     "output_object": ref,
+                    "seed": seed,
                     "message": f"Video concatenation successful, processed {len(video_paths)} videos"
                 }
                 
@@ -1039,4 +1113,87 @@ def register_video_tools(mcp):
                 "error": str(e),
                 "error_type": type(e).__name__,
                 "message": "Video concatenation failed"
-            }
\ No newline at end of file
+            }
+    @mcp.tool(description="Use this tool to list the effects available to apply_effects and image_to_video, with their parameters and cost hints")
+    def list_effects() -> Dict[str, Any]:
+        return {
+            "success": True,
+            "effects": effects.list_effects()
+        }
+
+    @mcp.tool()
+    def apply_effects(
+        video_path: str,
+        effects_chain: List[Union[str, Dict[str, Any]]],
+        output_path: str,
+        return_path: bool = True,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        output_mode: str = "file",
+        preview: bool = False,
+        profile: bool = False,
+        profile_trace_path: Optional[str] = None,
+        encoding: Union[str, Dict[str, Any], None] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply an ordered chain of effects to a video in a single pass.
+
+        Args:
+            video_path: Path to the input video or a stored video object reference
+            effects_chain: Effects in order, as names ("sepia") or dicts with a name and parameters ({"name": "contrast", "factor": 1.3}); see list_effects
+            output_path: Path of the output video file
+            return_path: Write the video and return its path; false keeps the result in memory and returns an object reference
+            start: Only frames from this time (seconds) on are processed
+            end: Only frames up to this time (seconds) are processed; the rest of the video is left untouched
+            output_mode: 'file' for a regular MP4, 'fmp4' for a fragmented MP4 readable while rendering, 'hls' for a growing HLS playlist plus segments
+            preview: Render a fast low resolution draft instead of the final video
+            profile: Include per-frame decode/effect/composite/encode timings (p50/p95/max) in the result
+            profile_trace_path: Optional path for a Chrome trace file of the profiled render
+            encoding: Encoder settings, a profile name ('fast-preview', 'balanced', 'archive') or an object with a profile and any of preset, crf, bitrate, threads, gop, pix_fmt, tune
+
+        Returns:
+            Dictionary with success status, output path or object reference and the execution plan
+        """
+        try:
+            if not effects_chain:
+                return {
+                    "success": False,
+                    "error": "effects_chain cannot be empty",
+                    "message": "Invalid effects_chain parameter"
+                }
+            # Fail on unknown effects or parameters before opening anything
+            effects.parse_steps(effects_chain)
+
+            video = VideoStore.load(video_path, preview)
+            t0 = max(0.0, start or 0.0)
+            t1 = video.duration if end is None else min(end, video.duration)
+            if t1 <= t0:
+                return {
+                    "success": False,
+                    "error": f"Empty time range {t0}-{t1} for a {video.duration:.2f}s video",
+                    "message": "Invalid start/end parameters"
+                }
+
+            # Frames outside [start, end] pass through the chain untouched
+            processed, chain = effects.apply_to_clip(video, effects_chain, t0, t1)
+            if return_path:
+                written = write_video(processed, output_path, output_mode, preview, profile, profile_trace_path,
+                                      encoding, codec='libx264', audio_codec='aac')
+                result = {"success": True, **written}
+            else:
+                result = {"success": True, "output_object": VideoStore.store(processed)}
+
+            result.update({
+                "range": [t0, t1],
+                "plan": chain.plan(),
+                "message": f"Applied {len(effects_chain)} effect(s)"
+            })
+            return result
+        except Exception as e:
+            logger.error(f"Error applying effects to {video_path}: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "message": "Error applying effects"
+            }